@@ -0,0 +1,43 @@
+"""
+Compares the groupby_agg engines on high-cardinality keys.
+
+Usage (from backend/):
+    python -m benchmarks.bench_groupby [rows] [groups]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from engine.actions import ActionRegistry
+
+def make_frame(rows: int, groups: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "key": rng.integers(0, groups, rows),
+        "label": pd.Series(rng.integers(0, groups, rows)).map("k{}".format),
+        "value": rng.normal(size=rows),
+        "amount": rng.integers(0, 1_000, rows),
+    })
+
+def time_engine(df: pd.DataFrame, group_by: list, engine: str, repeat: int = 3) -> float:
+    params = {
+        "group_by": group_by,
+        "aggregations": {"value": ["sum", "mean", "max"], "amount": ["count", "nunique"]},
+        "engine": engine,
+    }
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ActionRegistry.execute(df, "groupby_agg", params)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(rows: int = 2_000_000, groups: int = 500_000) -> None:
+    df = make_frame(rows, groups)
+    print(f"rows={rows:,} groups={groups:,}")
+    for keys in (["key"], ["label"]):
+        for engine in ("pandas", "arrow"):
+            print(f"  keys={keys!s:<10} engine={engine:<7} {time_engine(df, keys, engine) * 1000:9.1f} ms")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
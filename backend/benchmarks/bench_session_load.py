@@ -0,0 +1,74 @@
+"""
+Compares session reload from Parquet and memory-mapped Arrow IPC snapshots.
+
+Every measurement runs in a fresh interpreter so RSS reflects only that load. Reported:
+load latency, RSS added by the load, and the time/RSS after touching one numeric column.
+The OS page cache is warm after the first read of each file (drop it to compare cold reads).
+
+Usage (from backend/):
+    python -m benchmarks.bench_session_load [rows] [shape]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def _rss_mb() -> float:
+    # Current (not peak) resident set size; Linux only
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+def measure(storage_dir: str, snapshot_format: str, session_id: str) -> dict:
+    from engine.session_store import FileSessionStore
+    import pyarrow.parquet, pyarrow.feather # noqa: F401  imported before the baseline
+
+    store = FileSessionStore(storage_dir=storage_dir, cache_size=0, snapshot_format=snapshot_format)
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    session = store.load(session_id)
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_load = _rss_mb() - rss_before
+
+    start = time.perf_counter()
+    session.initial_df["price_0"].sum()
+    touch_ms = (time.perf_counter() - start) * 1000
+    return {
+        "load_ms": round(load_ms, 1),
+        "load_rss_mb": round(rss_load, 1),
+        "touch_ms": round(touch_ms, 1),
+        "touch_rss_mb": round(_rss_mb() - rss_before, 1),
+    }
+
+def main(rows: int = 1_000_000, shape: str = "wide") -> None:
+    from benchmarks.datasets import make_dataset
+    from engine.session import Session
+    from engine.session_store import FileSessionStore
+
+    df = make_dataset(rows, shape)
+    df["price_0"] = df["id"].astype("float64") # a numeric column without missing values
+    print(f"rows={rows:,} columns={len(df.columns)}")
+    with tempfile.TemporaryDirectory() as root:
+        for snapshot_format in FileSessionStore.SNAPSHOT_FORMATS:
+            storage_dir = os.path.join(root, snapshot_format)
+            store = FileSessionStore(storage_dir=storage_dir, cache_size=0, snapshot_format=snapshot_format)
+            store.save(Session(session_id="bench", initial_df=df))
+            size_mb = sum(e.stat().st_size for e in os.scandir(storage_dir)) / (1024 * 1024)
+
+            runs = []
+            for _ in range(3):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_session_load", "--child", storage_dir, snapshot_format],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            best = min(runs, key=lambda r: r["load_ms"])
+            print(f"  {snapshot_format:<8} file={size_mb:8.1f} MB  load={best['load_ms']:8.1f} ms  rss=+{best['load_rss_mb']:7.1f} MB"
+                  f"  touch one column={best['touch_ms']:6.1f} ms  rss=+{best['touch_rss_mb']:7.1f} MB")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(measure(sys.argv[2], sys.argv[3], "bench")))
+    else:
+        main(*(int(a) if i == 0 else a for i, a in enumerate(sys.argv[1:3])))
@@ -0,0 +1,150 @@
+"""
+Benchmark suite for the engine hot paths.
+
+Usage (from backend/):
+    python -m pytest benchmarks                                  # 10k rows, narrow + wide
+    python -m pytest benchmarks --bench-sizes 10k,1m,10m         # bigger datasets
+    python -m pytest benchmarks --bench-update-baseline          # record baseline.json
+
+Each benchmark records best-of-N wall time and peak traced memory (tracemalloc) to
+benchmarks/results.json. Entries present in benchmarks/baseline.json are checked
+against it; a benchmark fails when it is slower or uses more memory than the baseline
+allows (--bench-time-tolerance / --bench-memory-tolerance). Baselines are machine
+specific: record them on the machine that runs the comparison.
+"""
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.datasets import SIZES, SHAPES, make_dataset
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+
+# Timings below this are dominated by noise; never flag them as regressions
+MIN_TIME_SLACK_S = 0.005
+MIN_MEMORY_SLACK_MB = 1.0
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--bench-sizes", default="10k", help=f"Comma-separated dataset sizes: {','.join(SIZES)}")
+    group.addoption("--bench-shapes", default="narrow,wide", help=f"Comma-separated shapes: {','.join(SHAPES)}")
+    group.addoption("--bench-repeat", type=int, default=3, help="Timed runs per benchmark (best is kept)")
+    group.addoption("--bench-max-cells", type=float, default=2e8, help="Skip datasets with more rows x columns")
+    group.addoption("--bench-time-tolerance", type=float, default=0.5, help="Allowed slowdown vs baseline (0.5 = +50%%)")
+    group.addoption("--bench-memory-tolerance", type=float, default=0.25, help="Allowed peak memory growth vs baseline")
+    group.addoption("--bench-update-baseline", action="store_true", help="Write this run's results to baseline.json")
+
+class BenchRecorder:
+    def __init__(self, config):
+        self.config = config
+        self.repeat = config.getoption("--bench-repeat")
+        self.time_tolerance = config.getoption("--bench-time-tolerance")
+        self.memory_tolerance = config.getoption("--bench-memory-tolerance")
+        self.results: Dict[str, Dict[str, float]] = {}
+        self.baseline: Dict[str, Dict[str, float]] = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as f:
+                self.baseline = json.load(f).get("results", {})
+
+    def measure(self, name: str, func: Callable[..., Any], setup: Optional[Callable[[], Tuple]] = None) -> Dict[str, float]:
+        """
+        Times func(*setup()) and records its peak memory; setup runs untimed before every call.
+        """
+        best = float("inf")
+        for _ in range(self.repeat):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - start)
+
+        # Separate run for memory: tracing slows Python-level code down
+        args = setup() if setup else ()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {"seconds": round(best, 6), "peak_mb": round(peak / (1024 * 1024), 3)}
+        self.results[name] = result
+        self._check_regression(name, result)
+        return result
+
+    def _check_regression(self, name: str, result: Dict[str, float]) -> None:
+        base = self.baseline.get(name)
+        if base is None or self.config.getoption("--bench-update-baseline"):
+            return
+        time_limit = base["seconds"] * (1 + self.time_tolerance) + MIN_TIME_SLACK_S
+        memory_limit = base["peak_mb"] * (1 + self.memory_tolerance) + MIN_MEMORY_SLACK_MB
+        problems = []
+        if result["seconds"] > time_limit:
+            problems.append(f"time {result['seconds']:.4f}s > {time_limit:.4f}s (baseline {base['seconds']:.4f}s)")
+        if result["peak_mb"] > memory_limit:
+            problems.append(f"peak {result['peak_mb']:.1f}MB > {memory_limit:.1f}MB (baseline {base['peak_mb']:.1f}MB)")
+        if problems:
+            pytest.fail(f"Benchmark regression in {name}: " + "; ".join(problems))
+
+    def write(self) -> None:
+        if not self.results:
+            return
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "numpy": np.__version__,
+                "cpus": os.cpu_count(),
+                "machine": platform.machine(),
+            },
+            "results": dict(sorted(self.results.items())),
+        }
+        with open(RESULTS_PATH, "w") as f:
+            json.dump(report, f, indent=2)
+        if self.config.getoption("--bench-update-baseline"):
+            # Merge, so a partial run (e.g. only 1m) keeps the other sizes' baselines
+            report["results"] = dict(sorted({**self.baseline, **self.results}.items()))
+            with open(BASELINE_PATH, "w") as f:
+                json.dump(report, f, indent=2)
+
+def pytest_configure(config):
+    config._bench_recorder = BenchRecorder(config)
+
+def pytest_sessionfinish(session, exitstatus):
+    recorder = getattr(session.config, "_bench_recorder", None)
+    if recorder is not None:
+        recorder.write()
+
+def pytest_generate_tests(metafunc):
+    if "dataset" in metafunc.fixturenames:
+        sizes = [s.strip() for s in metafunc.config.getoption("--bench-sizes").split(",") if s.strip()]
+        shapes = [s.strip() for s in metafunc.config.getoption("--bench-shapes").split(",") if s.strip()]
+        unknown = [s for s in sizes if s not in SIZES] + [s for s in shapes if s not in SHAPES]
+        if unknown:
+            raise pytest.UsageError(f"Unknown benchmark sizes/shapes: {unknown}")
+        specs = [f"{size}-{shape}" for size in sizes for shape in shapes]
+        metafunc.parametrize("dataset", specs, indirect=True, scope="session")
+
+@pytest.fixture(scope="session")
+def bench(request) -> BenchRecorder:
+    return request.config._bench_recorder
+
+@pytest.fixture(scope="session")
+def dataset(request) -> Tuple[str, pd.DataFrame]:
+    """(spec id, DataFrame), e.g. ('1m-narrow', df). Generated once per session."""
+    size, shape = request.param.split("-")
+    rows = SIZES[size]
+    cells = rows * (len(make_dataset(1, shape).columns))
+    if cells > request.config.getoption("--bench-max-cells"):
+        pytest.skip(f"{request.param} exceeds --bench-max-cells")
+    return request.param, make_dataset(rows, shape)
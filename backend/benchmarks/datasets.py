@@ -0,0 +1,32 @@
+"""
+Synthetic datasets for the benchmark suite.
+"""
+import numpy as np
+import pandas as pd
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+# Extra float columns on top of the base schema
+SHAPES = {"narrow": 0, "wide": 92}
+
+def make_dataset(rows: int, shape: str = "narrow", seed: int = 0) -> pd.DataFrame:
+    """
+    Mixed-type frame resembling a typical upload: ids, low/high-cardinality strings,
+    numbers and dates stored as text, floats with ~5% missing values.
+    """
+    rng = np.random.default_rng(seed)
+    price = rng.normal(100, 25, rows)
+    price[rng.random(rows) < 0.05] = np.nan
+    columns = {
+        "id": np.arange(rows),
+        "group": rng.integers(0, 1_000, rows),
+        "category": rng.choice(np.array(["red", "green", "blue", "yellow"], dtype=object), rows),
+        "label": pd.Series(rng.integers(0, max(rows // 10, 1), rows)).astype(str).radd("k").to_numpy(dtype=object),
+        "price": price,
+        "quantity": rng.integers(1, 50, rows),
+        "flag": rng.random(rows) < 0.5,
+        "numeric_text": rng.integers(0, 1_000, rows).astype(str).astype(object),
+        "day": (np.datetime64("2024-01-01") + rng.integers(0, 365, rows)).astype(str).astype(object),
+    }
+    for i in range(SHAPES[shape]):
+        columns[f"x{i}"] = rng.random(rows)
+    return pd.DataFrame(columns)
@@ -0,0 +1,117 @@
+import os
+import pytest
+from engine.actions import ActionRegistry
+from engine.code_generator import CodeGenerator
+from engine.dataset_loader import DatasetLoader
+from engine.profiler import Profiler
+from engine.session import Session
+from engine.session_store import FileSessionStore
+from schemas.api import ActionSpec
+
+# Representative params per action for the make_dataset schema
+ACTION_PARAMS = {
+    "drop_column": {"column": "flag"},
+    "filter_rows": {"column": "price", "operator": ">", "value": 100},
+    "rename_column": {"old_name": "price", "new_name": "unit_price"},
+    "drop_na": {"subset": ["price"]},
+    "fill_na": {"value": 0, "columns": ["price"]},
+    "astype": {"column": "numeric_text", "dtype": "int"},
+    "groupby_agg": {"group_by": ["category"], "aggregations": {"price": ["mean", "sum"], "quantity": "max"}},
+    "math_transform": {"target_col": "price", "function": "abs", "new_col_name": "price_abs"},
+    "conditional": {"column": "price", "operator": ">", "value": 100, "true_val": "high", "false_val": "low", "new_col": "band"},
+    "optimize_memory": {"dtypes": {"group": "int16", "quantity": "int8", "category": "category"}},
+    "expression": {"expression": "price * quantity - 1", "new_col": "total"},
+    "sort_values": {"column": "label"},
+    "to_datetime": {"column": "day", "format": "%Y-%m-%d"},
+    "normalize_text": {"columns": ["category", "label"], "case": "upper"},
+    "drop_duplicates": {"subset": ["group", "category"]},
+}
+
+UNDO_DEPTHS = [1, 10, 50]
+
+def test_every_action_has_a_benchmark():
+    assert set(ACTION_PARAMS) == set(ActionRegistry._actions)
+
+@pytest.mark.parametrize("file_type", ["csv", "json"])
+def test_load_dataset(bench, dataset, file_type, tmp_path_factory):
+    name, df = dataset
+    if file_type == "json" and len(df) > 1_000_000:
+        pytest.skip("JSON arrays this large are not a realistic upload")
+    path = str(tmp_path_factory.mktemp("load") / f"data.{file_type}")
+    if file_type == "csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient="records")
+
+    bench.measure(f"load_dataset[{file_type}][{name}]", lambda: DatasetLoader.load_dataset(path, file_type))
+
+@pytest.mark.parametrize("action", sorted(ACTION_PARAMS))
+def test_action(bench, dataset, action):
+    name, df = dataset
+    params = ACTION_PARAMS[action]
+    bench.measure(f"action[{action}][{name}]", lambda: ActionRegistry.execute(df, action, params))
+
+def test_sort_values_cached(bench, dataset):
+    name, df = dataset
+    cache = {}
+    ActionRegistry.execute(df, "sort_values", {"column": "label"}, cache=cache)
+    bench.measure(
+        f"action[sort_values-cached-desc][{name}]",
+        lambda: ActionRegistry.execute(df, "sort_values", {"column": "label", "ascending": False}, cache=cache)
+    )
+
+def _history(depth: int):
+    # Cheap full-frame steps, so replay cost scales with depth
+    steps = [
+        {"action": "fill_na", "params": {"value": 0, "columns": ["price"]}},
+        {"action": "math_transform", "params": {"target_col": "price", "function": "abs", "new_col_name": "price"}},
+    ]
+    return [ActionSpec(intent=f"Step {i}", operations=[steps[i % 2]]) for i in range(depth)]
+
+@pytest.mark.parametrize("depth", UNDO_DEPTHS)
+def test_session_undo(bench, dataset, depth):
+    name, df = dataset
+    session = Session("bench-undo", df)
+    for action in _history(depth):
+        session.apply_action(action)
+    current = session.get_current_df()
+
+    def setup():
+        session.current_step = depth - 1
+        session._current_df_cache = current
+        return ()
+
+    def undo():
+        session.undo()
+        session.get_current_df()
+
+    bench.measure(f"session_undo[depth={depth}][{name}]", undo, setup)
+
+def test_profile_dataset(bench, dataset):
+    name, df = dataset
+    bench.measure(f"profile_dataset[{name}]", lambda: Profiler.profile_dataset(df))
+
+def test_session_store(bench, dataset, tmp_path_factory):
+    name, df = dataset
+    # No in-memory cache: measure the disk round trip
+    store = FileSessionStore(storage_dir=str(tmp_path_factory.mktemp("sessions")), cache_size=0)
+    session = Session("bench-store", df)
+    for action in _history(2):
+        session.apply_action(action)
+
+    def fresh_save():
+        store.delete(session.session_id)
+        return ()
+
+    bench.measure(f"session_store_save[{name}]", lambda: store.save(session), fresh_save)
+    store.save(session)
+    bench.measure(f"session_store_load[{name}]", lambda: store.load(session.session_id).get_current_df())
+
+@pytest.mark.parametrize("fmt", ["py", "ipynb"])
+def test_code_generator(bench, fmt):
+    actions = [
+        ActionSpec(intent=f"Step {i}", operations=[{"action": action, "params": params}])
+        for i, (action, params) in enumerate(list(ACTION_PARAMS.items()) * 5)
+    ]
+    generate = CodeGenerator.generate_notebook if fmt == "ipynb" else CodeGenerator.generate_script
+    bench.measure(f"code_generator[{fmt}][{len(actions)} actions]", lambda: generate(actions, "/data/input.csv", "csv"))
@@ -1,5 +1,11 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from typing import Dict, Any, Callable, Optional
+import numpy as np
+from typing import Dict, Any, Callable, Optional, List, Tuple, Union
+from engine.expression_parser import ExpressionParser
+from engine.telemetry import Stopwatch, metrics
 
 class ActionRegistry:
     """
@@ -7,12 +13,36 @@ class ActionRegistry:
     """
     _actions: Dict[str, Callable] = {}
     _templates: Dict[str, str] = {}
+    _renderers: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+    _cache_aware: set = set()
+    _row_local: set = set()
+    _inputs: Dict[str, Callable[[Dict[str, Any]], List[str]]] = {}
 
     @classmethod
-    def register(cls, name: str, template: str):
+    def register(cls, name: str, template: str, renderer: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 uses_cache: bool = False, row_local: bool = False,
+                 inputs: Optional[Callable[[Dict[str, Any]], List[str]]] = None):
+        """
+        Registers an action. `template` is a str.format pattern filled with quoted params.
+        Actions whose code depends on the shape of their params can pass a `renderer`
+        that receives the raw params and returns the code itself.
+        Actions with `uses_cache` receive a `cache` dict scoped to their input state (see Session).
+        `row_local` marks actions whose output rows depend only on the matching input rows
+        (filters, column edits), so they can run on row chunks independently.
+        `inputs` maps params to the columns whose values the action reads; exported code
+        skips reading source columns no action needs (see CodeGenerator).
+        """
         def decorator(func: Callable):
             cls._actions[name] = func
             cls._templates[name] = template
+            if renderer is not None:
+                cls._renderers[name] = renderer
+            if inputs is not None:
+                cls._inputs[name] = inputs
+            if uses_cache:
+                cls._cache_aware.add(name)
+            if row_local:
+                cls._row_local.add(name)
             return func
         return decorator
 
@@ -29,13 +59,84 @@ class ActionRegistry:
         return cls._templates[name]
 
     @classmethod
-    def execute(cls, df: pd.DataFrame, action: str, params: Dict[str, Any]) -> pd.DataFrame:
+    def get_renderer(cls, name: str) -> Optional[Callable[[Dict[str, Any]], str]]:
+        return cls._renderers.get(name)
+
+    @classmethod
+    def is_row_local(cls, name: str) -> bool:
+        return name in cls._row_local
+
+    @classmethod
+    def get_inputs(cls, name: str) -> Optional[Callable[[Dict[str, Any]], List[str]]]:
+        return cls._inputs.get(name)
+
+    @classmethod
+    def execute(cls, df: pd.DataFrame, action: str, params: Dict[str, Any], cache: Optional[Dict[Any, Any]] = None,
+                stats: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
+        """
+        Runs an action and records its latency and row counts in the metrics registry.
+        If `stats` is given, it is filled with this execution's telemetry.
+        """
         func = cls.get_action(action)
-        return func(df, **params)
+        labels = {"action": action}
+        try:
+            with Stopwatch() as watch:
+                if cache is not None and action in cls._cache_aware:
+                    result = func(df, **params, cache=cache)
+                else:
+                    result = func(df, **params)
+        except Exception:
+            metrics.inc("numpanda_action_errors_total", labels)
+            raise
+        finally:
+            metrics.observe("numpanda_action_duration_seconds", watch.seconds, labels)
+
+        metrics.inc("numpanda_action_rows_in_total", labels, len(df))
+        metrics.inc("numpanda_action_rows_out_total", labels, len(result))
+        if stats is not None:
+            stats.update({
+                "wall_ms": watch.seconds * 1000,
+                "peak_rss_delta_mb": watch.peak_rss_delta_mb,
+                "rows_in": len(df),
+                "columns_in": len(df.columns),
+                "rows_out": len(result),
+                "columns_out": len(result.columns),
+            })
+        return result
+
+# Shared helpers for multi-column actions
+
+# Below this many cells, thread start-up costs more than the per-column work
+PARALLEL_MIN_CELLS = 1_000_000
+
+def _map_columns(func: Callable[[pd.Series], pd.Series], df: pd.DataFrame, columns: list) -> List[pd.Series]:
+    """
+    Applies func to each column, on a thread pool for large inputs.
+    NumPy/pandas kernels release the GIL, so columns are processed concurrently.
+    """
+    if len(columns) > 1 and len(df) * len(columns) >= PARALLEL_MIN_CELLS:
+        with ThreadPoolExecutor(max_workers=min(len(columns), os.cpu_count() or 1)) as pool:
+            return list(pool.map(lambda c: func(df[c]), columns))
+    return [func(df[c]) for c in columns]
+
+def _assign_columns(df: pd.DataFrame, names: list, results: List[pd.Series]) -> pd.DataFrame:
+    """
+    Returns a copy of df with all computed columns set in a single assignment.
+    """
+    df = df.copy()
+    df[names] = pd.DataFrame(dict(zip(names, results)), index=df.index)
+    return df
+
+def _resolve_columns(single: Optional[str], many: Optional[list], label: str) -> list:
+    # Multi-column actions accept either the original single-column param or a list
+    columns = many if many is not None else ([single] if single is not None else [])
+    if not columns:
+        raise ValueError(f"No {label} given.")
+    return columns
 
 # Define basic actions
 
-@ActionRegistry.register("drop_column", "df = df.drop(columns=[{column}])")
+@ActionRegistry.register("drop_column", "df = df.drop(columns=[{column}])", row_local=True, inputs=lambda p: [])
 def drop_column(df: pd.DataFrame, column: str) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found.")
@@ -43,7 +144,9 @@ def drop_column(df: pd.DataFrame, column: str) -> pd.DataFrame:
 
 @ActionRegistry.register(
     "filter_rows", 
-    "df = df[df[{column}] {operator} {value}]" 
+    "df = df[df[{column}] {operator} {value}]",
+    row_local=True,
+    inputs=lambda p: [p['column']]
 )
 def filter_rows(df: pd.DataFrame, column: str, operator: str, value: Any) -> pd.DataFrame:
     if column not in df.columns:
@@ -64,13 +167,14 @@ def filter_rows(df: pd.DataFrame, column: str, operator: str, value: Any) -> pd.
     else:
         raise ValueError(f"Unsupported operator: {operator}")
 
-@ActionRegistry.register("rename_column", "df = df.rename(columns={{{old_name}: {new_name}}})")
+@ActionRegistry.register("rename_column", "df = df.rename(columns={{{old_name}: {new_name}}})", row_local=True,
+                         inputs=lambda p: [])
 def rename_column(df: pd.DataFrame, old_name: str, new_name: str) -> pd.DataFrame:
     if old_name not in df.columns:
         raise ValueError(f"Column '{old_name}' not found.")
     return df.rename(columns={old_name: new_name})
 
-@ActionRegistry.register("drop_na", "df = df.dropna(subset={subset})")
+@ActionRegistry.register("drop_na", "df = df.dropna(subset={subset})", row_local=True, inputs=lambda p: list(p['subset']))
 def drop_na(df: pd.DataFrame, subset: list) -> pd.DataFrame:
     # validate columns
     missing = [c for c in subset if c not in df.columns]
@@ -78,23 +182,35 @@ def drop_na(df: pd.DataFrame, subset: list) -> pd.DataFrame:
         raise ValueError(f"Columns not found: {missing}")
     return df.dropna(subset=subset)
 
-@ActionRegistry.register("fill_na", "df[{columns}] = df[{columns}].fillna({value})")
+@ActionRegistry.register("fill_na", "df[{columns}] = df[{columns}].fillna({value})", row_local=True,
+                         inputs=lambda p: list(p['columns']))
 def fill_na(df: pd.DataFrame, value: Any, columns: list) -> pd.DataFrame:
     # validate columns
     missing = [c for c in columns if c not in df.columns]
     if missing:
         raise ValueError(f"Columns not found: {missing}")
     
-    # We apply to specific columns
-    # Optimization: Pandas copy warning handling
-    df = df.copy() 
-    df[columns] = df[columns].fillna(value)
-    return df
+    # We apply to specific columns, copying the frame once
+    if isinstance(value, dict):
+        # Per-column fill values, like DataFrame.fillna(dict)
+        results = _map_columns(lambda s: s.fillna(value[s.name]) if s.name in value else s, df, columns)
+    else:
+        results = _map_columns(lambda s: s.fillna(value), df, columns)
+    return _assign_columns(df, columns, results)
 
-@ActionRegistry.register("astype", "df[{column}] = df[{column}].astype({dtype})")
-def astype(df: pd.DataFrame, column: str, dtype: str) -> pd.DataFrame:
-    if column not in df.columns:
-        raise ValueError(f"Column '{column}' not found.")
+def _render_astype(params: Dict[str, Any]) -> str:
+    dtype = params['dtype']
+    if params.get('columns') is None:
+        return f"df[{params['column']!r}] = df[{params['column']!r}].astype({dtype!r})"
+    return f"df[{params['columns']!r}] = df[{params['columns']!r}].astype({dtype!r})"
+
+@ActionRegistry.register("astype", "df[{column}] = df[{column}].astype({dtype})", renderer=_render_astype, row_local=True,
+                         inputs=lambda p: _resolve_columns(p.get('column'), p.get('columns'), "column"))
+def astype(df: pd.DataFrame, dtype: str, column: Optional[str] = None, columns: Optional[list] = None) -> pd.DataFrame:
+    columns = _resolve_columns(column, columns, "column")
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
     
     # Whitelist safety
     ALLOWED_TYPES = ['int', 'float', 'str', 'bool']
@@ -106,15 +222,145 @@ def astype(df: pd.DataFrame, column: str, dtype: str) -> pd.DataFrame:
          else:
             raise ValueError(f"Unsupported dtype: {dtype}. Allowed: {ALLOWED_TYPES}")
     
-    df = df.copy()
     try:
-        df[column] = df[column].astype(dtype)
+        results = _map_columns(lambda s: s.astype(dtype), df, columns)
     except ValueError as e:
         raise ValueError(f"Conversion failed: {str(e)}")
-    return df
+    return _assign_columns(df, columns, results)
 
-@ActionRegistry.register("groupby_agg", "df = df.groupby({group_by}).agg({aggregations}).reset_index()")
-def groupby_agg(df: pd.DataFrame, group_by: list, aggregations: Dict[str, str]) -> pd.DataFrame:
+GROUPBY_FUNCS = ['sum', 'mean', 'count', 'min', 'max', 'first', 'last', 'nunique', 'median', 'std', 'var']
+# Aggregations the Arrow engine computes exactly like pandas (pyarrow hash_* kernels)
+ARROW_GROUPBY_FUNCS = {'sum': 'sum', 'mean': 'mean', 'count': 'count', 'min': 'min', 'max': 'max', 'nunique': 'count_distinct'}
+# 'auto' only picks Arrow where it wins in benchmarks/bench_groupby.py: large inputs, numeric keys and
+# several cores. Below that, converting to Arrow costs more than pandas' unsorted hash groupby.
+# (count_distinct is markedly slower than pandas' nunique, so it never triggers Arrow on its own.)
+ARROW_GROUPBY_MIN_ROWS = 1_000_000
+ARROW_GROUPBY_MIN_CPUS = 4
+_QUANTILE_FUNC = re.compile(r'^p(\d{1,2}|100)$') # 'p50', 'p90', ... -> quantile(0.5), quantile(0.9)
+
+def _normalize_aggregations(aggregations: Dict[str, Union[str, List[str]]]) -> List[Tuple[str, str, str]]:
+    """
+    Flattens {column: func | [funcs]} into (column, func, output_name) triples.
+    A column with a single func keeps its name; otherwise outputs are named '<column>_<func>'.
+    """
+    single = all(isinstance(funcs, str) for funcs in aggregations.values())
+    specs = []
+    for col, funcs in aggregations.items():
+        for func in ([funcs] if isinstance(funcs, str) else funcs):
+            if func not in GROUPBY_FUNCS and not _QUANTILE_FUNC.match(func):
+                raise ValueError(f"Aggregation function '{func}' not allowed. Allowed: {GROUPBY_FUNCS} or quantiles 'p0'..'p100'.")
+            specs.append((col, func, col if single else f"{col}_{func}"))
+    return specs
+
+def _is_simple_agg(specs: List[Tuple[str, str, str]]) -> bool:
+    # One non-quantile func per column: plain df.groupby(...).agg(dict) covers it
+    return all(col == name for col, _, name in specs) and not any(_QUANTILE_FUNC.match(f) for _, f, _ in specs)
+
+def _groupby_pandas(df: pd.DataFrame, group_by: list, specs: List[Tuple[str, str, str]]) -> pd.DataFrame:
+    # Hash grouping in order of first appearance; only categories that actually occur
+    grouped = df.groupby(group_by, sort=False, observed=True)
+    if _is_simple_agg(specs):
+        return grouped.agg({col: func for col, func, _ in specs}).reset_index()
+
+    # One cythonized reduction per output instead of a Python lambda per group
+    results = {}
+    for col, func, name in specs:
+        quantile = _QUANTILE_FUNC.match(func)
+        if quantile:
+            results[name] = grouped[col].quantile(int(quantile.group(1)) / 100)
+        else:
+            results[name] = grouped[col].agg(func)
+    return pd.concat(results, axis=1).reset_index()
+
+def _groupby_arrow(df: pd.DataFrame, group_by: list, specs: List[Tuple[str, str, str]]) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # pandas drops rows with missing keys; Arrow would group them together
+    keyed = df[group_by + sorted({col for col, _, _ in specs} - set(group_by))]
+    keyed = keyed[keyed[group_by].notna().all(axis=1)]
+    table = pa.Table.from_pandas(keyed, preserve_index=False)
+    # Row numbers let us restore pandas' first-appearance group order after threaded hashing
+    table = table.append_column('__row__', pa.array(np.arange(len(table), dtype=np.int64)))
+
+    aggs = [('__row__', 'min')]
+    for col, func, _ in specs:
+        if func == 'sum':
+            # pandas sums an all-NaN group to 0, Arrow to null by default
+            aggs.append((col, 'sum', pc.ScalarAggregateOptions(min_count=0)))
+        else:
+            aggs.append((col, ARROW_GROUPBY_FUNCS[func]))
+
+    result = table.group_by(group_by, use_threads=True).aggregate(aggs)
+    result = result.take(pc.sort_indices(result['__row___min']))
+
+    columns = {name: result[f"{col}_{ARROW_GROUPBY_FUNCS[func]}"] for col, func, name in specs}
+    out = pa.table({**{key: result[key] for key in group_by}, **columns})
+    return out.to_pandas()
+
+def _render_groupby_agg(params: Dict[str, Any]) -> str:
+    group_by = params['group_by']
+    specs = _normalize_aggregations(params['aggregations'])
+    if _is_simple_agg(specs):
+        aggregations = {col: func for col, func, _ in specs}
+        return f"df = df.groupby({group_by!r}, sort=False, observed=True).agg({aggregations!r}).reset_index()"
+
+    results = []
+    for col, func, name in specs:
+        quantile = _QUANTILE_FUNC.match(func)
+        call = f"quantile({int(quantile.group(1)) / 100})" if quantile else f"{func}()"
+        results.append(f"{name!r}: _g[{col!r}].{call}")
+    return "\n".join([
+        f"_g = df.groupby({group_by!r}, sort=False, observed=True)",
+        f"df = pd.concat({{{', '.join(results)}}}, axis=1).reset_index()",
+    ])
+
+# Aggregations that combine from per-chunk partial results: func -> how partials combine
+# ('mean' is carried as a sum and a count)
+PARTIAL_GROUPBY_COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max', 'first': 'first', 'last': 'last', 'mean': None}
+
+def render_partial_groupby_agg(params: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Two-phase groupby_agg for chunked pipelines (see CodeGenerator.generate_chunked_script):
+    the first code block aggregates a chunk `df` into `partial`, the second combines the
+    concatenated partials `parts` into `df`, giving the same result as one groupby_agg.
+    None when an aggregation does not decompose (nunique, median, std, var, quantiles).
+    """
+    group_by = params['group_by']
+    specs = _normalize_aggregations(params['aggregations'])
+    if any(func not in PARTIAL_GROUPBY_COMBINE for _, func, _ in specs):
+        return None
+
+    partials: Dict[str, str] = {}
+    combined = []
+    for col, func, name in specs:
+        if func == 'mean':
+            total, count = f"{col}__sum", f"{col}__count"
+            partials[total] = f"_g[{col!r}].sum()"
+            partials[count] = f"_g[{col!r}].count()"
+            combined.append(f"{name!r}: _g[{total!r}].sum() / _g[{count!r}].sum()")
+        else:
+            part = f"{col}__{func}"
+            partials[part] = f"_g[{col!r}].{func}()"
+            combined.append(f"{name!r}: _g[{part!r}].{PARTIAL_GROUPBY_COMBINE[func]}()")
+
+    partial_code = "\n".join([
+        f"_g = df.groupby({group_by!r}, sort=False, observed=True)",
+        f"partial = pd.concat({{{', '.join(f'{k!r}: {v}' for k, v in partials.items())}}}, axis=1).reset_index()",
+    ])
+    combine_code = "\n".join([
+        f"_g = parts.groupby({group_by!r}, sort=False, observed=True)",
+        f"df = pd.concat({{{', '.join(combined)}}}, axis=1).reset_index()",
+    ])
+    return partial_code, combine_code
+
+@ActionRegistry.register(
+    "groupby_agg",
+    "df = df.groupby({group_by}, sort=False, observed=True).agg({aggregations}).reset_index()",
+    renderer=_render_groupby_agg,
+    inputs=lambda p: list(p['group_by']) + list(p['aggregations'])
+)
+def groupby_agg(df: pd.DataFrame, group_by: list, aggregations: Dict[str, Union[str, List[str]]], engine: str = 'auto') -> pd.DataFrame:
     # Validate group cols
     missing = [c for c in group_by if c not in df.columns]
     if missing:
@@ -126,44 +372,93 @@ def groupby_agg(df: pd.DataFrame, group_by: list, aggregations: Dict[str, str])
              raise ValueError(f"Aggregation target column '{col}' not found.")
              
     # Validate agg funcs
-    ALLOWED_FUNCS = ['sum', 'mean', 'count', 'min', 'max', 'first', 'last']
-    for func in aggregations.values():
-        if func not in ALLOWED_FUNCS:
-            raise ValueError(f"Aggregation function '{func}' not allowed.")
+    specs = _normalize_aggregations(aggregations)
 
-    return df.groupby(group_by).agg(aggregations).reset_index()
+    if engine not in ['auto', 'pandas', 'arrow']:
+        raise ValueError(f"Unsupported groupby engine: {engine}")
 
-import numpy as np
+    arrow_capable = (
+        all(func in ARROW_GROUPBY_FUNCS for _, func, _ in specs)
+        and not any(isinstance(df[c].dtype, pd.CategoricalDtype) for c in group_by)
+    )
+    if engine == 'arrow' and not arrow_capable:
+        raise ValueError(f"Arrow engine supports {list(ARROW_GROUPBY_FUNCS)} on non-categorical keys only.")
+    arrow_preferred = (
+        arrow_capable
+        and len(df) >= ARROW_GROUPBY_MIN_ROWS
+        and (os.cpu_count() or 1) >= ARROW_GROUPBY_MIN_CPUS
+        and all(pd.api.types.is_numeric_dtype(df[c]) for c in group_by)
+        and not any(func == 'nunique' for _, func, _ in specs)
+    )
+    if engine == 'arrow' or (engine == 'auto' and arrow_preferred):
+        return _groupby_arrow(df, group_by, specs)
+    return _groupby_pandas(df, group_by, specs)
 
-@ActionRegistry.register("math_transform", "df[{new_col_name}] = np.{function}(df[{target_col}])")
-def math_transform(df: pd.DataFrame, target_col: str, function: str, new_col_name: str) -> pd.DataFrame:
-    if target_col not in df.columns:
-        raise ValueError(f"Column '{target_col}' not found")
-        
-    if not pd.api.types.is_numeric_dtype(df[target_col]):
-        raise ValueError(f"Column '{target_col}' must be numeric")
-
-    ALLOWED_FUNCS = {
-        'log': np.log,
-        'sqrt': np.sqrt,
-        'ceil': np.ceil,
-        'round': np.round,
-        'abs': np.abs
-    }
-    
-    if function not in ALLOWED_FUNCS:
-        raise ValueError(f"Function '{function}' not allowed. Whitelist: {list(ALLOWED_FUNCS.keys())}")
+MATH_FUNCS = {
+    'log': np.log,
+    'sqrt': np.sqrt,
+    'ceil': np.ceil,
+    'round': np.round,
+    'abs': np.abs
+}
+
+def _render_math_transform(params: Dict[str, Any]) -> str:
+    function = params['function']
+    if function not in MATH_FUNCS:
+        raise ValueError(f"Function '{function}' not allowed.")
+    if params.get('target_cols') is None:
+        return f"df[{params['new_col_name']!r}] = np.{function}(df[{params['target_col']!r}])"
+
+    # One ufunc call over the column block, relabelled to the output names
+    targets = params['target_cols']
+    names = params.get('new_col_names') or [f"{c}_{function}" for c in targets]
+    if names == targets:
+        return f"df[{targets!r}] = np.{function}(df[{targets!r}])"
+    return f"df[{names!r}] = np.{function}(df[{targets!r}]).set_axis({names!r}, axis=1)"
+
+@ActionRegistry.register(
+    "math_transform",
+    "df[{new_col_name}] = np.{function}(df[{target_col}])",
+    renderer=_render_math_transform,
+    row_local=True,
+    inputs=lambda p: _resolve_columns(p.get('target_col'), p.get('target_cols'), "target column")
+)
+def math_transform(df: pd.DataFrame, function: str, target_col: Optional[str] = None, new_col_name: Optional[str] = None,
+                   target_cols: Optional[list] = None, new_col_names: Optional[list] = None) -> pd.DataFrame:
+    targets = _resolve_columns(target_col, target_cols, "target column")
+    if target_cols is None:
+        if new_col_name is None:
+            raise ValueError("No new column name given.")
+        names = [new_col_name]
+    else:
+        # Default output names: '<column>_<function>'
+        names = new_col_names if new_col_names is not None else [f"{c}_{function}" for c in target_cols]
+        if len(names) != len(targets):
+            raise ValueError("new_col_names must match target_cols in length")
+
+    for col in targets:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found")
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            raise ValueError(f"Column '{col}' must be numeric")
+
+    if function not in MATH_FUNCS:
+        raise ValueError(f"Function '{function}' not allowed. Whitelist: {list(MATH_FUNCS.keys())}")
     
-    df = df.copy()
     try:
         # Avoid log(0) issues if possible or let numpy warn/inf
-        df[new_col_name] = ALLOWED_FUNCS[function](df[target_col])
+        results = _map_columns(MATH_FUNCS[function], df, targets)
     except Exception as e:
         raise ValueError(f"Math transform failed: {e}")
         
-    return df
+    return _assign_columns(df, names, results)
 
-@ActionRegistry.register("conditional", "df[{new_col}] = np.where(df[{column}] {operator} {value}, {true_val}, {false_val})")
+@ActionRegistry.register(
+    "conditional",
+    "df[{new_col}] = np.where(df[{column}] {operator} {value}, {true_val}, {false_val})",
+    row_local=True,
+    inputs=lambda p: [p['column']]
+)
 def conditional(df: pd.DataFrame, column: str, operator: str, value: Any, true_val: Any, false_val: Any, new_col: str) -> pd.DataFrame:
     if column not in df.columns:
         raise ValueError(f"Column '{column}' not found")
@@ -189,3 +484,202 @@ def conditional(df: pd.DataFrame, column: str, operator: str, value: Any, true_v
         
     df[new_col] = np.where(mask, true_val, false_val)
     return df
+
+@ActionRegistry.register("optimize_memory", "df = df.astype({dtypes})", row_local=True, inputs=lambda p: list(p['dtypes']))
+def optimize_memory(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    missing = [c for c in dtypes if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+
+    # Whitelist: only compact storage types (see Profiler.plan_memory_optimization)
+    ALLOWED_TYPES = ['int8', 'int16', 'int32', 'int64', 'uint8', 'uint16', 'uint32', 'uint64',
+                     'float32', 'float64', 'category']
+    for col, dtype in dtypes.items():
+        if dtype not in ALLOWED_TYPES:
+            raise ValueError(f"Unsupported dtype for '{col}': {dtype}. Allowed: {ALLOWED_TYPES}")
+        # astype silently wraps integers that overflow the target type
+        if dtype.startswith(('int', 'uint')) and pd.api.types.is_numeric_dtype(df[col]) and df[col].notna().any():
+            info = np.iinfo(dtype)
+            if df[col].min() < info.min or df[col].max() > info.max:
+                raise ValueError(f"Column '{col}' does not fit in {dtype}")
+
+    try:
+        return df.astype(dtypes)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Conversion failed: {str(e)}")
+
+@ActionRegistry.register("expression", "df[{new_col}] = df.eval({expression})", row_local=True,
+                         inputs=lambda p: ExpressionParser.referenced_columns(p['expression']))
+def expression(df: pd.DataFrame, expression: str, new_col: str) -> pd.DataFrame:
+    # Strict whitelist first: DataFrame.eval itself would accept attribute access, @locals, etc.
+    ExpressionParser.validate(expression, list(df.columns))
+
+    try:
+        # Single vectorized pass (numexpr evaluates without intermediate arrays when available)
+        result = df.eval(expression)
+    except Exception as e:
+        raise ValueError(f"Expression failed: {e}")
+
+    df = df.copy()
+    df[new_col] = result
+    return df
+
+def _sort_codes(series: pd.Series, cache: Optional[Dict[Any, Any]], key: Any) -> Tuple[np.ndarray, int]:
+    """
+    Dense ascending rank of each value (-1 for missing) and the number of distinct values.
+    This factorization is the expensive part of a sort, so it is cached per input state and column.
+    """
+    if cache is not None and key in cache:
+        return cache[key]
+    try:
+        codes, uniques = pd.factorize(series, sort=True)
+    except TypeError as e:
+        raise ValueError(f"Column '{series.name}' cannot be sorted: {e}")
+    result = (codes.astype(np.int64, copy=False), len(uniques))
+    if cache is not None:
+        cache[key] = result
+    return result
+
+def sort_permutation(df: pd.DataFrame, columns: list, ascending: List[bool], na_position: str = 'last',
+                     limit: Optional[int] = None, cache: Optional[Dict[Any, Any]] = None) -> np.ndarray:
+    """
+    Row positions of df in stable sorted order (same as sort_values(kind='stable')).
+    With `limit`, only the first `limit` positions are selected (argpartition) and sorted.
+    """
+    n = len(df)
+    combined = np.zeros(n, dtype=np.int64)
+    radix_total = 1
+    for col, asc in zip(columns, ascending):
+        codes, k = _sort_codes(df[col], cache, ('sort_codes', col))
+        # Flip for descending and place missing values first or last; result is in [0, k]
+        ranked = codes if asc else np.where(codes >= 0, k - 1 - codes, -1)
+        if na_position == 'last':
+            ranked = np.where(codes >= 0, ranked, k)
+        else:
+            ranked = ranked + 1
+        if radix_total * (k + 1) >= 2 ** 62:
+            # Re-densify before the mixed-radix key would overflow
+            combined = pd.factorize(combined, sort=True)[0].astype(np.int64)
+            radix_total = int(combined.max()) + 1 if n else 1
+        combined = combined * (k + 1) + ranked
+        radix_total *= k + 1
+
+    if limit is not None and 0 <= limit < n:
+        # Ties broken by position so the selected top-k matches the stable full sort
+        if radix_total * n >= 2 ** 62:
+            combined = pd.factorize(combined, sort=True)[0].astype(np.int64)
+        unique_key = combined * n + np.arange(n, dtype=np.int64)
+        if limit == 0:
+            return np.empty(0, dtype=np.intp)
+        top = np.argpartition(unique_key, limit - 1)[:limit]
+        return top[np.argsort(unique_key[top])]
+    return np.argsort(combined, kind='stable')
+
+def _sort_args(column: Optional[str], columns: Optional[list], ascending: Union[bool, List[bool]]) -> Tuple[list, List[bool]]:
+    columns = _resolve_columns(column, columns, "sort column")
+    if isinstance(ascending, list):
+        if len(ascending) != len(columns):
+            raise ValueError("ascending must be a bool or one bool per sort column")
+        return columns, [bool(a) for a in ascending]
+    return columns, [bool(ascending)] * len(columns)
+
+def _render_sort_values(params: Dict[str, Any]) -> str:
+    columns, ascending = _sort_args(params.get('column'), params.get('columns'), params.get('ascending', True))
+    na_position = params.get('na_position', 'last')
+    by = columns[0] if len(columns) == 1 else columns
+    asc = ascending[0] if len(set(ascending)) == 1 else ascending
+    code = f"df = df.sort_values(by={by!r}, ascending={asc!r}, na_position={na_position!r}, kind='stable')"
+    if params.get('limit') is not None:
+        code += f".head({int(params['limit'])})"
+    return code
+
+@ActionRegistry.register(
+    "sort_values",
+    "df = df.sort_values(by={column}, ascending={ascending}, kind='stable')",
+    renderer=_render_sort_values,
+    uses_cache=True,
+    inputs=lambda p: _sort_args(p.get('column'), p.get('columns'), True)[0]
+)
+def sort_values(df: pd.DataFrame, column: Optional[str] = None, columns: Optional[list] = None,
+                ascending: Union[bool, List[bool]] = True, na_position: str = 'last', limit: Optional[int] = None,
+                cache: Optional[Dict[Any, Any]] = None) -> pd.DataFrame:
+    columns, ascending = _sort_args(column, columns, ascending)
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+    if na_position not in ['first', 'last']:
+        raise ValueError(f"Unsupported na_position: {na_position}")
+    if limit is not None and (not isinstance(limit, int) or limit < 0):
+        raise ValueError("limit must be a non-negative integer")
+
+    return df.take(sort_permutation(df, columns, ascending, na_position, limit, cache))
+
+def _render_to_datetime(params: Dict[str, Any]) -> str:
+    columns = _resolve_columns(params.get('column'), params.get('columns'), "column")
+    fmt = params.get('format')
+    errors = ", errors='coerce'" if params.get('errors', 'raise') == 'coerce' else ""
+    return "\n".join(f"df[{c!r}] = pd.to_datetime(df[{c!r}], format={fmt!r}{errors})" for c in columns)
+
+@ActionRegistry.register("to_datetime", "df[{column}] = pd.to_datetime(df[{column}], format={format})",
+                         renderer=_render_to_datetime, row_local=True,
+                         inputs=lambda p: _resolve_columns(p.get('column'), p.get('columns'), "column"))
+def to_datetime(df: pd.DataFrame, column: Optional[str] = None, columns: Optional[list] = None,
+                format: Optional[str] = None, errors: str = 'raise') -> pd.DataFrame:
+    """errors='coerce' turns values that don't parse into NaT instead of failing."""
+    columns = _resolve_columns(column, columns, "column")
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+    if errors not in ['raise', 'coerce']:
+        raise ValueError(f"Unsupported errors: {errors}")
+    try:
+        results = _map_columns(lambda s: pd.to_datetime(s, format=format, errors=errors), df, columns)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Conversion failed: {str(e)}")
+    return _assign_columns(df, columns, results)
+
+TEXT_CASES = ['lower', 'upper', 'title']
+
+def _render_normalize_text(params: Dict[str, Any]) -> str:
+    expr = "df[{0!r}].str.strip()" if params.get('strip', True) else "df[{0!r}]"
+    if params.get('case') is not None:
+        expr += f".str.{params['case']}()"
+    return "\n".join(f"df[{c!r}] = " + expr.format(c) for c in params['columns'])
+
+@ActionRegistry.register("normalize_text", "df[{columns}] = df[{columns}].str.strip()", renderer=_render_normalize_text,
+                         row_local=True, inputs=lambda p: list(p['columns']))
+def normalize_text(df: pd.DataFrame, columns: list, strip: bool = True, case: Optional[str] = None) -> pd.DataFrame:
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+    if case is not None and case not in TEXT_CASES:
+        raise ValueError(f"Unsupported case: {case}. Allowed: {TEXT_CASES}")
+
+    def normalize(s: pd.Series) -> pd.Series:
+        # .str leaves missing and non-string values as NaN, so only text columns are accepted
+        if not pd.api.types.is_string_dtype(s):
+            raise ValueError(f"Column '{s.name}' is not text.")
+        if strip:
+            s = s.str.strip()
+        return getattr(s.str, case)() if case is not None else s
+
+    return _assign_columns(df, columns, _map_columns(normalize, df, columns))
+
+def _render_drop_duplicates(params: Dict[str, Any]) -> str:
+    return f"df = df.drop_duplicates(subset={params.get('subset')!r}, keep={params.get('keep', 'first')!r})"
+
+# Not row_local: whether a row is kept depends on the rows before it.
+# Without a subset every column is compared, so inputs raises and nothing is pruned.
+@ActionRegistry.register("drop_duplicates", "df = df.drop_duplicates(subset={subset})", renderer=_render_drop_duplicates,
+                         inputs=lambda p: list(p['subset']))
+def drop_duplicates(df: pd.DataFrame, subset: Optional[list] = None, keep: str = 'first') -> pd.DataFrame:
+    if subset is not None:
+        missing = [c for c in subset if c not in df.columns]
+        if missing:
+            raise ValueError(f"Columns not found: {missing}")
+    if keep not in ['first', 'last']:
+        raise ValueError(f"Unsupported keep: {keep}")
+    try:
+        return df.drop_duplicates(subset=subset, keep=keep)
+    except TypeError as e: # unhashable cells, e.g. lists
+        raise ValueError(f"Cannot compare rows: {str(e)}")
@@ -1,14 +1,95 @@
 from schemas.api import ActionSpec
 import re
-from typing import Dict, Any, List
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, List, Optional, Tuple
+
+_CAMEL_BOUNDARY = re.compile(r"([a-z0-9])([A-Z])")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_NUMBER = re.compile(r'-?\d+\.?\d*')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; '_', '-', spaces and camelCase all separate words ("userId" -> user, id)."""
+    return _TOKEN.findall(_CAMEL_BOUNDARY.sub(r"\1 \2", text).lower())
+
+class ColumnIndex:
+    """
+    Column names indexed by their token sequence (and the tokens joined, so "user id",
+    "user_id" and "userid" all find user_id). Matching looks up prompt token windows,
+    so its cost depends on the prompt length, not the number of columns, and a column
+    only matches whole words ("id" does not match inside "paid").
+    """
+    def __init__(self, columns: List[Any]):
+        self._names: Dict[Tuple[str, ...], List[Any]] = {}
+        self.max_tokens = 0
+        for col in columns:
+            tokens = tokenize(str(col))
+            if not tokens:
+                continue
+            keys = {tuple(tokens), ("".join(tokens),)}
+            for key in keys:
+                self._names.setdefault(key, []).append(col)
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+    def match(self, text: str) -> Optional[Any]:
+        """The column covering the most words of text (earliest on ties), or None."""
+        tokens = tokenize(text)
+        best, best_len = None, 0
+        for i in range(len(tokens)):
+            for n in range(min(self.max_tokens, len(tokens) - i), best_len, -1):
+                candidates = self._names.get(tuple(tokens[i:i + n]))
+                if candidates:
+                    best, best_len = self._prefer_exact(candidates, text), n
+                    break
+        return best
+
+    @staticmethod
+    def _prefer_exact(candidates: List[Any], text: str) -> Any:
+        # Columns that normalize alike ("Age", "age"): the one written as in the prompt
+        if len(candidates) > 1:
+            return next((c for c in candidates if str(c) in text), candidates[0])
+        return candidates[0]
 
 class AIAssistant:
+    # Column indexes of recently used schemas, keyed by the caller (e.g. session step)
+    MAX_CACHED_INDEXES = 16
+    _indexes: "OrderedDict[Hashable, ColumnIndex]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def column_index(cls, columns: List[Any], cache_key: Optional[Hashable] = None) -> ColumnIndex:
+        """
+        The index for columns; with a cache_key that identifies the schema (it must change
+        whenever the columns do) it is built once and reused.
+        """
+        if cache_key is None:
+            return ColumnIndex(columns)
+        with cls._lock:
+            index = cls._indexes.get(cache_key)
+            if index is not None:
+                cls._indexes.move_to_end(cache_key)
+                return index
+        index = ColumnIndex(columns)
+        with cls._lock:
+            cls._indexes[cache_key] = index
+            while len(cls._indexes) > cls.MAX_CACHED_INDEXES:
+                cls._indexes.popitem(last=False)
+        return index
+
+    @classmethod
+    def generate_action_specs(cls, prompts: List[str], columns: List[Any],
+                              cache_key: Optional[Hashable] = None) -> List[ActionSpec]:
+        """Resolves several prompts against one schema, sharing its index."""
+        index = cls.column_index(columns, cache_key)
+        return [cls.generate_action_spec(prompt, columns, index) for prompt in prompts]
+
     @staticmethod
-    def generate_action_spec(prompt: str, columns: List[str]) -> ActionSpec:
+    def generate_action_spec(prompt: str, columns: List[Any], index: Optional[ColumnIndex] = None) -> ActionSpec:
         """
         Mock AI logic to convert natural language to ActionSpec.
         In a real app, this would call an LLM (Gemini/OpenAI).
         """
+        index = index or ColumnIndex(columns)
         p = prompt.lower().strip()
         
         # 1. Sort
@@ -16,7 +97,7 @@ class AIAssistant:
         if "sort" in p:
             is_asc = "desc" not in p
             # Find column
-            col = next((c for c in columns if c.lower() in p), None)
+            col = index.match(prompt)
             if col:
                 return ActionSpec(
                     intent=f"Sort by {col} {'Asc' if is_asc else 'Desc'} (AI)",
@@ -34,7 +115,7 @@ class AIAssistant:
             # allow words for col
             
             # Try to match operator
-            ops = {">=": ">=", "<=": "<=", "==": "==", ">": ">", "<": "<", "=": "==", "is": "=="} // order matters, >= before >
+            ops = {">=": ">=", "<=": "<=", "==": "==", ">": ">", "<": "<", "=": "==", "is": "=="} # order matters, >= before >
             found_op = None
             for op_str, op_code in ops.items():
                 if f" {op_str} " in p:
@@ -46,7 +127,7 @@ class AIAssistant:
                 # Actually let's use the matched key
                 # This is tricky without strict parsing.
                 # Let's try to find a column name
-                target_col = next((c for c in columns if c.lower() in p), None)
+                target_col = index.match(prompt)
                 
                 if target_col:
                     # try to find value
@@ -55,8 +136,7 @@ class AIAssistant:
                     # "salary" index vs "5000" index
                     
                     # EXTRACT NUMBER
-                    import re
-                    nums = re.findall(r'-?\d+\.?\d*', p)
+                    nums = _NUMBER.findall(p)
                     val = None
                     if nums:
                         val = float(nums[-1]) if '.' in nums[-1] else int(nums[-1])
@@ -84,7 +164,7 @@ class AIAssistant:
         # 3. Drop
         # "drop col1", "remove id"
         if "drop" in p or "remove" in p or "delete" in p:
-            col = next((c for c in columns if c.lower() in p), None)
+            col = index.match(prompt)
             if col:
                  return ActionSpec(
                     intent=f"Drop {col} (AI)",
@@ -97,7 +177,8 @@ class AIAssistant:
         # 4. Rename
         # "rename id to user_id"
         if "rename" in p:
-            col = next((c for c in columns if c.lower() in p), None)
+            # The column is named before "to"; the new name after it
+            col = index.match(prompt.split(" to ")[0])
             # find "to"
             if col and " to " in p:
                 new_name = p.split(" to ")[-1].strip()
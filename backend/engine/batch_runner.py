@@ -0,0 +1,220 @@
+"""
+Headless execution of a saved recipe over many input files.
+
+Usage (from backend/):
+    python -m engine.batch_runner sessions/<id>.json data/2024-*.csv -o out/ [-w 4] [--max-memory-mb 2048]
+
+The recipe is the session metadata FileSessionStore writes; its applied steps (up to
+current_step) run on every input, each file in a worker process, and the result is
+written to <output dir>/<input name>.parquet. One line per file reports rows and
+timing, then a total; the exit status is 1 if any file failed.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional
+import pandas as pd
+from schemas.api import ActionSpec
+from engine.actions import ActionRegistry
+from engine.chunked_loader import ChunkedLoader
+from engine.dataset_loader import DatasetLoader
+
+try:
+    import resource
+except ImportError: # Windows: no per-process memory limit
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+class BatchRunner:
+    """
+    Runs a recipe over input files on a process pool.
+    Memory per worker is bounded two ways: large CSV / JSON Lines inputs of recipes made only of
+    row-local actions are streamed CHUNK_ROWS at a time (see ChunkedLoader), and max_memory_mb caps
+    each worker's address space, so a file that needs more fails alone with MemoryError instead of
+    exhausting the host. Workers are replaced every MAX_TASKS_PER_WORKER files to hand memory back.
+    """
+    MAX_TASKS_PER_WORKER = int(os.getenv("BATCH_MAX_TASKS_PER_WORKER", "16"))
+
+    @staticmethod
+    def load_recipe(path: str) -> Dict[str, Any]:
+        """
+        {"actions": [ActionSpec...], "load_options": {...}} from session metadata.
+        Undone steps (after current_step) are not part of the recipe.
+        """
+        try:
+            with open(path, "r") as f:
+                metadata = json.load(f)
+            history = [ActionSpec(**action) for action in metadata["history"]]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid recipe {path}: {e}")
+        current_step = metadata.get("current_step", len(history) - 1)
+        return {"actions": history[:current_step + 1], "load_options": metadata.get("load_options") or {}}
+
+    @staticmethod
+    def output_path(input_path: str, output_dir: str) -> str:
+        return os.path.join(output_dir, os.path.splitext(os.path.basename(input_path))[0] + ".parquet")
+
+    @staticmethod
+    def _apply(df: pd.DataFrame, actions: List[ActionSpec]) -> pd.DataFrame:
+        for action in actions:
+            for op in action.operations:
+                if op.get("action"):
+                    df = ActionRegistry.execute(df, op["action"], op.get("params", {}))
+        return df
+
+    @staticmethod
+    def _streamable(actions: List[ActionSpec], input_path: str, file_type: str) -> bool:
+        return ChunkedLoader.should_chunk(input_path, file_type) and all(
+            ActionRegistry.is_row_local(op.get("action")) for action in actions for op in action.operations
+        )
+
+    @staticmethod
+    def _write_streamed(actions: List[ActionSpec], input_path: str, file_type: str, tmp_path: str) -> Dict[str, int]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Same dtypes in every chunk, as for a chunked upload
+        dtypes, text = ChunkedLoader.infer_dtypes(input_path, file_type)
+        writer = None
+        rows_in = rows_out = 0
+        try:
+            for chunk in ChunkedLoader.iter_chunks(input_path, file_type):
+                rows_in += len(chunk)
+                result = BatchRunner._apply(ChunkedLoader._cast_chunk(chunk, dtypes, text), actions)
+                table = pa.Table.from_pandas(result, preserve_index=False)
+                if writer is None:
+                    schema = pa.schema([
+                        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                        for field in table.schema
+                    ])
+                    writer = pq.ParquetWriter(tmp_path, schema)
+                writer.write_table(table.cast(writer.schema))
+                rows_out += len(result)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None: # header-only file
+            empty = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+            BatchRunner._apply(empty, actions).to_parquet(tmp_path, index=False)
+        return {"rows_in": rows_in, "rows_out": rows_out}
+
+    @staticmethod
+    def run_file(actions: List[ActionSpec], input_path: str, output_dir: str,
+                 load_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Runs the recipe on one file. Never raises: failures are reported in the result's "error".
+        """
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"input": input_path, "output": None, "rows_in": 0, "rows_out": 0, "error": None}
+        output_path = BatchRunner.output_path(input_path, output_dir)
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            file_type = DatasetLoader.infer_file_type(input_path)
+            if file_type is None:
+                raise ValueError(f"Unsupported file type: {input_path}")
+            result["bytes_in"] = os.path.getsize(input_path)
+
+            if BatchRunner._streamable(actions, input_path, file_type):
+                result.update(BatchRunner._write_streamed(actions, input_path, file_type, tmp_path))
+            else:
+                sheet_name = (load_options or {}).get("sheet_name") if file_type in ["xls", "xlsx"] else None
+                df = DatasetLoader.load_dataset(input_path, file_type, sheet_name=sheet_name)
+                result["rows_in"] = len(df)
+                df = BatchRunner._apply(df, actions)
+                result["rows_out"] = len(df)
+                df.to_parquet(tmp_path, index=False)
+            # Readers of output_dir never see a partial file
+            os.replace(tmp_path, output_path)
+            result["output"] = output_path
+        except Exception as e: # MemoryError included: the worker stays usable
+            result["error"] = f"{type(e).__name__}: {e}"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def _init_worker(max_memory_mb: Optional[int]) -> None:
+        if max_memory_mb and resource is not None:
+            limit = max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    @staticmethod
+    def run(recipe_path: str, inputs: List[str], output_dir: str, workers: Optional[int] = None,
+            max_memory_mb: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yields the result of every file (see run_file) as it completes."""
+        recipe = BatchRunner.load_recipe(recipe_path)
+        outputs: Dict[str, str] = {}
+        for input_path in inputs:
+            output_path = BatchRunner.output_path(input_path, output_dir)
+            if output_path in outputs:
+                raise ValueError(f"{input_path} and {outputs[output_path]} would both write {output_path}")
+            outputs[output_path] = input_path
+        os.makedirs(output_dir, exist_ok=True)
+
+        workers = max(1, min(workers or os.cpu_count() or 1, len(inputs) or 1))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=BatchRunner._init_worker,
+            initargs=(max_memory_mb,),
+            max_tasks_per_child=BatchRunner.MAX_TASKS_PER_WORKER,
+        ) as pool:
+            futures = {
+                pool.submit(BatchRunner.run_file, recipe["actions"], input_path, output_dir, recipe["load_options"]): input_path
+                for input_path in inputs
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. SIGKILL from the OOM killer); the pool fails every
+                    # file not finished yet, and each is reported like any other failure
+                    result = {"input": futures[future], "output": None, "rows_in": 0, "rows_out": 0,
+                              "error": f"BrokenProcessPool: {e}", "seconds": 0.0}
+                yield result
+
+def _format_result(result: Dict[str, Any]) -> str:
+    name = os.path.basename(result["input"])
+    if result["error"]:
+        return f"FAIL {name}  {result['seconds']:.2f}s  {result['error']}"
+    mb = result["bytes_in"] / (1024 * 1024)
+    seconds = max(result["seconds"], 1e-9)
+    return (f"ok   {name}  {result['rows_in']:,} -> {result['rows_out']:,} rows  {result['seconds']:.2f}s"
+            f"  {result['rows_in'] / seconds:,.0f} rows/s  {mb / seconds:.1f} MB/s")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a saved session recipe over input files.")
+    parser.add_argument("recipe", help="session metadata JSON written by the studio (sessions/<id>.json)")
+    parser.add_argument("inputs", nargs="+", help="CSV, JSON, JSON Lines or Excel files")
+    parser.add_argument("-o", "--output-dir", required=True, help="directory for the Parquet outputs")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-memory-mb", type=int, default=None, help="address space limit per worker")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = failed = 0
+    byte_count = 0
+    try:
+        for result in BatchRunner.run(args.recipe, args.inputs, args.output_dir, args.workers, args.max_memory_mb):
+            print(_format_result(result), flush=True)
+            if result["error"]:
+                failed += 1
+            else:
+                rows += result["rows_in"]
+                byte_count += result["bytes_in"]
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"{len(args.inputs) - failed}/{len(args.inputs)} files, {rows:,} rows in {elapsed:.2f}s"
+          f"  ({rows / elapsed:,.0f} rows/s, {byte_count / (1024 * 1024) / elapsed:.1f} MB/s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from pandas.api import types as ptypes
+from typing import Optional, Dict, Any, Iterator, Set
+
+logger = logging.getLogger(__name__)
+
+class ChunkedLoader:
+    """
+    Bounded-memory loading of large CSV / JSON Lines files straight into Parquet.
+    - Pass 1 parses the file in chunks and only keeps the dtype each column needs
+      across all chunks (int + float -> float, a column missing or empty in some chunk
+      becomes nullable, anything mixed with text -> object).
+    - Pass 2 parses again, casts every chunk to those dtypes and appends it to the Parquet file.
+    Only one chunk is held in memory at a time, at the cost of parsing the file twice.
+    A column that is numeric in some chunks and text in others keeps the text form of the
+    numbers (e.g. '007' parsed as 7 in a numeric chunk is stored as '7').
+    """
+    TYPES = ['csv', 'jsonl']
+    CHUNK_ROWS = 100_000
+    # Files smaller than this are simply read whole
+    MIN_BYTES = int(os.getenv("CHUNKED_LOAD_MIN_BYTES", str(64 * 1024 * 1024)))
+
+    @staticmethod
+    def should_chunk(file_path: str, file_type: str) -> bool:
+        return file_type in ChunkedLoader.TYPES and os.path.getsize(file_path) >= ChunkedLoader.MIN_BYTES
+
+    @staticmethod
+    def iter_chunks(file_path: str, file_type: str, chunk_rows: Optional[int] = None, encoding: str = 'utf-8') -> Iterator[pd.DataFrame]:
+        chunk_rows = chunk_rows or ChunkedLoader.CHUNK_ROWS
+        if file_type == 'csv':
+            reader = pd.read_csv(file_path, encoding=encoding, chunksize=chunk_rows)
+        elif file_type == 'jsonl':
+            reader = pd.read_json(file_path, lines=True, encoding=encoding, chunksize=chunk_rows)
+        else:
+            raise ValueError(f"Chunked loading is not supported for file type: {file_type}")
+        with reader:
+            yield from reader
+
+    @staticmethod
+    def _promote(current: Optional[Any], dtype: Any) -> Any:
+        if current is None or current == dtype:
+            return dtype
+        numeric = lambda d: isinstance(d, np.dtype) and (ptypes.is_integer_dtype(d) or ptypes.is_float_dtype(d))
+        if numeric(current) and numeric(dtype):
+            return np.promote_types(current, dtype)
+        return np.dtype(object)
+
+    @staticmethod
+    def infer_dtypes(file_path: str, file_type: str, chunk_rows: Optional[int] = None, encoding: str = 'utf-8'):
+        """
+        Pass 1: the dtype of every column (in first-seen order) that holds all chunks,
+        plus the object columns that contain text.
+        """
+        targets: Dict[str, Any] = {}
+        fallback: Dict[str, Any] = {}
+        nullable: Set[str] = set()
+        text: Set[str] = set()
+        rows = 0
+
+        for chunk in ChunkedLoader.iter_chunks(file_path, file_type, chunk_rows, encoding):
+            nullable.update(col for col in targets if col not in chunk.columns)
+            for col in chunk.columns:
+                series = chunk[col]
+                if col not in targets:
+                    targets[col] = None
+                    fallback[col] = series.dtype
+                    if rows:
+                        nullable.add(col) # absent from earlier chunks
+                if series.isna().all():
+                    nullable.add(col) # says nothing about the dtype
+                    continue
+                if series.dtype == object and ptypes.infer_dtype(series, skipna=True) != 'boolean':
+                    text.add(col)
+                targets[col] = ChunkedLoader._promote(targets[col], series.dtype)
+            rows += len(chunk)
+
+        dtypes = {}
+        for col, dtype in targets.items():
+            dtype = fallback[col] if dtype is None else dtype
+            if col in nullable and ptypes.is_integer_dtype(dtype):
+                dtype = np.dtype('float64')
+            elif col in nullable and ptypes.is_bool_dtype(dtype):
+                dtype = np.dtype(object)
+            dtypes[col] = dtype
+        return dtypes, text
+
+    @staticmethod
+    def _cast_chunk(chunk: pd.DataFrame, dtypes: Dict[str, Any], text: Set[str]) -> pd.DataFrame:
+        columns = {}
+        for col, dtype in dtypes.items():
+            if col not in chunk.columns:
+                columns[col] = pd.Series(index=chunk.index, dtype=dtype)
+                continue
+            series = chunk[col]
+            if series.dtype != dtype:
+                if dtype == object and col in text:
+                    series = series.astype(object).where(series.isna(), series.astype(str))
+                else:
+                    series = series.astype(dtype)
+            columns[col] = series
+        return pd.DataFrame(columns, index=chunk.index)
+
+    @staticmethod
+    def write_parquet(file_path: str, file_type: str, parquet_path: str, chunk_rows: Optional[int] = None,
+                      encoding: str = 'utf-8') -> Dict[str, Any]:
+        """
+        Converts the file to Parquet one chunk (row group) at a time.
+        Returns {"rows": int, "dtypes": {column: dtype}}.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        try:
+            dtypes, text = ChunkedLoader.infer_dtypes(file_path, file_type, chunk_rows, encoding)
+            writer = None
+            rows = 0
+            try:
+                for chunk in ChunkedLoader.iter_chunks(file_path, file_type, chunk_rows, encoding):
+                    table = pa.Table.from_pandas(ChunkedLoader._cast_chunk(chunk, dtypes, text), preserve_index=False)
+                    if writer is None:
+                        # Columns with no values in the first chunk have Arrow type null; they hold text later
+                        schema = pa.schema([
+                            field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                            for field in table.schema
+                        ])
+                        writer = pq.ParquetWriter(parquet_path, schema)
+                    writer.write_table(table.cast(writer.schema))
+                    rows += len(chunk)
+                if writer is None: # empty file: header only
+                    empty = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+                    empty.to_parquet(parquet_path, index=False)
+            finally:
+                if writer is not None:
+                    writer.close()
+        except Exception as e:
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
+            raise RuntimeError(f"Failed to load dataset: {str(e)}")
+
+        logger.info(f"Chunked load of {file_path}: {rows} rows")
+        return {"rows": rows, "dtypes": {col: str(dtype) for col, dtype in dtypes.items()}}
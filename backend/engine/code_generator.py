@@ -1,17 +1,31 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Set
 from schemas.api import ActionSpec
-from engine.actions import ActionRegistry
+from engine.actions import ActionRegistry, render_partial_groupby_agg
 import json
 
 class CodeGenerator:
     """
     Generates a Python script or Jupyter Notebook from a list of actions.
+    With optimize=True the code is tuned for large inputs (see _plan and _render_load):
+    - only the source columns the recipe needs are read, with their dtypes spelled out
+      (no inference) and the pyarrow CSV engine where that gives identical values,
+    - consecutive filters become one mask and consecutive drops one drop,
+    - copy-on-write avoids a full copy of the frame at every step.
     """
+    # Operators fused filters may render (the filter_rows whitelist)
+    FILTER_OPERATORS = ['==', '!=', '>', '<', '>=', '<=']
+    # Readers that take usecols; other sources are read whole, so their drops must stay
+    USECOLS_FILE_TYPES = ['csv', 'xls', 'xlsx']
+
     @staticmethod
-    def generate_notebook(actions: List[ActionSpec], original_file_path: str, file_type: str) -> str:
+    def generate_notebook(actions: List[ActionSpec], original_file_path: str, file_type: str,
+                          load_options: Optional[Dict[str, Any]] = None, optimize: bool = False,
+                          source_dtypes: Optional[Dict[str, str]] = None) -> str:
         """
         Generates a Jupyter Notebook JSON string (v4).
+        `source_dtypes` (column -> dtype of the loaded data) enables column pruning and explicit dtypes.
         """
+        usecols, steps = CodeGenerator._plan(actions, file_type, optimize, source_dtypes)
         cells = []
         
         # 1. Header Markdown
@@ -27,54 +41,28 @@ class CodeGenerator:
             "execution_count": None,
             "metadata": {},
             "outputs": [],
-            "source": ["import pandas as pd\n", "import numpy as np"]
+            "source": CodeGenerator._lines_to_source(CodeGenerator._header_lines(optimize))
         })
         
         # 3. Load Data
-        load_code = ["# Load dataset\n"]
-        if file_type == 'csv':
-             load_code.append(f"df = pd.read_csv({repr(original_file_path)})")
-        elif file_type == 'json':
-             load_code.append(f"df = pd.read_json({repr(original_file_path)})")
-        elif file_type in ['xls', 'xlsx']:
-             load_code.append(f"df = pd.read_excel({repr(original_file_path)})")
-        else:
-             load_code.append(f"# Unsupported file type: {file_type}\n")
-             load_code.append(f"df = pd.DataFrame()")
+        load_lines = ["# Load dataset"] + CodeGenerator._render_load(original_file_path, file_type, load_options, usecols, source_dtypes)
         
         cells.append({
             "cell_type": "code",
             "execution_count": None,
             "metadata": {},
             "outputs": [],
-            "source": load_code
+            "source": CodeGenerator._lines_to_source(load_lines)
         })
         
         # 4. Actions
-        for action_spec in actions:
+        for intent, codes in steps:
             # We reuse the logic from generate_script to render the python code line
             # But we wrap it in its own cell
-            cell_source = [f"# {action_spec.intent}\n"]
+            cell_source = [f"# {intent}\n"]
             
-            for op in action_spec.operations:
-                action_name = op.get("action")
-                params = op.get("params", {})
-                try:
-                    template = ActionRegistry.get_template(action_name)
-                    # Use same param rendering logic as script generator
-                    render_params = {}
-                    for k, v in params.items():
-                        if k == 'column' or k == 'operator':
-                            render_params[k] = v
-                        elif isinstance(v, str):
-                            render_params[k] = repr(v)
-                        else:
-                            render_params[k] = v
-                    
-                    code_line = template.format(**render_params)
-                    cell_source.append(code_line + "\n")
-                except Exception as e:
-                    cell_source.append(f"# Error: {e}\n")
+            for code in codes:
+                cell_source.extend(line + "\n" for line in code.split("\n"))
             
             cells.append({
                 "cell_type": "code",
@@ -118,68 +106,329 @@ class CodeGenerator:
         return json.dumps(notebook, indent=2)
 
     @staticmethod
-    def generate_script(actions: List[ActionSpec], original_file_path: str, file_type: str) -> str:
+    def _read_args(file_path: str, load_options: Optional[Dict[str, Any]], path_expr: Optional[str] = None) -> str:
+        # path_expr: code to use instead of the quoted path (e.g. a variable name)
+        args = [path_expr or repr(file_path)] + [f"{key}={value!r}" for key, value in (load_options or {}).items()]
+        return ", ".join(args)
+
+    @staticmethod
+    def _lines_to_source(lines: List[str]) -> List[str]:
+        # Notebook cells store source lines with their newlines, except the last
+        return [line + "\n" for line in lines[:-1]] + lines[-1:]
+
+    @staticmethod
+    def _header_lines(optimize: bool) -> List[str]:
+        lines = ["import pandas as pd", "import numpy as np"]
+        if optimize:
+            # Steps share column data instead of copying the whole frame each time
+            lines.append('pd.set_option("mode.copy_on_write", True)')
+        return lines
+
+    @staticmethod
+    def _render_load(file_path: str, file_type: str, load_options: Optional[Dict[str, Any]],
+                     usecols: Optional[List[str]] = None, source_dtypes: Optional[Dict[str, str]] = None,
+                     path_expr: Optional[str] = None) -> List[str]:
+        # Escape path for windows/special chars safety if needed, 
+        # but for V1 we just use repr() to get a quoted string representation.
+        args = CodeGenerator._read_args(file_path, load_options, path_expr)
+        if file_type in CodeGenerator.USECOLS_FILE_TYPES and usecols is not None:
+            # Explicit numeric/bool dtypes skip inference; text columns stay default (object)
+            dtypes = {
+                col: source_dtypes[col] for col in usecols
+                if source_dtypes and source_dtypes.get(col, 'object').startswith(('int', 'uint', 'float', 'bool'))
+            }
+            args += f", usecols={usecols!r}"
+            if dtypes:
+                args += f", dtype={dtypes!r}"
+            # pyarrow infers dates and None for missing text where the default parser keeps
+            # strings and NaN, so it is only used when every column read is numeric/bool
+            if file_type == 'csv' and usecols and len(dtypes) == len(usecols):
+                args += ", engine='pyarrow'"
+
+        if file_type == 'csv':
+            return [f"df = pd.read_csv({args})"]
+        elif file_type == 'json':
+            return [f"df = pd.read_json({args})"]
+        elif file_type == 'jsonl':
+            return [f"df = pd.read_json({args}, lines=True)"]
+        elif file_type in ['xls', 'xlsx']:
+            return [f"df = pd.read_excel({args})"]
+        return [f"# Unsupported file type: {file_type}, please load manually", "df = pd.DataFrame() # Placeholder"]
+
+    @staticmethod
+    def _plan(actions: List[ActionSpec], file_type: str, optimize: bool,
+              source_dtypes: Optional[Dict[str, str]]) -> Tuple[Optional[List[str]], List[Tuple[str, List[str]]]]:
+        """
+        Returns (source columns to read, None for all; [(comment, [code])] steps).
+        Unoptimized, every ActionSpec is one step with one statement per operation.
+        """
+        if not optimize:
+            return None, [
+                (spec.intent, [CodeGenerator._render_operation(op) for op in spec.operations])
+                for spec in actions
+            ]
+
+        ops = [(spec.intent, op) for spec in actions for op in spec.operations]
+        if file_type in CodeGenerator.USECOLS_FILE_TYPES:
+            usecols, skipped = CodeGenerator._prune_columns(ops, list(source_dtypes or {}))
+            ops = [entry for i, entry in enumerate(ops) if i not in skipped]
+        else:
+            usecols = None
+
+        steps: List[Tuple[str, List[str]]] = []
+        i = 0
+        while i < len(ops):
+            # Runs of filters (or drops) become a single statement
+            kind = CodeGenerator._fusable_kind(ops[i][1])
+            j = i + 1
+            while kind and j < len(ops) and CodeGenerator._fusable_kind(ops[j][1]) == kind:
+                j += 1
+            run = ops[i:j]
+            intent = "; ".join(dict.fromkeys(intent for intent, _ in run))
+            if len(run) == 1:
+                code = CodeGenerator._render_operation(run[0][1])
+            elif kind == "filter_rows":
+                conditions = " & ".join(
+                    f"(df[{op['params']['column']!r}] {op['params']['operator']} {op['params']['value']!r})"
+                    for _, op in run
+                )
+                code = f"df = df[{conditions}]"
+            else:
+                code = f"df = df.drop(columns={[op['params']['column'] for _, op in run]!r})"
+            steps.append((intent, [code]))
+            i = j
+        return usecols, steps
+
+    @staticmethod
+    def _fusable_kind(op: Dict[str, Any]) -> Optional[str]:
+        params = op.get("params", {})
+        if op.get("action") == "filter_rows" and params.get("operator") in CodeGenerator.FILTER_OPERATORS:
+            return "filter_rows"
+        if op.get("action") == "drop_column":
+            return "drop_column"
+        return None
+
+    @staticmethod
+    def _prune_columns(ops: List[Tuple[str, Dict[str, Any]]], source_columns: List[str]) -> Tuple[Optional[List[str]], Set[int]]:
+        """
+        Source columns the recipe needs: those some operation reads (ActionRegistry inputs) or
+        that reach the result. Returns (columns in source order, indices of drop_column operations
+        on columns that are no longer read). Gives up (None) on operations without an inputs hook.
+        """
+        if not source_columns:
+            return None, set()
+        alias = {col: col for col in source_columns} # current name -> source column
+        used: Set[str] = set()
+        drops: List[Tuple[int, str]] = []
+        for i, (_, op) in enumerate(ops):
+            name, params = op.get("action"), op.get("params", {})
+            inputs = ActionRegistry.get_inputs(name)
+            if inputs is None:
+                return None, set()
+            try:
+                columns = inputs(params)
+            except (KeyError, TypeError, ValueError):
+                return None, set()
+            used.update(alias[col] for col in columns if col in alias)
+
+            if name == "drop_column":
+                source = alias.pop(params.get("column"), None)
+                if source is not None:
+                    drops.append((i, source))
+            elif name == "rename_column":
+                if params.get("new_name") in alias:
+                    return None, set() # renaming onto an existing column
+                if params.get("old_name") in alias:
+                    alias[params["new_name"]] = alias.pop(params["old_name"])
+            elif name == "groupby_agg":
+                # Only the keys survive as columns; aggregates are new
+                alias = {col: alias[col] for col in params.get("group_by", []) if col in alias}
+
+        needed = used | set(alias.values())
+        if not needed:
+            return None, set() # nothing to read would also lose the row count
+        skipped = {i for i, source in drops if source not in needed}
+        return [col for col in source_columns if col in needed], skipped
+
+    @staticmethod
+    def generate_script(actions: List[ActionSpec], original_file_path: str, file_type: str,
+                        load_options: Optional[Dict[str, Any]] = None, optimize: bool = False,
+                        source_dtypes: Optional[Dict[str, str]] = None) -> str:
+        usecols, steps = CodeGenerator._plan(actions, file_type, optimize, source_dtypes)
         script = []
         
         # Imports
-        script.append("import pandas as pd")
+        script.extend(CodeGenerator._header_lines(optimize))
         script.append("")
         
         # Load Data
-        # Escape path for windows/special chars safety if needed, 
-        # but for V1 we just use repr() to get a quoted string representation.
         script.append(f"# Load dataset")
-        if file_type == 'csv':
-             script.append(f"df = pd.read_csv({repr(original_file_path)})")
-        elif file_type == 'json':
-             script.append(f"df = pd.read_json({repr(original_file_path)})")
-        elif file_type in ['xls', 'xlsx']:
-             script.append(f"df = pd.read_excel({repr(original_file_path)})")
-        else:
-             script.append(f"# Unsupported file type: {file_type}, please load manually")
-             script.append(f"df = pd.DataFrame() # Placeholder")
+        script.extend(CodeGenerator._render_load(original_file_path, file_type, load_options, usecols, source_dtypes))
 
         script.append("")
         script.append("# Apply Transformations")
         
-        for action_spec in actions:
-            script.append(f"# {action_spec.intent}")
-            for op in action_spec.operations:
-                action_name = op.get("action")
-                params = op.get("params", {})
-                
-                try:
-                    template = ActionRegistry.get_template(action_name)
-                    
-                    # Robust Logic:
-                    # All parameters are passed through repr() if they are strings.
-                    # This ensures correct quoting and escaping (' -> \'), preventing code injection.
-                    # Since templates now have NO internal quotes, this is the only quoting source.
-                    
-                    render_params = {}
-                    for k, v in params.items():
-                        if k == 'operator': # Operators are code-safe whitelist (e.g. '>') 
-                            render_params[k] = v
-                        elif isinstance(v, str):
-                            render_params[k] = repr(v) # Safe! 'foo' -> "'foo'", "inject')" -> "'inject\')'"
-                        elif isinstance(v, list):
-                            # Lists like subset=['a', 'b']. repr(list) handles quotes recursively.
-                            render_params[k] = repr(v) 
-                        elif isinstance(v, dict):
-                            # Dicts like aggs={'a':'sum'}. repr(dict) handles quotes.
-                            render_params[k] = repr(v)
-                        else:
-                            # Numbers, etc.
-                            render_params[k] = v
-                            
-                    code_line = template.format(**render_params)
-                    script.append(code_line)
-                    
-                except Exception as e:
-                    script.append(f"# Error generating code for {action_name}: {e}")
+        for intent, codes in steps:
+            script.append(f"# {intent}")
+            script.extend(codes)
         
         script.append("")
         script.append("# Result Preview")
         script.append("print(df.head())")
         
         return "\n".join(script)
+
+    @staticmethod
+    def generate_chunked_script(actions: List[ActionSpec], original_file_path: str, file_type: str,
+                                load_options: Optional[Dict[str, Any]] = None,
+                                source_dtypes: Optional[Dict[str, str]] = None,
+                                output_path: str = "output.parquet", chunk_rows: int = 1_000_000) -> str:
+        """
+        Generates an out-of-core script: the input is read CHUNK_ROWS rows at a time.
+        - Leading row-local operations run per chunk (transform) and stream to a Parquet file.
+        - A following groupby_agg runs per chunk and its partial results are combined at the end;
+          aggregations that do not decompose keep only the columns they need per chunk instead.
+        - A following sort_values with a limit keeps the top rows per chunk, then of those.
+        - Anything after that point runs in memory on the (reduced) result.
+        """
+        ops = [(spec.intent, op) for spec in actions for op in spec.operations]
+        split = 0
+        while split < len(ops) and ActionRegistry.is_row_local(ops[split][1].get("action")):
+            split += 1
+        streamed, rest = ops[:split], ops[split:]
+
+        def block(code: str, indent: str = "") -> List[str]:
+            return [indent + line for line in code.split("\n")]
+
+        script = CodeGenerator._header_lines(True)
+        script[2:2] = ["import pyarrow as pa", "import pyarrow.parquet as pq"]
+        script.append("")
+        script.append("# Streaming pipeline: the input is processed CHUNK_ROWS rows at a time")
+        script.append(f"SOURCE = {original_file_path!r}")
+        script.append(f"OUTPUT = {output_path!r}")
+        script.append(f"CHUNK_ROWS = {chunk_rows:_}")
+        script.append("")
+
+        # Reader: fixed dtypes from the loaded data keep chunks consistent (a chunk without
+        # missing values would otherwise come out as int where the next one is float)
+        args = CodeGenerator._read_args(original_file_path, load_options, path_expr="SOURCE")
+        script.append("def read_chunks():")
+        if file_type == 'csv':
+            dtypes = {
+                col: dtype for col, dtype in (source_dtypes or {}).items()
+                if dtype.startswith(('int', 'uint', 'float', 'bool', 'object'))
+            }
+            dtype_arg = f", dtype={dtypes!r}" if dtypes else ""
+            script.append(f"    return pd.read_csv({args}, chunksize=CHUNK_ROWS{dtype_arg})")
+        elif file_type == 'jsonl':
+            script.append(f"    return pd.read_json({args}, lines=True, chunksize=CHUNK_ROWS)")
+        else:
+            # No chunked reader for this format: the file is read whole, as one chunk
+            load = CodeGenerator._render_load(original_file_path, file_type, load_options, path_expr="SOURCE")
+            script.extend(block("\n".join(load), "    "))
+            script.append("    return [df]")
+        script.append("")
+
+        script.append("def transform(df):")
+        for intent, op in streamed:
+            script.append(f"    # {intent}")
+            script.extend(block(CodeGenerator._render_operation(op), "    "))
+        script.append("    return df")
+        script.append("")
+
+        if not rest:
+            script.extend([
+                "writer = None",
+                "for chunk in read_chunks():",
+                "    table = pa.Table.from_pandas(transform(chunk), preserve_index=False)",
+                "    if writer is None:",
+                "        # Columns without values in the first chunk are typed null; they hold text later",
+                "        schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])",
+                "        writer = pq.ParquetWriter(OUTPUT, schema)",
+                "    writer.write_table(table.cast(writer.schema))",
+                "if writer is not None:",
+                "    writer.close()",
+            ])
+            return "\n".join(script)
+
+        intent, op = rest[0]
+        params = op.get("params", {})
+        partial = render_partial_groupby_agg(params) if op.get("action") == "groupby_agg" else None
+        script.append("partials = []")
+        script.append("for chunk in read_chunks():")
+        script.append("    df = transform(chunk)")
+        if partial is not None:
+            script.append(f"    # {intent} (partial aggregate per chunk)")
+            script.extend(block(partial[0], "    "))
+            script.append("    partials.append(partial)")
+            combine = ["parts = pd.concat(partials, ignore_index=True)"] + partial[1].split("\n")
+            consumed = 1
+        elif op.get("action") == "sort_values" and params.get("limit") is not None:
+            # The top rows overall are among the top rows of each chunk
+            script.append(f"    # {intent} (top rows per chunk)")
+            script.extend(block(CodeGenerator._render_operation(op), "    "))
+            script.append("    partials.append(df)")
+            combine = ["df = pd.concat(partials)"] + CodeGenerator._render_operation(op).split("\n")
+            consumed = 1
+        else:
+            columns = ActionRegistry.get_inputs(op.get("action")) if op.get("action") == "groupby_agg" else None
+            if columns is not None:
+                # Only the columns the aggregation reads are kept in memory
+                script.append(f"    partials.append(df[{list(dict.fromkeys(columns(params)))!r}])")
+            else:
+                script.append("    partials.append(df)")
+            combine = ["df = pd.concat(partials)"]
+            consumed = 0
+        script.append("")
+        script.append(f"# {intent}" if consumed else "# Remaining steps run in memory")
+        script.extend(combine)
+
+        for intent, op in rest[consumed:]:
+            script.append(f"# {intent}")
+            script.append(CodeGenerator._render_operation(op))
+
+        script.append("")
+        script.append("df.to_parquet(OUTPUT, index=False)")
+        return "\n".join(script)
+
+    @staticmethod
+    def _render_operation(op: Dict[str, Any]) -> str:
+        """
+        Renders a single operation as Python code (possibly several lines).
+        """
+        action_name = op.get("action")
+        params = op.get("params", {})
+        
+        try:
+            renderer = ActionRegistry.get_renderer(action_name)
+            if renderer is not None:
+                # Renderer quotes params itself
+                return renderer(params)
+
+            template = ActionRegistry.get_template(action_name)
+            
+            # Robust Logic:
+            # All parameters are passed through repr() if they are strings.
+            # This ensures correct quoting and escaping (' -> \'), preventing code injection.
+            # Since templates now have NO internal quotes, this is the only quoting source.
+            
+            render_params = {}
+            for k, v in params.items():
+                if k == 'operator': # Operators are code-safe whitelist (e.g. '>') 
+                    render_params[k] = v
+                elif isinstance(v, str):
+                    render_params[k] = repr(v) # Safe! 'foo' -> "'foo'", "inject')" -> "'inject\')'"
+                elif isinstance(v, list):
+                    # Lists like subset=['a', 'b']. repr(list) handles quotes recursively.
+                    render_params[k] = repr(v) 
+                elif isinstance(v, dict):
+                    # Dicts like aggs={'a':'sum'}. repr(dict) handles quotes.
+                    render_params[k] = repr(v)
+                else:
+                    # Numbers, etc.
+                    render_params[k] = v
+                    
+            return template.format(**render_params)
+            
+        except Exception as e:
+            return f"# Error generating code for {action_name}: {e}"
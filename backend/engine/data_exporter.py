@@ -0,0 +1,107 @@
+import pandas as pd
+from typing import Iterator, List, Optional
+from engine.expression_parser import ExpressionParser
+
+class _ChunkSink:
+    """
+    Write-only file object that collects what a pyarrow writer emits so it can be
+    handed out (and released) after every batch.
+    """
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class DataExporter:
+    """
+    Streams a DataFrame as CSV, Parquet or Arrow IPC (stream format), encoding BATCH_ROWS
+    rows at a time so the encoded file is never held in memory as a whole.
+    """
+    BATCH_ROWS = 65_536
+    MEDIA_TYPES = {
+        "csv": "text/csv",
+        "parquet": "application/vnd.apache.parquet",
+        "arrow": "application/vnd.apache.arrow.stream",
+    }
+    EXTENSIONS = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}
+
+    @staticmethod
+    def select(df: pd.DataFrame, columns: Optional[List[str]] = None, row_filter: Optional[str] = None) -> pd.DataFrame:
+        """
+        Column subset and row filter. The filter is a boolean expression in the syntax
+        of the 'expression' action (e.g. "price > 10 and region == 'north'").
+        """
+        if row_filter:
+            ExpressionParser.validate(row_filter, list(df.columns))
+            try:
+                mask = df.eval(row_filter)
+            except Exception as e:
+                raise ValueError(f"Filter failed: {e}")
+            if not isinstance(mask, pd.Series) or not pd.api.types.is_bool_dtype(mask):
+                raise ValueError("Filter must be a boolean expression.")
+            df = df[mask]
+        if columns:
+            missing = [c for c in columns if c not in df.columns]
+            if missing:
+                raise ValueError(f"Columns not found: {missing}")
+            df = df[columns]
+        return df
+
+    @staticmethod
+    def stream(df: pd.DataFrame, format: str, batch_rows: Optional[int] = None) -> Iterator[bytes]:
+        if format not in DataExporter.MEDIA_TYPES:
+            raise ValueError(f"Unsupported download format: {format}. Allowed: {list(DataExporter.MEDIA_TYPES)}")
+        batch_rows = batch_rows or DataExporter.BATCH_ROWS
+        if format == "csv":
+            return DataExporter._stream_csv(df, batch_rows)
+        return DataExporter._stream_arrow(df, format, batch_rows)
+
+    @staticmethod
+    def _stream_csv(df: pd.DataFrame, batch_rows: int) -> Iterator[bytes]:
+        yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows].to_csv(index=False, header=False).encode("utf-8")
+
+    @staticmethod
+    def _stream_arrow(df: pd.DataFrame, format: str, batch_rows: int) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # One schema for all batches; a batch of only missing values would otherwise infer null
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema) if format == "parquet" else pa.ipc.new_stream(sink, schema)
+        try:
+            for start in range(0, len(df), batch_rows):
+                batch = pa.RecordBatch.from_pandas(df.iloc[start:start + batch_rows], schema=schema, preserve_index=False)
+                writer.write_batch(batch) # Parquet: one row group per batch
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
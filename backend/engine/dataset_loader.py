@@ -6,23 +6,41 @@ class DatasetLoader:
     """
     Handles loading of datasets from various file formats safely.
     """
+    EXTENSION_TYPES = {'.csv': 'csv', '.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.xls': 'xls', '.xlsx': 'xlsx'}
+
+    @staticmethod
+    def infer_file_type(file_name: str) -> Optional[str]:
+        return DatasetLoader.EXTENSION_TYPES.get(os.path.splitext(file_name)[1].lower())
+
     @staticmethod
-    def load_dataset(file_path: str, file_type: str, encoding: str = 'utf-8') -> pd.DataFrame:
+    def load_dataset(file_path: str, file_type: str, encoding: str = 'utf-8', sheet_name: Optional[str] = None) -> pd.DataFrame:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
+        if sheet_name is not None and file_type not in ['xls', 'xlsx']:
+            raise ValueError("sheet_name only applies to Excel files.")
 
         try:
             if file_type == 'csv':
                 return pd.read_csv(file_path, encoding=encoding)
             elif file_type == 'json':
                 return pd.read_json(file_path)
+            elif file_type == 'jsonl':
+                return pd.read_json(file_path, lines=True, encoding=encoding)
             elif file_type in ['xls', 'xlsx']:
-                return pd.read_excel(file_path)
+                return pd.read_excel(file_path, sheet_name=0 if sheet_name is None else sheet_name)
             else:
                 raise ValueError(f"Unsupported file type: {file_type}")
         except Exception as e:
             raise RuntimeError(f"Failed to load dataset: {str(e)}")
 
+    @staticmethod
+    def load_all_sheets(file_path: str) -> Dict[str, pd.DataFrame]:
+        """Parses every sheet of a workbook in one pass."""
+        try:
+            return pd.read_excel(file_path, sheet_name=None)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load dataset: {str(e)}")
+
     @staticmethod
     def get_preview(df: pd.DataFrame, n: int = 5) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,134 @@
+import ast
+import io
+import re
+import tokenize
+from typing import List, Tuple
+
+class ExpressionParser:
+    """
+    Validates user expressions for the 'expression' action against a strict AST whitelist
+    before they are evaluated with DataFrame.eval (numexpr when installed).
+    Only column references, number/string/bool literals, arithmetic, comparisons,
+    boolean logic and a few math functions are accepted.
+    """
+    MAX_LENGTH = 1000
+    ALLOWED_FUNCS = ['abs', 'sqrt', 'log', 'exp']
+
+    _ALLOWED_NODES = (
+        ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Name, ast.Constant, ast.Call, ast.Load,
+        ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+        ast.UAdd, ast.USub, ast.Not, ast.Invert,
+        ast.And, ast.Or, ast.BitAnd, ast.BitOr,
+        ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    )
+    # DataFrame.eval syntax for column names that are not identifiers: `my column`
+    _PLACEHOLDER = re.compile(r'__col_(\d+)__')
+
+    @staticmethod
+    def _backtick_spans(expression: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) offsets of the backticks around each quoted name. Found with Python's
+        tokenizer (like pandas does), so backticks inside string literals don't count.
+        """
+        line_starts = [0]
+        for line in expression.splitlines(keepends=True):
+            line_starts.append(line_starts[-1] + len(line))
+        spans = []
+        opened = None
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(expression).readline):
+                if token.string == '`':
+                    offset = line_starts[token.start[0] - 1] + token.start[1]
+                    if opened is None:
+                        opened = offset
+                    else:
+                        spans.append((opened, offset))
+                        opened = None
+                elif opened is None and token.type == tokenize.NAME and ExpressionParser._PLACEHOLDER.fullmatch(token.string):
+                    # Placeholders typed by the user would alias (or overrun) the quoted names
+                    raise ValueError("Names like __col_0__ are reserved; quote the column with backticks.")
+        except (tokenize.TokenError, SyntaxError) as e:
+            raise ValueError(f"Invalid expression: {e}")
+        if opened is not None:
+            raise ValueError("Invalid expression: unterminated backtick quote.")
+        return spans
+
+    @staticmethod
+    def _parse(expression: str) -> Tuple[ast.Expression, List[str]]:
+        # Swap `quoted names` for placeholders so Python's parser accepts them
+        quoted: List[str] = []
+        parts = []
+        position = 0
+        for start, end in ExpressionParser._backtick_spans(expression):
+            parts.append(expression[position:start])
+            parts.append(f"__col_{len(quoted)}__")
+            quoted.append(expression[start + 1:end])
+            position = end + 1
+        parts.append(expression[position:])
+        source = "".join(parts)
+
+        try:
+            return ast.parse(source.strip(), mode='eval'), quoted
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression: {e.msg}")
+
+    @staticmethod
+    def _column_name(node: ast.Name, quoted: List[str]) -> str:
+        placeholder = ExpressionParser._PLACEHOLDER.fullmatch(node.id)
+        return quoted[int(placeholder.group(1))] if placeholder else node.id
+
+    @staticmethod
+    def referenced_columns(expression: str) -> List[str]:
+        """Column names the expression reads."""
+        tree, quoted = ExpressionParser._parse(expression)
+        func_nodes = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+        names = [
+            ExpressionParser._column_name(node, quoted) for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and id(node) not in func_nodes
+        ]
+        return list(dict.fromkeys(names))
+
+    @staticmethod
+    def validate(expression: str, columns: List[str]) -> None:
+        """
+        Raises ValueError if the expression uses anything outside the whitelist
+        or references a column that does not exist.
+        """
+        if not expression or not expression.strip():
+            raise ValueError("Expression is empty.")
+        if len(expression) > ExpressionParser.MAX_LENGTH:
+            raise ValueError(f"Expression is longer than {ExpressionParser.MAX_LENGTH} characters.")
+
+        tree, quoted = ExpressionParser._parse(expression)
+
+        func_nodes = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, ExpressionParser._ALLOWED_NODES):
+                raise ValueError(f"Unsupported syntax in expression: {type(node).__name__}")
+
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in ExpressionParser.ALLOWED_FUNCS:
+                    raise ValueError(f"Function not allowed. Whitelist: {ExpressionParser.ALLOWED_FUNCS}")
+                if len(node.args) != 1 or node.keywords:
+                    raise ValueError(f"Function '{node.func.id}' takes exactly one argument.")
+                func_nodes.add(id(node.func))
+
+            elif isinstance(node, ast.Name) and id(node) not in func_nodes:
+                name = ExpressionParser._column_name(node, quoted)
+                if name not in columns:
+                    raise ValueError(f"Column '{name}' not found.")
+
+            elif isinstance(node, ast.Constant):
+                if not isinstance(node.value, (int, float, str, bool)):
+                    raise ValueError(f"Unsupported literal in expression: {node.value!r}")
+
+            elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+                # Literal powers are folded in Python; keep them small (no 9**9**9, no (9**64)**64)
+                if any(isinstance(n, ast.BinOp) and isinstance(n.op, ast.Pow)
+                       for side in (node.left, node.right) for n in ast.walk(side)):
+                    raise ValueError("Nested powers are not allowed.")
+                exponent = node.right
+                if isinstance(exponent, ast.Constant) and isinstance(exponent.value, (int, float)) and abs(exponent.value) > 64:
+                    raise ValueError("Exponent too large.")
+                if not isinstance(exponent, ast.Constant) and not any(isinstance(n, ast.Name) for n in ast.walk(exponent)):
+                    raise ValueError("Exponent must be a number or involve a column.")
@@ -0,0 +1,157 @@
+import os
+import json
+import logging
+import threading
+import pandas as pd
+from typing import Optional, Dict, Any
+from engine.dataset_loader import DatasetLoader
+from engine.chunked_loader import ChunkedLoader
+from engine.session_store import FileSessionStore
+from engine.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+class IngestCache:
+    """
+    Columnar copy of uploaded files.
+    - Right after upload the file is parsed once (every sheet of a workbook) and written as Parquet,
+      together with the inferred schema, by a background task.
+    - /dataset/load reads the Parquet copy instead of re-parsing CSV/JSON/Excel.
+    Layout: uploads/_ingest/<file_id>/schema.json + one Parquet file per sheet.
+    Files the cache cannot represent (e.g. mixed-type columns Parquet rejects) are marked failed
+    and keep loading through DatasetLoader.
+    """
+    CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "_ingest")
+    # How long a load waits for a conversion that is still running before parsing the file itself
+    WAIT_SECONDS = 300.0
+    # Loader types that share one parse (xls and xlsx are both workbooks)
+    _FAMILIES = {"csv": "csv", "json": "json", "jsonl": "jsonl", "xls": "excel", "xlsx": "excel"}
+
+    _pending: Dict[str, threading.Event] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _entry_dir(cls, file_id: str) -> str:
+        return os.path.join(cls.CACHE_DIR, file_id)
+
+    @classmethod
+    def _schema_path(cls, file_id: str) -> str:
+        return os.path.join(cls._entry_dir(file_id), "schema.json")
+
+    @classmethod
+    def supports(cls, file_type: str) -> bool:
+        return file_type in cls._FAMILIES
+
+    @classmethod
+    def mark_pending(cls, file_id: str) -> None:
+        """Called before scheduling convert so a load arriving first waits instead of parsing twice."""
+        with cls._lock:
+            cls._pending.setdefault(file_id, threading.Event())
+
+    @classmethod
+    def convert(cls, file_id: str, file_path: str, file_type: str) -> Dict[str, Any]:
+        """
+        Parses the upload once and writes the Parquet copies and schema. Never raises:
+        the outcome is recorded in the schema's status.
+        """
+        cls.mark_pending(file_id)
+        entry_dir = cls._entry_dir(file_id)
+        schema: Dict[str, Any] = {"file_id": file_id, "file_type": file_type, "status": "failed", "sheets": []}
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            if ChunkedLoader.should_chunk(file_path, file_type):
+                # Large CSV / JSON Lines: written chunk by chunk, never fully in memory
+                written = ChunkedLoader.write_parquet(file_path, file_type, os.path.join(entry_dir, "sheet_0.parquet"))
+                schema["sheets"].append({"name": None, "file": "sheet_0.parquet", **written})
+                frames = {}
+            elif cls._FAMILIES.get(file_type) == "excel":
+                # One pass over the workbook; sheets are selected later from the cache
+                frames = DatasetLoader.load_all_sheets(file_path)
+            else:
+                frames = {None: DatasetLoader.load_dataset(file_path, file_type)}
+
+            for i, (sheet_name, df) in enumerate(frames.items()):
+                data_file = f"sheet_{i}.parquet"
+                df.to_parquet(os.path.join(entry_dir, data_file), index=False)
+                metrics.inc("numpanda_store_bytes_written_total", {"kind": "ingest"}, os.path.getsize(os.path.join(entry_dir, data_file)))
+                schema["sheets"].append({
+                    "name": sheet_name,
+                    "file": data_file,
+                    "rows": len(df),
+                    "dtypes": df.dtypes.astype(str).to_dict(),
+                })
+            schema["status"] = "ready"
+        except Exception as e:
+            logger.warning(f"Columnar conversion of upload {file_id} failed, loads will parse the file: {e}")
+            schema["error"] = str(e)
+        finally:
+            try:
+                os.makedirs(entry_dir, exist_ok=True)
+                # Schema last and atomically: its presence means the Parquet files are complete
+                tmp_path = cls._schema_path(file_id) + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(schema, f, indent=2)
+                os.replace(tmp_path, cls._schema_path(file_id))
+            except OSError as e:
+                logger.error(f"Failed to write ingest schema for {file_id}: {e}")
+            with cls._lock:
+                event = cls._pending.pop(file_id, None)
+            if event is not None:
+                event.set()
+        return schema
+
+    @classmethod
+    def get_schema(cls, file_id: str, wait: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        The recorded schema, {"status": "pending"} while converting, or None if the upload
+        was never converted.
+        """
+        with cls._lock:
+            event = cls._pending.get(file_id)
+        if event is not None:
+            if not wait or not event.wait(cls.WAIT_SECONDS):
+                return {"file_id": file_id, "status": "pending"}
+
+        schema_path = cls._schema_path(file_id)
+        if not os.path.exists(schema_path):
+            return None
+        try:
+            with open(schema_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read ingest schema for {file_id}: {e}")
+            return None
+
+    @classmethod
+    def load(cls, file_id: str, file_type: str, sheet_name: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Reads the cached copy (waiting for a running conversion). Returns None when there is no
+        usable copy, in which case the caller parses the original file.
+        Raises ValueError for a sheet the workbook does not have.
+        """
+        if sheet_name is not None and cls._FAMILIES.get(file_type) != "excel":
+            raise ValueError("sheet_name only applies to Excel files.")
+        schema = cls.get_schema(file_id, wait=True)
+        if not schema or schema.get("status") != "ready":
+            return None
+        # The cache was built for the type inferred at upload; a different requested type parses anew
+        if cls._FAMILIES.get(schema["file_type"]) != cls._FAMILIES.get(file_type):
+            return None
+
+        sheets = schema["sheets"]
+        if sheet_name is None:
+            sheet = sheets[0]
+        else:
+            sheet = next((s for s in sheets if s["name"] == sheet_name), None)
+            if sheet is None:
+                available = [s["name"] for s in sheets]
+                raise ValueError(f"Sheet '{sheet_name}' not found. Available sheets: {available}")
+
+        data_path = os.path.join(cls._entry_dir(file_id), sheet["file"])
+        try:
+            df = pd.read_parquet(data_path)
+        except Exception as e:
+            logger.warning(f"Could not read ingest cache {data_path}: {e}")
+            return None
+        metrics.inc("numpanda_store_bytes_read_total", {"kind": "ingest"}, os.path.getsize(data_path))
+        return FileSessionStore._restore_dtypes(df, sheet["dtypes"])
@@ -0,0 +1,164 @@
+import os
+import json
+import hashlib
+import logging
+import pandas as pd
+from typing import Optional, List, Tuple, Any, Dict
+from schemas.api import ActionSpec
+from engine.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+class PrefixCache:
+    """
+    Disk cache of intermediate results shared by all sessions.
+    An entry is the DataFrame produced by applying a prefix of a recipe to a dataset, keyed by
+    (dataset content hash, hash of the prefix's normalized operations), so sessions that start
+    with the same steps on the same data (drop ids, dropna, astype...) compute them once.
+    Only results that took at least MIN_SECONDS to compute are stored; the least recently used
+    entries are evicted once the cache exceeds MAX_BYTES.
+    Layout: <key>.parquet + <key>.json (dtypes, written last: its presence marks a complete entry).
+    """
+    ENABLED = os.getenv("PREFIX_CACHE", "1") != "0"
+    CACHE_DIR = os.getenv(
+        "PREFIX_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "prefixes")
+    )
+    MAX_BYTES = int(os.getenv("PREFIX_CACHE_MAX_BYTES", str(1024 ** 3)))
+    MIN_SECONDS = float(os.getenv("PREFIX_CACHE_MIN_SECONDS", "0.5"))
+    # Results computed by another pandas version may differ; they get other keys
+    KEY_VERSION = f"2-{pd.__version__}"
+
+    @classmethod
+    def dataset_key(cls, df: pd.DataFrame) -> str:
+        """
+        Content hash of a dataset (values, row order, column names and dtypes).
+        Empty string if the data can't be hashed (e.g. lists in cells): caching is skipped.
+        """
+        h = hashlib.sha256(cls.KEY_VERSION.encode())
+        try:
+            h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+            columns = []
+            for col, dtype in df.dtypes.items():
+                columns.append([str(col), str(dtype), cls._type_detail(df[col], h)])
+        except TypeError as e:
+            logger.info(f"Dataset not hashable, prefix cache disabled for it: {e}")
+            return ""
+        h.update(json.dumps(columns).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _type_detail(series: pd.Series, h: "hashlib._Hash") -> str:
+        """
+        What str(dtype) and the value hashes miss: category order and ordered flag (values
+        hash through their categories), and the Python types in object columns (1 and '1'
+        hash alike). Mixed object columns add the type of every value to h.
+        """
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            h.update(pd.util.hash_pandas_object(dtype.categories, index=False).values.tobytes())
+            return f"ordered={dtype.ordered} categories={dtype.categories.dtype}"
+        if dtype != object:
+            return ""
+        inferred = pd.api.types.infer_dtype(series, skipna=False)
+        if inferred.startswith("mixed"):
+            types = series.map(lambda v: type(v).__name__).to_numpy(dtype=object)
+            h.update(pd.util.hash_array(types).tobytes())
+        return inferred
+
+    @staticmethod
+    def _normalize(action: ActionSpec) -> str:
+        # Intent text and telemetry don't change the result
+        operations = [{"action": op.get("action"), "params": op.get("params", {})} for op in action.operations]
+        return json.dumps(operations, sort_keys=True, default=str)
+
+    @classmethod
+    def prefix_keys(cls, dataset_key: str, actions: List[ActionSpec]) -> List[str]:
+        """Key of every prefix: keys[i] identifies the result after actions[:i + 1]."""
+        keys = []
+        previous = dataset_key
+        for action in actions:
+            previous = hashlib.sha256((previous + cls._normalize(action)).encode()).hexdigest()
+            keys.append(previous)
+        return keys
+
+    @classmethod
+    def _paths(cls, key: str) -> Tuple[str, str]:
+        base = os.path.join(cls.CACHE_DIR, key)
+        return base + ".parquet", base + ".json"
+
+    @classmethod
+    def get(cls, key: str) -> Optional[pd.DataFrame]:
+        data_path, meta_path = cls._paths(key)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            df = pd.read_parquet(data_path)
+            os.utime(meta_path) # recency for LRU eviction
+        except Exception as e:
+            logger.warning(f"Could not read prefix cache entry {key}: {e}")
+            return None
+        metrics.inc("numpanda_prefix_cache_hits_total")
+        metrics.inc("numpanda_store_bytes_read_total", {"kind": "prefix"}, os.path.getsize(data_path))
+        from engine.session_store import FileSessionStore
+        return FileSessionStore._restore_dtypes(df, meta["dtypes"])
+
+    @classmethod
+    def longest(cls, keys: List[str]) -> Tuple[int, Optional[pd.DataFrame]]:
+        """(i, result after actions[:i + 1]) for the longest cached prefix, or (-1, None)."""
+        for i in range(len(keys) - 1, -1, -1):
+            df = cls.get(keys[i])
+            if df is not None:
+                return i, df
+        return -1, None
+
+    @classmethod
+    def put(cls, key: str, df: pd.DataFrame) -> None:
+        """Stores a result; failures (e.g. data Parquet can't hold) only skip caching."""
+        data_path, meta_path = cls._paths(key)
+        if os.path.exists(meta_path):
+            return
+        tmp_path = f"{data_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cls.CACHE_DIR, exist_ok=True)
+            # The index is kept: filters leave gaps that later steps may rely on
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, data_path)
+            tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"dtypes": df.dtypes.astype(str).to_dict(), "rows": len(df)}, f)
+            os.replace(tmp_path, meta_path)
+        except Exception as e:
+            logger.info(f"Prefix cache entry {key} not stored: {e}")
+            for path in (tmp_path, data_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        metrics.inc("numpanda_store_bytes_written_total", {"kind": "prefix"}, os.path.getsize(data_path))
+        cls._evict()
+
+    @classmethod
+    def _evict(cls) -> None:
+        entries: Dict[str, List[Any]] = {}
+        for entry in os.scandir(cls.CACHE_DIR):
+            key, ext = os.path.splitext(entry.name)
+            if ext not in (".parquet", ".json"):
+                continue
+            stat = entry.stat()
+            item = entries.setdefault(key, [0.0, 0])
+            item[1] += stat.st_size
+            if ext == ".json":
+                item[0] = stat.st_mtime
+        total = sum(size for _, size in entries.values())
+        for key, (mtime, size) in sorted(entries.items(), key=lambda e: e[1][0]):
+            if total <= cls.MAX_BYTES:
+                break
+            for path in cls._paths(key)[::-1]: # metadata first, so readers never see half an entry
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            metrics.inc("numpanda_prefix_cache_evictions_total")
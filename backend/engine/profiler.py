@@ -1,19 +1,78 @@
-from typing import List
+import os
+import time
+import logging
+import warnings
+from typing import Any, Iterator, List, Dict, Optional, Tuple
 from schemas.api import DatasetProfile, ColumnProfile
+from engine.telemetry import metrics
 import pandas as pd
 import numpy as np
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError: # public from pandas 2.2; requirements allow 2.1
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+logger = logging.getLogger(__name__)
+
+class _Budget:
+    """Time budget of one quality detector (Profiler.DETECTOR_BUDGET_MS)."""
+    def __init__(self, detector: str):
+        self.detector = detector
+        self.deadline = time.perf_counter() + Profiler.DETECTOR_BUDGET_MS / 1000
+
+    def remaining(self) -> float:
+        return self.deadline - time.perf_counter()
+
+    def exceeded(self) -> bool:
+        if self.remaining() > 0:
+            return False
+        self.skip()
+        return True
+
+    def skip(self) -> None:
+        # Suggestions are best effort: checks that don't fit are dropped
+        logger.info(f"Quality detector '{self.detector}' skipped a check at its time budget")
+        metrics.inc("numpanda_profiler_detector_timeouts_total", {"detector": self.detector})
 
 class Profiler:
     """
     Analyzes dataset metadata and statistics.
     """
+    # Rows the costly quality checks try before running on a full column
+    SAMPLE_ROWS = int(os.getenv("PROFILER_SAMPLE_ROWS", "10000"))
+    # Wall time each quality detector may spend; the remaining checks are skipped after it
+    DETECTOR_BUDGET_MS = float(os.getenv("PROFILER_DETECTOR_BUDGET_MS", "250"))
+
     @staticmethod
     def profile_dataset(df: pd.DataFrame) -> DatasetProfile:
+        for stage, result in Profiler.profile_stages(df):
+            pass
+        return result
+
+    @staticmethod
+    def profile_stages(df: pd.DataFrame) -> Iterator[Tuple[str, Any]]:
+        """
+        Computes the profile in stages of increasing cost, yielding (stage, fields) as each
+        one completes so callers can deliver partial results:
+        - shape: rows, columns, column_names, dtypes
+        - stats: missing_values and per-column missing count / numeric mean, min, max
+        - cardinality: per-column unique counts and deep memory usage
+        - suggestions: quality suggestions
+        and finally ("profile", DatasetProfile) with everything.
+        """
+        shape = {
+            "rows": len(df),
+            "columns": len(df.columns),
+            "column_names": list(df.columns),
+            "dtypes": df.dtypes.astype(str).to_dict(),
+        }
+        yield "shape", shape
+
         columns_details = {}
+        missing_counts = df.isnull().sum()
         for col in df.columns:
             dtype = str(df[col].dtype)
-            missing = int(df[col].isnull().sum())
-            unique = int(df[col].nunique())
+            missing = int(missing_counts[col])
             
             # Basic stats for numeric
             mean_val = None
@@ -32,91 +91,302 @@ class Profiler:
                 name=col,
                 dtype=dtype,
                 missing_count=missing,
-                unique_count=unique,
                 mean=mean_val,
                 min=min_val,
                 max=max_val
             )
+        missing_values = {col: details.missing_count for col, details in columns_details.items()}
+        yield "stats", {"missing_values": missing_values, "column_details": columns_details}
+
+        unique_counts = {col: int(n) for col, n in df.nunique().items()}
+        for col in df.columns:
+            columns_details[col].unique_count = unique_counts[col]
+        memory_usage_mb = float(df.memory_usage(deep=True).sum() / (1024 * 1024))
+        yield "cardinality", {"unique_counts": unique_counts, "memory_usage_mb": memory_usage_mb}
         
         # Analyze Quality Suggestions
-        suggestions = Profiler.analyze_quality(df)
-
-        return DatasetProfile(
-            rows=len(df),
-            columns=len(df.columns),
-            column_names=list(df.columns),
-            dtypes=df.dtypes.astype(str).to_dict(),
-            missing_values=df.isnull().sum().to_dict(),
-            memory_usage_mb=float(df.memory_usage(deep=True).sum() / (1024 * 1024)),
+        suggestions = Profiler.analyze_quality(df, unique_counts=unique_counts, missing=missing_values)
+        yield "suggestions", {"suggestions": suggestions}
+
+        yield "profile", DatasetProfile(
+            **shape,
+            missing_values=missing_values,
+            memory_usage_mb=memory_usage_mb,
             column_details=columns_details,
             suggestions=suggestions
         )
 
     @staticmethod
-    def analyze_quality(df: pd.DataFrame) -> List['DataSuggestion']:
+    def analyze_quality(df: pd.DataFrame, unique_counts: Optional[Dict[str, int]] = None,
+                        missing: Optional[Dict[str, int]] = None) -> List['DataSuggestion']:
+        """
+        Quality suggestions. unique_counts / missing (per column) are reused when the caller
+        already computed them (see profile_stages).
+        Costly checks run on a row sample first and are confirmed on the full column only
+        when the sample passes; each detector stops at DETECTOR_BUDGET_MS.
+        """
         from schemas.api import DataSuggestion
         suggestions = []
-        
+        rows = len(df)
+        if missing is None:
+            missing = df.isnull().sum().to_dict()
+        if unique_counts is None:
+            unique_counts = df.nunique().to_dict()
+        samples = Profiler._sample_columns(df)
+
+        candidates = []
         for col in df.columns:
-            # 1. Constant Column -> Drop
-            if df[col].nunique() <= 1:
+            # 1. All Null -> Drop
+            if rows and missing[col] == rows:
                 suggestions.append(DataSuggestion(
                     type='drop_column',
                     column=col,
-                    description=f"Column '{col}' has constant value.",
+                    description=f"Column '{col}' is empty.",
                     action_params={'column': col},
                     confidence=1.0
                 ))
-                continue # Skip other checks
-            
-            # 2. All Null -> Drop
-            # (Handled by unique=0 usually, depending on dropna)
-            if df[col].isnull().all():
-                 suggestions.append(DataSuggestion(
+                continue
+            # 2. Constant Column -> Drop
+            if unique_counts[col] <= 1:
+                suggestions.append(DataSuggestion(
                     type='drop_column',
                     column=col,
-                    description=f"Column '{col}' is empty.",
+                    description=f"Column '{col}' has constant value.",
                     action_params={'column': col},
                     confidence=1.0
                 ))
-                 continue
+                continue # Skip other checks
+            candidates.append(col)
 
-            # 3. Numeric as Object -> Astype
-            if df[col].dtype == 'object':
-                # Try converting to numeric
-                try:
-                    num_series = pd.to_numeric(df[col], errors='coerce')
-                    # If valid count is high (e.g. > 90% of non-nulls)
-                    non_null_original = df[col].dropna().count()
-                    non_null_numeric = num_series.dropna().count()
-                    
-                    if non_null_original > 0 and (non_null_numeric / non_null_original) > 0.95:
-                         suggestions.append(DataSuggestion(
-                            type='astype',
-                            column=col,
-                            description=f"Column '{col}' looks numeric.",
-                            action_params={'column': col, 'dtype': 'float'}, # Safe default
-                            confidence=0.9
-                        ))
-                except:
-                    pass
-            
-            # 4. Missing Values -> Drop NA or Fill NA (Contextual)
-            missing = df[col].isnull().sum()
-            if missing > 0:
-                 pct_missing = missing / len(df)
+        # Text columns (by the sample) are the candidates for the string detectors
+        text_columns = [
+            col for col in candidates
+            if df[col].dtype == 'object' and pd.api.types.infer_dtype(samples[col], skipna=True) == 'string'
+        ]
+
+        # 3. Numeric as Object -> Astype
+        budget = _Budget("numeric_strings")
+        typed = set()
+        for col in text_columns:
+            if budget.exceeded():
+                break
+            if Profiler._parses(samples[col], df[col], lambda s: pd.to_numeric(s, errors='coerce'), budget):
+                typed.add(col)
+                suggestions.append(DataSuggestion(
+                    type='astype',
+                    column=col,
+                    description=f"Column '{col}' looks numeric.",
+                    action_params={'column': col, 'dtype': 'float'}, # Safe default
+                    confidence=0.9
+                ))
+
+        # 4. Date strings -> To Datetime
+        budget = _Budget("datetime_strings")
+        for col in text_columns:
+            if budget.exceeded():
+                break
+            if col in typed:
+                continue
+            fmt = guess_datetime_format(samples[col].iloc[0])
+            if fmt is None:
+                continue
+            # With an explicit format parsing is vectorized (no per-value inference)
+            parse = lambda s: pd.to_datetime(s, format=fmt, errors='coerce')
+            if Profiler._parses(samples[col], df[col], parse, budget):
+                typed.add(col)
+                suggestions.append(DataSuggestion(
+                    type='to_datetime',
+                    column=col,
+                    description=f"Column '{col}' holds dates ({fmt}).",
+                    # Like the check above, the few values that don't parse become NaT
+                    action_params={'column': col, 'format': fmt, 'errors': 'coerce'},
+                    confidence=0.85
+                ))
+
+        # 5. Stray whitespace / case variants -> Normalize Text
+        budget = _Budget("text_inconsistencies")
+        for col in text_columns:
+            if budget.exceeded():
+                break
+            if col in typed:
+                continue
+            start = time.perf_counter()
+            distinct = samples[col].drop_duplicates()
+            dedup_seconds = time.perf_counter() - start
+            if not any(Profiler._text_issues(distinct)):
+                continue
+            issues_seconds = time.perf_counter() - start - dedup_seconds
+            # Confirmed on the distinct values (exact): unique() scales with the rows, the
+            # string methods with the distinct count
+            projected = dedup_seconds * len(df) / len(samples[col]) + issues_seconds * unique_counts[col] / len(distinct)
+            if projected > budget.remaining():
+                budget.skip()
+                continue
+            strip, fold = Profiler._text_issues(pd.Series(df[col].dropna().unique()))
+            if strip or fold:
+                found = [name for name, flag in (("surrounding whitespace", strip), ("case variants", fold)) if flag]
+                suggestions.append(DataSuggestion(
+                    type='normalize_text',
+                    column=col,
+                    description=f"Column '{col}' has {' and '.join(found)}.",
+                    action_params={'columns': [col], 'strip': True, 'case': 'lower' if fold else None},
+                    confidence=0.6
+                ))
+
+        # 6. Missing Values -> Drop NA or Fill NA (Contextual)
+        for col in candidates:
+            if missing[col] > 0:
+                 pct_missing = missing[col] / rows
                  if pct_missing < 0.1:
                       # Low missing -> Suggest Drop
                        suggestions.append(DataSuggestion(
                             type='drop_na',
                             column=col,
-                            description=f"Remove {missing} missing rows in '{col}'",
+                            description=f"Remove {missing[col]} missing rows in '{col}'",
                             action_params={'subset': [col]},
                             confidence=0.7
                         ))
                  else:
                      # High missing -> Suggest Fill
                      pass # Fill is harder to automate without context (mean? 0?)
+
+        # 7. Duplicate Rows -> Drop Duplicates
+        duplicates = Profiler._count_duplicates(df, _Budget("duplicate_rows"))
+        if duplicates:
+            suggestions.append(DataSuggestion(
+                type='drop_duplicates',
+                column='*',
+                description=f"Remove {duplicates} duplicate rows.",
+                action_params={},
+                confidence=0.8
+            ))
+
+        # 8. Oversized dtypes / low-cardinality text -> Optimize Memory (dataset-wide)
+        dtypes, saved_bytes = Profiler.plan_memory_optimization(df, unique_counts=unique_counts)
+        if dtypes and saved_bytes > 0:
+            suggestions.append(DataSuggestion(
+                type='optimize_memory',
+                column='*',
+                description=f"Compact {len(dtypes)} column(s) to smaller dtypes, saving ~{saved_bytes / (1024 * 1024):.2f} MB.",
+                action_params={'dtypes': dtypes},
+                confidence=0.8,
+                estimated_savings_bytes=saved_bytes
+            ))
         
         return suggestions
 
+    @staticmethod
+    def _sample_columns(df: pd.DataFrame) -> Dict[str, pd.Series]:
+        """Non-null values of every column at the same SAMPLE_ROWS random rows (all rows if fewer)."""
+        if len(df) > Profiler.SAMPLE_ROWS:
+            positions = np.sort(np.random.default_rng(0).choice(len(df), Profiler.SAMPLE_ROWS, replace=False))
+            df = df.iloc[positions]
+        return {col: df[col].dropna() for col in df.columns}
+
+    @staticmethod
+    def _parses(sample: pd.Series, column: pd.Series, parse, budget: '_Budget') -> bool:
+        """
+        Whether more than 95% of the non-null values parse: tried on the sample, then confirmed
+        on the full column unless the sample's time, extrapolated, exceeds the budget left.
+        """
+        start = time.perf_counter()
+        if Profiler._parsed_share(sample, parse) <= 0.95:
+            return False
+        if (time.perf_counter() - start) * len(column) / len(sample) > budget.remaining():
+            budget.skip()
+            return False
+        return Profiler._parsed_share(column.dropna(), parse) > 0.95
+
+    @staticmethod
+    def _parsed_share(values: pd.Series, parse) -> float:
+        """Share of (non-null) values that parse, 0.0 when there are none."""
+        if values.empty:
+            return 0.0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return float(parse(values).notna().sum() / len(values))
+
+    @staticmethod
+    def _text_issues(values: pd.Series) -> Tuple[bool, bool]:
+        """(values with surrounding whitespace, distinct values equal up to case) among distinct strings."""
+        stripped = values.str.strip()
+        strip = bool((stripped != values).any())
+        fold = stripped.str.lower().nunique() < stripped.nunique()
+        return strip, fold
+
+    @staticmethod
+    def _count_duplicates(df: pd.DataFrame, budget: '_Budget') -> int:
+        """
+        Duplicate rows in df, or 0 when the full check would not fit in the budget. The time
+        of the first SAMPLE_ROWS rows is extrapolated first (duplicates within a sample say
+        little about the full data, so the sample only estimates the cost).
+        """
+        if len(df) < 2 or len(df.columns) == 0:
+            return 0
+        try:
+            start = time.perf_counter()
+            df.iloc[:Profiler.SAMPLE_ROWS].duplicated()
+            projected = (time.perf_counter() - start) * len(df) / min(len(df), Profiler.SAMPLE_ROWS)
+            if projected > budget.remaining():
+                budget.skip()
+                return 0
+            return int(df.duplicated().sum())
+        except TypeError: # unhashable cells, e.g. lists
+            return 0
+
+    @staticmethod
+    def plan_memory_optimization(df: pd.DataFrame, category_threshold: float = 0.5,
+                                 unique_counts: Optional[Dict[str, int]] = None) -> Tuple[Dict[str, str], int]:
+        """
+        Finds columns that can be stored in a smaller dtype without losing information.
+        Returns a {column: dtype} mapping for the optimize_memory action and the estimated bytes saved.
+        Known unique_counts skip text columns of high cardinality before their values are read.
+        """
+        dtypes: Dict[str, str] = {}
+        saved_bytes = 0
+
+        for col in df.columns:
+            series = df[col]
+            kind = series.dtype.kind
+
+            if kind in 'iu':
+                if series.empty:
+                    continue
+                # Smallest integer type of the same signedness that holds min..max
+                lo, hi = series.min(), series.max()
+                candidates = ['int8', 'int16', 'int32'] if kind == 'i' else ['uint8', 'uint16', 'uint32']
+                target = next((t for t in candidates if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max), None)
+                if target and np.dtype(target).itemsize < series.dtype.itemsize:
+                    dtypes[col] = target
+                    saved_bytes += len(series) * (series.dtype.itemsize - np.dtype(target).itemsize)
+
+            elif kind == 'f':
+                if series.dtype.itemsize <= 4:
+                    continue
+                # Only downcast when every value survives the float32 round trip
+                values = series.to_numpy()
+                with np.errstate(over='ignore'):
+                    compact = values.astype('float32')
+                if np.array_equal(compact.astype(series.dtype), values, equal_nan=True):
+                    dtypes[col] = 'float32'
+                    saved_bytes += len(series) * (series.dtype.itemsize - 4)
+
+            elif kind == 'O':
+                if unique_counts is not None and unique_counts[col] > category_threshold * len(series):
+                    continue
+                non_null = series.dropna()
+                if non_null.empty or pd.api.types.infer_dtype(non_null, skipna=True) != 'string':
+                    continue
+                uniques = non_null.unique()
+                if len(uniques) / len(series) > category_threshold:
+                    continue
+                # Category = small integer codes + one copy of each distinct value
+                current = int(series.memory_usage(deep=True, index=False))
+                codes_size = np.min_scalar_type(len(uniques)).itemsize
+                compact = len(series) * codes_size + int(pd.Series(uniques).memory_usage(deep=True, index=False))
+                if compact < current:
+                    dtypes[col] = 'category'
+                    saved_bytes += current - compact
+
+        return dtypes, saved_bytes
+
@@ -1,20 +1,33 @@
+import time
 import pandas as pd
-from typing import List, Optional
-from schemas.api import ActionSpec
+from typing import List, Optional, Dict, Any, Tuple, Callable
+from schemas.api import ActionSpec, ActionTelemetry
 from engine.actions import ActionRegistry
 from engine.dataset_loader import DatasetLoader
 from engine.profiler import Profiler
+from engine.prefix_cache import PrefixCache
 from schemas.api import DatasetResponse
 
 class Session:
     """
     Manages the state of a user session, including the dataset history (Time Travel).
     """
-    def __init__(self, session_id: str, initial_df: pd.DataFrame, file_path: str = "", file_type: str = "csv"):
+    # How many input states keep action cache entries (bounded memory per session)
+    MAX_CACHED_STATES = 4
+    # First chunk size for lazy previews (see get_preview_df)
+    PREVIEW_CHUNK_ROWS = 10_000
+    # Cached profiles/exports per session (see get_artifact)
+    MAX_CACHED_ARTIFACTS = 8
+
+    def __init__(self, session_id: str, initial_df: pd.DataFrame, file_path: str = "", file_type: str = "csv",
+                 load_options: Optional[Dict[str, Any]] = None, copy: bool = True):
         self.session_id = session_id
-        self.initial_df = initial_df.copy()
+        # copy=False adopts initial_df as is (the caller must not modify it afterwards)
+        self.initial_df = initial_df.copy() if copy else initial_df
         self.file_path = file_path
         self.file_type = file_type
+        # Extra reader arguments used for the source (e.g. sheet_name), repeated in exported code
+        self.load_options: Dict[str, Any] = load_options or {}
         
         # History tracks the actions applied
         self.history: List[ActionSpec] = []
@@ -23,13 +36,38 @@ class Session:
         # -1 means initial state (no actions appied)
         # 0 means after first action, etc.
         self.current_step: int = -1
+
+        # Bumped whenever history is rewritten (apply). Undo/redo only move current_step,
+        # so (version, current_step) uniquely identifies a state, e.g. for ETags.
+        self.version: int = 0
+        # Saves of this session so far, persisted by the store to detect concurrent writers
+        self.revision: int = 0
         
         # Cache the current state DataFrame to avoid recomputing from scratch every time
         # In a real heavy app, we might want to cache every step or use checkpoints.
         # For V1, simple recompute or single-step update is fine. 
         # But to support Undo/Redo efficiently, we can recompute from initial if needed, 
         # or keep a cache of the current valid DF.
-        self._current_df_cache: Optional[pd.DataFrame] = self.initial_df.copy()
+        self._current_df_cache: Optional[pd.DataFrame] = self.initial_df.copy(deep=copy)
+
+        # Per-state scratch space for cache-aware actions (e.g. sort_values' factorized keys),
+        # keyed by the step whose result is the action's input (-1 = initial_df).
+        self._action_cache: Dict[int, Dict[Any, Any]] = {}
+
+        # Derived outputs (profile, exported code) keyed by (version, step, kind)
+        self._artifact_cache: Dict[Tuple[int, int, str], Any] = {}
+
+        # Schema (rows, column dtypes) of each step's result, persisted by the store so
+        # column-only consumers never need the data (see get_schema)
+        self._schemas: Dict[int, Dict[str, Any]] = {}
+
+        # Content hash of initial_df for the shared prefix cache; computed on first use, persisted
+        self.dataset_hash: Optional[str] = None
+
+        # Persisted states of this session, managed by the store (see FileSessionStore.save)
+        self.checkpoints: List[Dict[str, Any]] = []
+        # Key of the shared snapshot holding initial_df, if any (also store-managed)
+        self.snapshot: Optional[str] = None
 
     def get_current_df(self) -> pd.DataFrame:
         if self._current_df_cache is None:
@@ -39,43 +77,172 @@ class Session:
     def apply_action(self, action: ActionSpec):
         # If we are in the middle of history and apply a new action, 
         # we discard all future redo-able actions (branching time not supported in V1)
+        # Optimization: Apply directly to current cache instead of full recompute
+        # This is strictly valid only if operations are purely deterministic and sequential.
+        # Executed before touching history so a failing action leaves the session unchanged.
+        # Telemetry is measured here, never taken from the request; a prefix cache hit has none
+        action.telemetry = None
+        op_stats: List[Dict[str, Any]] = []
+        new_df = self._apply_next(self.history[:self.current_step + 1] + [action], op_stats)
+        if op_stats:
+            action.telemetry = ActionTelemetry(
+                wall_ms=sum(s["wall_ms"] for s in op_stats),
+                peak_rss_delta_mb=max((s["peak_rss_delta_mb"] for s in op_stats if s["peak_rss_delta_mb"] is not None), default=None),
+                rows_in=op_stats[0]["rows_in"],
+                columns_in=op_stats[0]["columns_in"],
+                rows_out=op_stats[-1]["rows_out"],
+                columns_out=op_stats[-1]["columns_out"],
+            )
+
         if self.current_step < len(self.history) - 1:
             self.history = self.history[:self.current_step + 1]
         
         self.history.append(action)
         self.current_step += 1
-        
-        # Optimization: Apply directly to current cache instead of full recompute
-        # This is strictly valid only if operations are purely deterministic and sequential.
-        new_df = self._apply_single_action(self.get_current_df(), action)
+        self.version += 1
         self._current_df_cache = new_df
 
+        # States after the previous step are new now; their cached data is stale
+        for step in [k for k in self._action_cache if k >= self.current_step]:
+            del self._action_cache[step]
+        for step in [k for k in self._schemas if k >= self.current_step]:
+            del self._schemas[step]
+
+    def cached_artifact(self, kind: str) -> Optional[Any]:
+        """The cached output of the current state, or None; never builds it."""
+        return self._artifact_cache.get((self.version, self.current_step, kind))
+
+    def get_artifact(self, kind: str, build: Callable[[], Any]) -> Any:
+        """
+        Returns a cached derived output of the current state, building it on first use.
+        """
+        key = (self.version, self.current_step, kind)
+        if key not in self._artifact_cache:
+            if len(self._artifact_cache) >= self.MAX_CACHED_ARTIFACTS:
+                del self._artifact_cache[next(iter(self._artifact_cache))]
+            self._artifact_cache[key] = build()
+        return self._artifact_cache[key]
+
+    def get_schema(self) -> Dict[str, Any]:
+        """
+        {"rows": int, "dtypes": {column: dtype}} of the current state. Known for every step
+        whose result was materialized before, so undo/redo and reloads don't replay for it.
+        """
+        if self.current_step not in self._schemas:
+            df = self.get_current_df()
+            self._schemas[self.current_step] = {
+                "rows": len(df),
+                "dtypes": {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+            }
+        return self._schemas[self.current_step]
+
+    def get_preview_df(self, n: int = 5) -> pd.DataFrame:
+        """
+        Returns the first n rows of the current state without materializing it when possible.
+        If every applied action is row-local, they are run over growing chunks of initial_df
+        until n rows come out; anything else (e.g. groupby) needs the full result.
+        """
+        if self._current_df_cache is not None:
+            return self._current_df_cache.head(n)
+
+        applied = self.history[:self.current_step + 1]
+        row_local = all(
+            ActionRegistry.is_row_local(op.get("action"))
+            for action in applied for op in action.operations
+        )
+        if not row_local:
+            return self.get_current_df().head(n)
+
+        parts = []
+        produced = 0
+        start = 0
+        chunk_rows = max(self.PREVIEW_CHUNK_ROWS, n)
+        while True:
+            chunk = self.initial_df.iloc[start:start + chunk_rows]
+            for action in applied:
+                chunk = self._apply_single_action(chunk, action)
+            parts.append(chunk)
+            produced += len(chunk)
+            start += chunk_rows
+            if produced >= n or start >= len(self.initial_df):
+                break
+            # Selective filters: grow chunks geometrically to bound the number of passes
+            chunk_rows *= 2
+
+        return pd.concat(parts).head(n) if len(parts) > 1 else parts[0].head(n)
+
     def undo(self):
         if self.current_step >= 0:
             self.current_step -= 1
-            self._recompute_current_state()
+            # Rebuilt on demand; a preview of a row-local history won't need the full frame
+            self._current_df_cache = None
 
     def redo(self):
         if self.current_step < len(self.history) - 1:
-            self.current_step += 1
             # Optimization: We can just apply the next action to the current state
-            action_to_apply = self.history[self.current_step]
-            self._current_df_cache = self._apply_single_action(self.get_current_df(), action_to_apply)
+            new_df = self._apply_next(self.history[:self.current_step + 2])
+            self.current_step += 1
+            self._current_df_cache = new_df
+
+    def _prefix_keys(self, actions: List[ActionSpec]) -> List[str]:
+        """Shared prefix cache keys of actions (applied to initial_df); empty when caching is off."""
+        if not PrefixCache.ENABLED or not actions:
+            return []
+        if self.dataset_hash is None:
+            self.dataset_hash = PrefixCache.dataset_key(self.initial_df)
+        if not self.dataset_hash:
+            return []
+        return PrefixCache.prefix_keys(self.dataset_hash, actions)
+
+    def _apply_next(self, actions: List[ActionSpec], op_stats: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+        """
+        Result of actions[-1] applied to the current state (the result of actions[:-1]),
+        read from the shared prefix cache when another session already computed it.
+        """
+        keys = self._prefix_keys(actions)
+        new_df = PrefixCache.get(keys[-1]) if keys else None
+        if new_df is None:
+            start = time.perf_counter()
+            new_df = self._apply_single_action(self.get_current_df(), actions[-1], len(actions) - 2, op_stats)
+            if keys and time.perf_counter() - start >= PrefixCache.MIN_SECONDS:
+                PrefixCache.put(keys[-1], new_df)
+        return new_df
 
     def _recompute_current_state(self):
         """
-        Rebuilds the current dataframe from initial_df by applying all actions up to current_step.
+        Rebuilds the current dataframe by applying all actions up to current_step, starting
+        from the longest prefix in the shared cache (else from initial_df). Results that took
+        long to reach from the last cached state are added to the cache.
         """
-        df = self.initial_df.copy()
-        for i in range(self.current_step + 1):
+        keys = self._prefix_keys(self.history[:self.current_step + 1])
+        start_step, df = PrefixCache.longest(keys) if keys else (-1, None)
+        if df is None:
+            df = self.initial_df.copy()
+        uncached_seconds = 0.0
+        for i in range(start_step + 1, self.current_step + 1):
             action = self.history[i]
-            df = self._apply_single_action(df, action)
+            start = time.perf_counter()
+            df = self._apply_single_action(df, action, i - 1)
+            uncached_seconds += time.perf_counter() - start
+            if keys and uncached_seconds >= PrefixCache.MIN_SECONDS:
+                PrefixCache.put(keys[i], df)
+                uncached_seconds = 0.0
         self._current_df_cache = df
 
-    def _apply_single_action(self, df: pd.DataFrame, action: ActionSpec) -> pd.DataFrame:
+    def _apply_single_action(self, df: pd.DataFrame, action: ActionSpec, input_step: Optional[int] = None,
+                             op_stats: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
         """
         Executes a single high-level action (which might contain multiple operations, but V1 assumes 1 op = 1 action usually)
+        `input_step` is the step that produced df; it scopes the action cache.
+        If `op_stats` is given, per-operation telemetry is appended to it.
         """
+        cache = None
+        if input_step is not None and len(action.operations) == 1:
+            if input_step not in self._action_cache and len(self._action_cache) >= self.MAX_CACHED_STATES:
+                # Drop the least recently created state's scratch data
+                del self._action_cache[next(iter(self._action_cache))]
+            cache = self._action_cache.setdefault(input_step, {})
+
         # We process the list of operations in the ActionSpec
         current_df = df
         for op in action.operations:
@@ -85,5 +252,8 @@ class Session:
              action_name = op.get("action")
              params = op.get("params", {})
              if action_name:
-                 current_df = ActionRegistry.execute(current_df, action_name, params)
+                 stats = {} if op_stats is not None else None
+                 current_df = ActionRegistry.execute(current_df, action_name, params, cache=cache, stats=stats)
+                 if stats:
+                     op_stats.append(stats)
         return current_df
@@ -1,13 +1,27 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, Dict, Any, List, Callable, Iterator, Tuple
 import os
 import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 import pandas as pd
 from engine.session import Session
+from engine.prefix_cache import PrefixCache
+from engine.shared_datasets import SharedDatasets
+from engine.telemetry import metrics
 import logging
 
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process locking
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+class SessionConflictError(RuntimeError):
+    """The session was saved by another worker since this copy was loaded."""
+
 class SessionStore(ABC):
     @abstractmethod
     def save(self, session: Session) -> None:
@@ -17,6 +31,11 @@ class SessionStore(ABC):
     def load(self, session_id: str) -> Optional[Session]:
         pass
 
+    @abstractmethod
+    def load_metadata(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session metadata (version, current_step, ...) without loading any data."""
+        pass
+
     @abstractmethod
     def delete(self, session_id: str) -> None:
         pass
@@ -25,8 +44,39 @@ class FileSessionStore(SessionStore):
     """
     Stores sessions using JSON for metadata and Parquet for data.
     Secure replacement for Pickle.
+    Besides initial_df, the current state is persisted as a checkpoint when replaying to it
+    from the nearest persisted state would cost at least CHECKPOINT_MIN_MS (the actions'
+    recorded wall time), so a reload resumes there instead of replaying the whole history.
+    Snapshots (initial data and checkpoints) are Parquet by default. The "arrow" format writes
+    uncompressed Arrow IPC (Feather v2) files that are memory-mapped on load: numeric columns
+    without missing values are used in place (zero-copy, pages read only when touched), at
+    the cost of larger files. Text columns are still converted to Python objects.
+    Arrow snapshots are content-addressed and reference counted in SharedDatasets
+    (SHARED_DATASET_DIR, default <storage_dir>/shared): sessions on the same data share
+    one file, and worker processes mapping it share one copy in memory.
+    Several processes (e.g. uvicorn workers) may share storage_dir: every save bumps the
+    session's revision under a per-session file lock, a save based on an older revision
+    raises SessionConflictError, and cached sessions are re-read once their metadata file
+    changed on disk.
     """
-    def __init__(self, storage_dir: str = None):
+    SNAPSHOT_FORMATS = ("parquet", "arrow")
+    CHECKPOINT_MIN_MS = float(os.getenv("SESSION_CHECKPOINT_MIN_MS", "1000"))
+    # Per session; beyond this the checkpoint saving the least replay time is dropped
+    MAX_CHECKPOINTS = int(os.getenv("SESSION_MAX_CHECKPOINTS", "3"))
+
+    def __init__(self, storage_dir: str = None, cache_size: int = 8, snapshot_format: Optional[str] = None):
+        self.snapshot_format = snapshot_format or os.getenv("SESSION_SNAPSHOT_FORMAT", "parquet")
+        if self.snapshot_format not in self.SNAPSHOT_FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {self.snapshot_format}. Allowed: {list(self.SNAPSHOT_FORMATS)}")
+        # Recently used sessions stay in memory (with their materialized DataFrame and
+        # action caches) so consecutive requests skip the Parquet read and history replay.
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Session]" = OrderedDict()
+        # Identity of the metadata file each cached session was read from / saved as
+        self._stamps: Dict[str, Tuple[int, int, int]] = {}
+        # Requests and the background warm-up (see engine/warmup.py) share the cache
+        self._lock = threading.Lock()
+
         if storage_dir is None:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.storage_dir = os.path.join(base_dir, "sessions")
@@ -34,48 +84,328 @@ class FileSessionStore(SessionStore):
             self.storage_dir = storage_dir
         
         os.makedirs(self.storage_dir, exist_ok=True)
+        self._shared: Optional[SharedDatasets] = None
+
+    @property
+    def shared(self) -> SharedDatasets:
+        if self._shared is None:
+            self._shared = SharedDatasets(os.getenv("SHARED_DATASET_DIR") or os.path.join(self.storage_dir, "shared"))
+        return self._shared
 
     def _get_json_path(self, session_id: str) -> str:
         return os.path.join(self.storage_dir, f"{session_id}.json")
 
+    def _get_lock_path(self, session_id: str) -> str:
+        return os.path.join(self.storage_dir, "locks", f"{session_id}.lock")
+
+    def _stamp(self, session_id: str) -> Optional[Tuple[int, int, int]]:
+        # Metadata is replaced atomically, so every save makes a new inode
+        try:
+            stat = os.stat(self._get_json_path(session_id))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _locked(self, session_id: str) -> Iterator[None]:
+        """Serializes saves of one session across processes."""
+        os.makedirs(os.path.dirname(self._get_lock_path(session_id)), exist_ok=True)
+        with open(self._get_lock_path(session_id), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stored_revision(self, session_id: str) -> Optional[int]:
+        """Revision of the saved metadata, None if the session is not (or no longer) stored."""
+        try:
+            with open(self._get_json_path(session_id), "r") as f:
+                return json.load(f).get("revision", 0)
+        except FileNotFoundError:
+            return None
+
     def _get_parquet_path(self, session_id: str) -> str:
         return os.path.join(self.storage_dir, f"{session_id}.parquet")
 
+    def _get_arrow_path(self, session_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{session_id}.arrow")
+
+    def data_path(self, session_id: str) -> str:
+        """
+        Where the session's initial data lives. Loaders may write it before the first save
+        (see ChunkedLoader); save() keeps an existing file (converted once to the arrow format
+        if that is configured).
+        """
+        return self._get_parquet_path(session_id)
+
+    def _existing_data_path(self, session_id: str) -> Optional[str]:
+        for path in (self._get_arrow_path(session_id), self._get_parquet_path(session_id)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def _write_frame(df: pd.DataFrame, path: str, index: bool, format: Optional[str] = None) -> None:
+        """Parquet or Arrow IPC, by default by extension."""
+        if (format or os.path.splitext(path)[1].lstrip(".")) == "arrow":
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            table = pa.Table.from_pandas(df, preserve_index=None if index else False)
+            # One chunk per column: a column split over chunks can't be used without copying
+            feather.write_feather(table, path, compression="uncompressed", chunksize=max(len(df), 1))
+        else:
+            df.to_parquet(path, index=None if index else False)
+
+    @staticmethod
+    def _read_frame(path: str) -> pd.DataFrame:
+        if path.endswith(".arrow"):
+            import pyarrow as pa
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            # split_blocks keeps one block per column, so numeric columns stay views of the map
+            df = table.to_pandas(split_blocks=True)
+        else:
+            df = pd.read_parquet(path)
+        kind = "arrow" if path.endswith(".arrow") else "parquet"
+        metrics.inc("numpanda_store_bytes_read_total", {"kind": kind}, os.path.getsize(path))
+        return df
+
+    def _get_checkpoint_path(self, checkpoint: Dict[str, Any]) -> str:
+        if "shared" in checkpoint:
+            return self.shared.path(checkpoint["shared"])
+        return os.path.join(self.storage_dir, checkpoint["file"])
+
+    def _share(self, session: Session, key_for: Callable[[str], str], df: pd.DataFrame, index: bool) -> Optional[str]:
+        """
+        Registers session as a user of the shared snapshot of df (written if new). key_for maps
+        the dataset hash to the snapshot key. None when the data can't be hashed.
+        """
+        if session.dataset_hash is None:
+            session.dataset_hash = PrefixCache.dataset_key(session.initial_df)
+        if not session.dataset_hash:
+            return None
+        key = key_for(session.dataset_hash)
+        def write(path: str) -> None:
+            self._write_frame(df, path, index=index, format="arrow")
+            metrics.inc("numpanda_store_bytes_written_total", {"kind": "arrow"}, os.path.getsize(path))
+        self.shared.acquire(key, session.session_id, write)
+        return key
+
+    @staticmethod
+    def _history_keys(session: Session) -> List[str]:
+        # Identifies each step's result independent of the data: a rewritten step gets a new key
+        return PrefixCache.prefix_keys("", session.history)
+
+    def _update_checkpoints(self, session: Session) -> List[Dict[str, Any]]:
+        """
+        Drops checkpoints of steps the history no longer has and writes one for the current
+        state if it is worth it. Returns the checkpoint records that are no longer used
+        (their files are deleted once the metadata stops referencing them).
+        """
+        keys = self._history_keys(session)
+        valid, removed = [], []
+        for checkpoint in session.checkpoints:
+            step = checkpoint["step"]
+            (valid if step < len(keys) and keys[step] == checkpoint["history_key"] else removed).append(checkpoint)
+
+        step = session.current_step
+        if step >= 0 and session._current_df_cache is not None and all(c["step"] != step for c in valid):
+            base = max((c["step"] for c in valid if c["step"] < step), default=-1)
+            replay_ms = sum(a.telemetry.wall_ms for a in session.history[base + 1:step + 1] if a.telemetry)
+            if replay_ms >= self.CHECKPOINT_MIN_MS:
+                df = session._current_df_cache
+                record = {"step": step, "history_key": keys[step], "replay_ms": replay_ms, "dtypes": df.dtypes.astype(str).to_dict()}
+                path = None
+                try:
+                    # Index kept: filtered states have gaps later steps may rely on
+                    shared_key = None
+                    if self.snapshot_format == "arrow":
+                        # Same data and steps give the same state in every session
+                        shared_key = self._share(
+                            session, lambda dataset: PrefixCache.prefix_keys(dataset, session.history[:step + 1])[-1], df, index=True
+                        )
+                    if shared_key is not None:
+                        record["shared"] = shared_key
+                    else:
+                        record["file"] = f"{session.session_id}.step{step}-{keys[step][:12]}.{self.snapshot_format}"
+                        path = self._get_checkpoint_path(record)
+                        self._write_frame(df, path, index=True)
+                        metrics.inc("numpanda_store_bytes_written_total", {"kind": "checkpoint"}, os.path.getsize(path))
+                    valid.append(record)
+                except Exception as e:
+                    logger.warning(f"Checkpoint of session {session.session_id} not written: {e}")
+                    if path is not None and os.path.exists(path):
+                        os.remove(path)
+
+        while len(valid) > self.MAX_CHECKPOINTS:
+            cheapest = min(valid, key=lambda c: c["replay_ms"])
+            valid.remove(cheapest)
+            removed.append(cheapest)
+        session.checkpoints = sorted(valid, key=lambda c: c["step"])
+        return removed
+
+    def _remove_checkpoint_files(self, session_id: str, checkpoints: List[Dict[str, Any]]) -> None:
+        for checkpoint in checkpoints:
+            if "shared" in checkpoint:
+                self.shared.release(checkpoint["shared"], session_id)
+                continue
+            try:
+                os.remove(self._get_checkpoint_path(checkpoint))
+            except FileNotFoundError:
+                pass
+
     def save(self, session: Session) -> None:
+        with self._locked(session.session_id):
+            stored = self._stored_revision(session.session_id)
+            if stored is not None and stored != session.revision:
+                # This copy is stale; the next load reads the saved one
+                self._forget(session.session_id)
+                raise SessionConflictError(f"Session {session.session_id} was modified by another request; reload it.")
+            self._save(session)
+
+    def _save(self, session: Session) -> None:
         try:
+            # Written before the metadata that references them
+            removed_checkpoints = self._update_checkpoints(session)
+            if self.snapshot_format == "arrow" and session.snapshot is None:
+                session.snapshot = self._share(session, lambda dataset: dataset, session.initial_df, index=False)
+
             # 1. Save Metadata (JSON)
+            session.get_schema() # current step's schema is always recorded
             metadata = {
                 "session_id": session.session_id,
                 "file_path": session.file_path,
                 "file_type": session.file_type,
+                "load_options": session.load_options,
                 "current_step": session.current_step,
-                "history": [action.dict() for action in session.history] # Ensure ActionSpec is serializable
+                "version": session.version,
+                "revision": session.revision + 1,
+                "dataset_hash": session.dataset_hash,
+                "history": [action.dict() for action in session.history], # Ensure ActionSpec is serializable
+                # Parquet drops some pandas dtypes (e.g. category of ints), so keep them to restore on load
+                "dtypes": session.initial_df.dtypes.astype(str).to_dict(),
+                # Result schema of the steps materialized so far, for load_schema
+                "schemas": {str(step): schema for step, schema in session._schemas.items()},
+                "checkpoints": session.checkpoints,
+                "snapshot": session.snapshot,
             }
             
             json_path = self._get_json_path(session.session_id)
-            with open(json_path, "w") as f:
+            tmp_path = f"{json_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
                 json.dump(metadata, f, indent=2)
+            os.replace(tmp_path, json_path)
+            session.revision += 1
+            metrics.inc("numpanda_store_bytes_written_total", {"kind": "json"}, os.path.getsize(json_path))
 
             # 2. Save Data (Parquet) - We store the INITIAL dataframe to allow full replay
             # We only save it if it doesn't exist to save IO? 
             # Or always overwrite? Always overwrite is safer contextually but slower.
             # Actually, initial_df never changes for a session ID. 
-            # But let's verify if parquet exists first.
-            parquet_path = self._get_parquet_path(session.session_id)
-            if not os.path.exists(parquet_path):
+            # But let's verify if a data file exists first.
+            existing_path = self._existing_data_path(session.session_id)
+            if session.snapshot is not None:
+                if existing_path is not None:
+                    os.remove(existing_path) # superseded by the shared snapshot
+            elif existing_path is None or (self.snapshot_format == "arrow" and not existing_path.endswith(".arrow")):
+                data_path = (self._get_arrow_path if self.snapshot_format == "arrow" else self._get_parquet_path)(session.session_id)
                 # Ensure string columns are consistent (Parquet strictness)
                 # But to_parquet handles most.
-                session.initial_df.to_parquet(parquet_path, index=False)
+                self._write_frame(session.initial_df, data_path, index=False)
+                metrics.inc("numpanda_store_bytes_written_total", {"kind": self.snapshot_format}, os.path.getsize(data_path))
+                if existing_path is not None and data_path.endswith(".arrow"):
+                    os.remove(existing_path) # superseded by the snapshot
+
+            self._remove_checkpoint_files(session.session_id, removed_checkpoints)
+            self._remember(session, stamp=self._stamp(session.session_id))
             
         except Exception as e:
             logger.error(f"Failed to save session {session.session_id}: {e}")
             raise e
 
+    def _remember(self, session: Session, replace: bool = True, stamp: Optional[Tuple[int, int, int]] = None) -> Session:
+        """
+        Caches the session and returns the cached instance. Loads pass replace=False so a
+        copy read from disk never overwrites one that was saved while it was being read.
+        stamp identifies the metadata file the session matches (see _cached).
+        """
+        if self.cache_size <= 0:
+            return session
+        with self._lock:
+            if not replace and session.session_id in self._cache:
+                return self._cache[session.session_id]
+            self._cache[session.session_id] = session
+            self._stamps[session.session_id] = stamp
+            self._cache.move_to_end(session.session_id)
+            while len(self._cache) > self.cache_size:
+                evicted, _ = self._cache.popitem(last=False)
+                self._stamps.pop(evicted, None)
+                metrics.inc("numpanda_session_cache_evictions_total")
+            metrics.set("numpanda_session_cache_size", len(self._cache))
+        return session
+
+    def _forget(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            cached = self._cache.pop(session_id, None)
+            self._stamps.pop(session_id, None)
+            metrics.set("numpanda_session_cache_size", len(self._cache))
+        return cached
+
+    def _cached(self, session_id: str) -> Optional[Session]:
+        """The cached session, unless another process saved it since (its metadata changed)."""
+        stamp = self._stamp(session_id)
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is None:
+                return None
+            if self._stamps.get(session_id) != stamp:
+                del self._cache[session_id]
+                del self._stamps[session_id]
+                metrics.set("numpanda_session_cache_size", len(self._cache))
+                return None
+            self._cache.move_to_end(session_id)
+            return cached
+
     def load(self, session_id: str) -> Optional[Session]:
+        cached = self._cached(session_id)
+        if cached is not None:
+            metrics.inc("numpanda_session_cache_hits_total")
+            return cached
+
+        metrics.inc("numpanda_session_cache_misses_total")
+        stamp = self._stamp(session_id)
+        session = self._read(session_id)
+        return self._remember(session, replace=False, stamp=stamp) if session is not None else None
+
+    def warm(self, session_id: str) -> bool:
+        """
+        Reads a session into the cache with its current state materialized, so the first
+        request after a restart skips the Parquet read and history replay.
+        """
+        if self._cached(session_id) is not None:
+            return True
+        stamp = self._stamp(session_id)
+        session = self._read(session_id)
+        if session is None:
+            return False
+        session.get_current_df()
+        self._remember(session, replace=False, stamp=stamp)
+        return True
+
+    def recent_session_ids(self, limit: int) -> List[str]:
+        """Most recently saved sessions first (by metadata mtime)."""
+        entries = []
+        for entry in os.scandir(self.storage_dir):
+            if entry.name.endswith(".json") and entry.is_file():
+                entries.append((entry.stat().st_mtime, entry.name[:-len(".json")]))
+        entries.sort(reverse=True)
+        return [session_id for _, session_id in entries[:limit]]
+
+    def _read(self, session_id: str) -> Optional[Session]:
         json_path = self._get_json_path(session_id)
-        parquet_path = self._get_parquet_path(session_id)
-        
-        if not os.path.exists(json_path) or not os.path.exists(parquet_path):
+        if not os.path.exists(json_path):
             return None
         
         try:
@@ -84,14 +414,22 @@ class FileSessionStore(SessionStore):
                 metadata = json.load(f)
             
             # 2. Load Data
-            initial_df = pd.read_parquet(parquet_path)
+            snapshot = metadata.get("snapshot")
+            snapshot_path = self.shared.path(snapshot) if snapshot else self._existing_data_path(session_id)
+            if snapshot_path is None or not os.path.exists(snapshot_path):
+                return None
+            initial_df = self._read_frame(snapshot_path)
+            metrics.inc("numpanda_store_bytes_read_total", {"kind": "json"}, os.path.getsize(json_path))
+            initial_df = self._restore_dtypes(initial_df, metadata.get("dtypes", {}))
             
             # 3. Reconstruct Session
             session = Session(
                 session_id=metadata["session_id"],
                 initial_df=initial_df,
                 file_path=metadata.get("file_path", ""),
-                file_type=metadata.get("file_type", "csv")
+                file_type=metadata.get("file_type", "csv"),
+                load_options=metadata.get("load_options"),
+                copy=False # freshly read; a copy would also load every memory-mapped page
             )
             
             # Restore state
@@ -99,6 +437,16 @@ class FileSessionStore(SessionStore):
             from schemas.api import ActionSpec
             session.history = [ActionSpec(**h) for h in metadata.get("history", [])]
             session.current_step = metadata.get("current_step", -1)
+            session.version = metadata.get("version", 0)
+            session.revision = metadata.get("revision", 0)
+            session.dataset_hash = metadata.get("dataset_hash")
+            session._schemas = {int(step): schema for step, schema in metadata.get("schemas", {}).items()}
+            session.checkpoints = metadata.get("checkpoints", [])
+            session.snapshot = snapshot
+            # The constructor cached initial_df as the current state; rebuild lazily on first access
+            if session.current_step >= 0:
+                session._current_df_cache = None
+                self._resume_from_checkpoint(session)
             
             return session
             
@@ -106,14 +454,113 @@ class FileSessionStore(SessionStore):
             logger.error(f"Failed to load session {session_id}: {e}")
             return None
 
+    def _resume_from_checkpoint(self, session: Session) -> None:
+        """
+        Materializes the current state from the nearest checkpoint at or before it, replaying
+        only the actions after it. Without a usable checkpoint the state stays lazy.
+        """
+        usable = [c for c in session.checkpoints if c["step"] <= session.current_step]
+        if not usable:
+            return
+        checkpoint = max(usable, key=lambda c: c["step"])
+        path = self._get_checkpoint_path(checkpoint)
+        try:
+            df = self._read_frame(path)
+        except Exception as e:
+            logger.warning(f"Could not read checkpoint {path}, replaying instead: {e}")
+            return
+        df = self._restore_dtypes(df, checkpoint["dtypes"])
+        for i in range(checkpoint["step"] + 1, session.current_step + 1):
+            df = session._apply_single_action(df, session.history[i], i - 1)
+        session._current_df_cache = df
+
+    def load_metadata(self, session_id: str) -> Optional[Dict[str, Any]]:
+        cached = self._cached(session_id)
+        if cached is not None:
+            return {
+                "session_id": cached.session_id,
+                "current_step": cached.current_step,
+                "version": cached.version,
+            }
+
+        json_path = self._get_json_path(session_id)
+        if not os.path.exists(json_path):
+            return None
+        try:
+            with open(json_path, "r") as f:
+                metadata = json.load(f)
+            metadata.setdefault("version", 0)
+            return metadata
+        except Exception as e:
+            logger.error(f"Failed to load metadata for session {session_id}: {e}")
+            return None
+
+    def load_schema(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Current state's schema ({"rows", "dtypes"} plus session_id, version, current_step)
+        from memory or the metadata file. Only sessions saved before schemas were recorded
+        are loaded (and replayed) for it.
+        """
+        cached = self._cached(session_id)
+        if cached is not None:
+            schema, version, step = cached.get_schema(), cached.version, cached.current_step
+        else:
+            metadata = self.load_metadata(session_id)
+            if metadata is None:
+                return None
+            version, step = metadata.get("version", 0), metadata.get("current_step", -1)
+            schema = metadata.get("schemas", {}).get(str(step))
+            if schema is None:
+                session = self.load(session_id)
+                if session is None:
+                    return None
+                schema, version, step = session.get_schema(), session.version, session.current_step
+        return {"session_id": session_id, "version": version, "current_step": step, **schema}
+
+    @staticmethod
+    def _restore_dtypes(df: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+        """
+        Re-applies the dtypes recorded at save time where the Parquet round trip changed them
+        (compact numerics and categoricals produced by optimize_memory).
+        """
+        changed = {
+            col: dtype for col, dtype in dtypes.items()
+            if col in df.columns and str(df[col].dtype) != dtype
+        }
+        for col, dtype in changed.items():
+            try:
+                df[col] = df[col].astype(dtype)
+            except (TypeError, ValueError) as e:
+                logger.warning(f"Could not restore dtype {dtype} for column '{col}': {e}")
+        return df
+
     def delete(self, session_id: str) -> None:
+        cached = self._forget(session_id)
         json_path = self._get_json_path(session_id)
         parquet_path = self._get_parquet_path(session_id)
         
         try:
+            # Shared snapshots are released (and removed with their last user)
+            if cached is not None:
+                snapshot, checkpoints = cached.snapshot, cached.checkpoints
+            else:
+                metadata = self.load_metadata(session_id) or {}
+                snapshot, checkpoints = metadata.get("snapshot"), metadata.get("checkpoints", [])
+            if snapshot:
+                self.shared.release(snapshot, session_id)
+            self._remove_checkpoint_files(session_id, [c for c in checkpoints if "shared" in c])
+
             if os.path.exists(json_path):
                 os.remove(json_path)
             if os.path.exists(parquet_path):
                 os.remove(parquet_path)
+            if os.path.exists(self._get_arrow_path(session_id)):
+                os.remove(self._get_arrow_path(session_id))
+            if os.path.exists(self._get_lock_path(session_id)):
+                os.remove(self._get_lock_path(session_id))
+            prefix = f"{session_id}.step"
+            for entry in os.scandir(self.storage_dir):
+                if entry.name.startswith(prefix) and entry.name.endswith((".parquet", ".arrow")):
+                    os.remove(entry.path)
         except Exception as e:
             logger.error(f"Failed to delete session {session_id}: {e}")
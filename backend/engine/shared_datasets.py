@@ -0,0 +1,90 @@
+import os
+import shutil
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process locking
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class SharedDatasets:
+    """
+    Host-wide, content-addressed snapshot files with reference counting.
+    Every worker process maps the same file read-only (see FileSessionStore's arrow format),
+    so the OS keeps one copy of the data in memory for all of them, and sessions on the same
+    data (or reaching the same checkpoint) share one file.
+    A reference is a file per owning session under <key>.refs/; the snapshot is removed
+    when the last session releases it. Changes are serialized across processes with flock on
+    one lock file (they only happen on session save/delete).
+    Point SHARED_DATASET_DIR at a tmpfs (e.g. /dev/shm) to keep snapshots in RAM.
+    """
+    EXTENSION = ".arrow"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key + self.EXTENSION)
+
+    def _refs_dir(self, key: str) -> str:
+        return os.path.join(self.root, key + ".refs")
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(os.path.join(self.root, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def acquire(self, key: str, owner: str, write: Callable[[str], None]) -> str:
+        """
+        Registers owner as a user of the snapshot, writing it with write(path) if no one
+        has yet. Idempotent per owner. Returns the snapshot path.
+        """
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            # Written outside the lock (it may be large); a concurrent writer of the same key just loses
+            if not os.path.exists(path):
+                write(tmp_path)
+            with self._locked():
+                if not os.path.exists(path):
+                    if not os.path.exists(tmp_path): # released since the check above
+                        write(tmp_path)
+                    os.replace(tmp_path, path)
+                os.makedirs(self._refs_dir(key), exist_ok=True)
+                open(os.path.join(self._refs_dir(key), owner), "a").close()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def release(self, key: str, owner: str) -> None:
+        """Drops owner's reference; the last one removes the snapshot."""
+        refs_dir = self._refs_dir(key)
+        with self._locked():
+            try:
+                os.remove(os.path.join(refs_dir, owner))
+            except FileNotFoundError:
+                pass
+            if os.path.isdir(refs_dir) and os.listdir(refs_dir):
+                return
+            # Processes that still map the file keep their pages until they unmap it
+            if os.path.exists(self.path(key)):
+                os.remove(self.path(key))
+            shutil.rmtree(refs_dir, ignore_errors=True)
+            logger.info(f"Removed shared snapshot {key}")
+
+    def ref_count(self, key: str) -> int:
+        refs_dir = self._refs_dir(key)
+        return len(os.listdir(refs_dir)) if os.path.isdir(refs_dir) else 0
@@ -0,0 +1,220 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Seconds; spans sub-millisecond column edits up to multi-minute loads
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics (counters, gauges, histograms) rendered in the
+    Prometheus text exposition format for the /metrics endpoint.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._help[name] = (metric_type, help_text)
+        if metric_type == "histogram":
+            self._buckets[name] = buckets
+
+    @staticmethod
+    def _key(labels: Optional[Dict[str, str]]) -> LabelKey:
+        return tuple(sorted((labels or {}).items()))
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1.0) -> None:
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            key = self._key(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values.setdefault(name, {})[self._key(labels)] = value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        buckets = self._buckets.get(name, DEFAULT_BUCKETS)
+        with self._lock:
+            # Layout: one count per bucket, then +Inf count, then sum
+            state = self._histograms.setdefault(name, {}).setdefault(self._key(labels), [0.0] * (len(buckets) + 2))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def get(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(name, {}).get(self._key(labels), 0.0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = [(k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in pairs]
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name in sorted(set(self._help) | set(self._values) | set(self._histograms)):
+                metric_type, help_text = self._help.get(name, ("untyped", ""))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in sorted(self._values.get(name, {}).items()):
+                    lines.append(f"{name}{self._format_labels(key)} {value:g}")
+                buckets = self._buckets.get(name, DEFAULT_BUCKETS)
+                for key, state in sorted(self._histograms.get(name, {}).items()):
+                    for bound, count in zip(buckets, state):
+                        lines.append(f"{name}_bucket{self._format_labels(key, ('le', f'{bound:g}'))} {count:g}")
+                    lines.append(f"{name}_bucket{self._format_labels(key, ('le', '+Inf'))} {state[-2]:g}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {state[-1]:g}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {state[-2]:g}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("numpanda_action_duration_seconds", "histogram", "Wall time of a single action execution.")
+metrics.describe("numpanda_action_rows_in_total", "counter", "Rows passed into actions.")
+metrics.describe("numpanda_action_rows_out_total", "counter", "Rows produced by actions.")
+metrics.describe("numpanda_action_errors_total", "counter", "Actions that raised an error.")
+metrics.describe("numpanda_http_request_duration_seconds", "histogram", "HTTP request latency per route.")
+metrics.describe("numpanda_session_cache_hits_total", "counter", "Session loads served from memory.")
+metrics.describe("numpanda_session_cache_misses_total", "counter", "Session loads that read from disk.")
+metrics.describe("numpanda_session_cache_evictions_total", "counter", "Sessions evicted from the in-memory cache.")
+metrics.describe("numpanda_session_cache_size", "gauge", "Sessions currently held in memory.")
+metrics.describe("numpanda_prefix_cache_hits_total", "counter", "Recipe prefixes read from the shared result cache.")
+metrics.describe("numpanda_prefix_cache_evictions_total", "counter", "Entries evicted from the shared result cache.")
+metrics.describe("numpanda_profiler_detector_timeouts_total", "counter", "Quality checks skipped at their detector's time budget.")
+metrics.describe("numpanda_store_bytes_read_total", "counter", "Bytes read by the session store.")
+metrics.describe("numpanda_store_bytes_written_total", "counter", "Bytes written by the session store.")
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Process high-water mark RSS in MB (None where unsupported).
+    The difference across a call is the peak memory it added beyond any earlier peak.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Stopwatch:
+    """
+    Context manager measuring wall time and the peak RSS increase of a block.
+    """
+    def __enter__(self) -> "Stopwatch":
+        self.peak_before = peak_rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self.start
+        peak_after = peak_rss_mb()
+        self.peak_rss_delta_mb = (
+            peak_after - self.peak_before if peak_after is not None and self.peak_before is not None else None
+        )
+
+# Request phase timing
+# The HTTP middleware installs a list per request; code on the request path records named phases into it.
+_request_phases: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_phases", default=None)
+
+def start_request_phases() -> List[Tuple[str, float]]:
+    phases: List[Tuple[str, float]] = []
+    _request_phases.set(phases)
+    return phases
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Times a block as a named phase of the current request (no-op outside a request).
+    """
+    phases = _request_phases.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if phases is not None:
+            phases.append((name, time.perf_counter() - start))
+
+def summarize_phases(phases: List[Tuple[str, float]]) -> Dict[str, float]:
+    """Milliseconds per phase, summing repeats, in first-seen order."""
+    summary: Dict[str, float] = {}
+    for name, seconds in phases:
+        summary[name] = summary.get(name, 0.0) + seconds * 1000
+    return summary
+
+def server_timing_header(summary: Dict[str, float], total_ms: float) -> str:
+    entries = [f"{name};dur={ms:.1f}" for name, ms in summary.items()]
+    entries.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+class RequestProfiler:
+    """
+    Opt-in cProfile hook: profiles a sample of requests and keeps the .prof dump of those
+    slower than the threshold. Enabled by setting PROFILE_REQUESTS_DIR.
+    Inspect dumps with `python -m pstats <file>` or snakeviz.
+    """
+    OUTPUT_DIR = os.getenv("PROFILE_REQUESTS_DIR", "")
+    THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "500"))
+    SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "1.0"))
+
+    # Only one profiler can be active per interpreter; concurrent requests skip profiling
+    _active = threading.Lock()
+
+    @classmethod
+    def start(cls) -> Optional[cProfile.Profile]:
+        if not cls.OUTPUT_DIR or random.random() >= cls.SAMPLE_RATE:
+            return None
+        if not cls._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # another tool's profiler is already running
+            cls._active.release()
+            return None
+        return profiler
+
+    @classmethod
+    def stop(cls, profiler: Optional[cProfile.Profile], label: str, total_ms: float) -> Optional[str]:
+        if profiler is None:
+            return None
+        try:
+            profiler.disable()
+            if total_ms < cls.THRESHOLD_MS:
+                return None
+            os.makedirs(cls.OUTPUT_DIR, exist_ok=True)
+            safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")
+            path = os.path.join(cls.OUTPUT_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}-{total_ms:.0f}ms.prof")
+            profiler.dump_stats(path)
+            return path
+        except Exception as e:
+            logger.error(f"Failed to write request profile: {e}")
+            return None
+        finally:
+            cls._active.release()
@@ -4,7 +4,7 @@ import shutil
 import logging
 from fastapi import UploadFile
 from pathlib import Path
-from typing import Tuple
+from typing import Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +21,15 @@ class UploadManager:
         os.makedirs(cls.UPLOAD_DIR, exist_ok=True)
 
     @classmethod
-    def clear_uploads(cls):
-        """Removes all files in the upload directory on startup."""
+    def clear_uploads(cls, older_than: Optional[float] = None):
+        """
+        Removes all files in the upload directory on startup.
+        With older_than (a timestamp) only older files go, so cleanup can run in the
+        background without deleting uploads that arrive meanwhile.
+        """
+        if older_than is not None:
+            cls._clear_uploads_before(older_than)
+            return
         if os.path.exists(cls.UPLOAD_DIR):
             try:
                 shutil.rmtree(cls.UPLOAD_DIR)
@@ -31,6 +38,24 @@ class UploadManager:
             except Exception as e:
                 logger.error(f"Failed to clear upload directory: {e}")
 
+    @classmethod
+    def _clear_uploads_before(cls, timestamp: float):
+        if not os.path.exists(cls.UPLOAD_DIR):
+            return
+        removed = 0
+        for entry in os.scandir(cls.UPLOAD_DIR):
+            try:
+                if entry.stat().st_mtime >= timestamp:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+                removed += 1
+            except OSError as e:
+                logger.error(f"Failed to remove upload {entry.path}: {e}")
+        logger.info(f"Removed {removed} old uploads from {cls.UPLOAD_DIR}")
+
     @classmethod
     async def save_upload(cls, file: UploadFile) -> Tuple[str, str]:
         """
@@ -0,0 +1,92 @@
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from engine.session_store import FileSessionStore
+
+logger = logging.getLogger(__name__)
+
+class SessionWarmer:
+    """
+    Background warm-up after a restart: imports heavy optional modules and loads the most
+    recently used sessions into the store cache, materialized to their current step.
+    The API keeps serving while this runs; status() reports progress for /ready.
+    """
+    # Imported up front so the first Parquet read/write does not pay for them
+    WARM_IMPORTS = ["pyarrow", "pyarrow.parquet"]
+
+    def __init__(self, store: FileSessionStore, limit: int = 4, tasks: Optional[List[Callable[[], Any]]] = None):
+        # More sessions than the cache holds would only evict each other
+        self.store = store
+        self.limit = max(0, min(limit, store.cache_size))
+        # Extra startup work run first (e.g. upload cleanup)
+        self.tasks = tasks or []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {
+            "state": "pending",
+            "sessions_total": 0,
+            "sessions_warmed": 0,
+            "sessions_failed": 0,
+            "duration_ms": None,
+        }
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run, name="session-warmup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = dict(self._status)
+        status["ready"] = status["state"] in ("ready", "failed")
+        return status
+
+    def _update(self, **changes: Any) -> None:
+        with self._lock:
+            self._status.update(changes)
+
+    def _increment(self, key: str) -> None:
+        with self._lock:
+            self._status[key] += 1
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        self._update(state="running")
+        try:
+            for task in self.tasks:
+                try:
+                    task()
+                except Exception as e:
+                    logger.error(f"Startup task failed: {e}")
+
+            for module in self.WARM_IMPORTS:
+                try:
+                    importlib.import_module(module)
+                except ImportError:
+                    pass
+
+            session_ids = self.store.recent_session_ids(self.limit) if self.limit else []
+            self._update(sessions_total=len(session_ids))
+            for session_id in session_ids:
+                try:
+                    warmed = self.store.warm(session_id)
+                except Exception as e:
+                    logger.warning(f"Could not warm session {session_id}: {e}")
+                    warmed = False
+                self._increment("sessions_warmed" if warmed else "sessions_failed")
+            self._update(state="ready")
+        except Exception as e:
+            # Warm-up is an optimization; the API works without it
+            logger.error(f"Session warm-up failed: {e}")
+            self._update(state="failed")
+        finally:
+            duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            self._update(duration_ms=duration_ms)
+            logger.info(f"Warm-up finished: {self.status()}")
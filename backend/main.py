@@ -1,22 +1,36 @@
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, JSONResponse, PlainTextResponse, StreamingResponse
 from engine.dataset_loader import DatasetLoader
+from engine.chunked_loader import ChunkedLoader
 from engine.profiler import Profiler
 from engine.session import Session
 from engine.code_generator import CodeGenerator
+from engine.data_exporter import DataExporter
 from engine.secure_loader import SecureLoader, SecurityException
-from engine.session_store import FileSessionStore
+from engine.session_store import FileSessionStore, SessionConflictError
 from engine.upload_manager import UploadManager
-from schemas.api import DatasetLoadRequest, DatasetResponse, ActionSpec
+from engine.ingest import IngestCache
+from engine.warmup import SessionWarmer
+from engine.telemetry import metrics, phase, start_request_phases, summarize_phases, server_timing_header, RequestProfiler
+from schemas.api import DatasetLoadRequest, DatasetResponse, DatasetProfile, ActionSpec
 import uuid
 import os
-from typing import Dict
+import pandas as pd
+import time
+import json
+from typing import Any, Dict, Iterator, Optional, List
 import logging
 
 # Setup Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# One JSON line per request with phase timings
+request_logger = logging.getLogger("numpanda.requests")
 
 app = FastAPI(title="Pandas Generator Studio API")
 
@@ -33,8 +47,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],
 )
 
+class EventStreamAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip that leaves Server-Sent Events alone: the compressor would hold events back
+    until enough data accumulates. EventSource requests always send Accept: text/event-stream.
+    """
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and "text/event-stream" in Headers(scope=scope).get("accept", ""):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_vary(message):
+            # Compressed responses add Accept-Encoding to the Vary the route already set
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if "vary" in headers:
+                    headers["vary"] = ", ".join(dict.fromkeys(v.strip() for v in headers["vary"].split(",")))
+            await send(message)
+        await super().__call__(scope, receive, send_with_vary)
+
+# Compress larger JSON/code bodies (previews, profiles, exports)
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=1024)
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """
+    Times each request and its phases (load, replay, action, profile, preview, save, ...):
+    Server-Timing header, structured log line, latency histogram and optional cProfile dump.
+    """
+    phases = start_request_phases()
+    profiler = RequestProfiler.start()
+    start = time.perf_counter()
+    response = None
+    try:
+        response = await call_next(request)
+    finally:
+        # Also when the app raised: the profiler must be released and the request counted
+        total_ms = (time.perf_counter() - start) * 1000
+
+        # Route template (/session/{session_id}/apply), not the raw path, to keep label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        profile_path = RequestProfiler.stop(profiler, f"{request.method}-{route}", total_ms)
+        summary = summarize_phases(phases)
+
+        metrics.observe("numpanda_http_request_duration_seconds", total_ms / 1000, {"method": request.method, "route": route})
+        request_logger.info(json.dumps({
+            "event": "request",
+            "method": request.method,
+            "route": route,
+            "status": response.status_code if response is not None else 500,
+            "total_ms": round(total_ms, 2),
+            "phases_ms": {name: round(ms, 2) for name, ms in summary.items()},
+            **({"profile": profile_path} if profile_path else {}),
+        }))
+    response.headers["Server-Timing"] = server_timing_header(summary, total_ms)
+    return response
+
 # Exception Handlers
 @app.exception_handler(SecurityException)
 async def security_exception_handler(request: Request, exc: SecurityException):
@@ -45,6 +116,11 @@ async def security_exception_handler(request: Request, exc: SecurityException):
 async def file_not_found_handler(request: Request, exc: FileNotFoundError):
     return JSONResponse(status_code=404, content={"detail": "File not found"})
 
+@app.exception_handler(SessionConflictError)
+async def session_conflict_handler(request: Request, exc: SessionConflictError):
+    # Another worker saved the session first; the client retries on the saved state
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
 @app.exception_handler(ValueError)
 async def value_error_handler(request: Request, exc: ValueError):
     return JSONResponse(status_code=400, content={"detail": str(exc)})
@@ -57,11 +133,87 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Persistent Session Store
 session_store = FileSessionStore()
 
+# Conditional responses
+# A session state is immutable for a given (version, step). The tag is weak: gzip and
+# identity bodies of the same state share it, which a strong tag must not do.
+def state_etag(session_id: str, version: int, step: int, variant: str = "") -> str:
+    return f'W/"{session_id}-{version}-{step}{"-" + variant if variant else ""}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    # If-None-Match uses weak comparison
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    # no-cache: clients may store the body but must revalidate with If-None-Match
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+
+def check_not_modified(request: Request, session_id: str, variant: str = "") -> Optional[Response]:
+    """
+    Answers 304 from session metadata alone (no Parquet read or replay) when the client's copy is current.
+    """
+    metadata = session_store.load_metadata(session_id)
+    if not metadata:
+        raise HTTPException(status_code=404, detail="Session not found")
+    etag = state_etag(session_id, metadata.get("version", 0), metadata.get("current_step", -1), variant)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+def current_profile(session: Session) -> DatasetProfile:
+    with phase("replay"):
+        session.get_current_df()
+    with phase("profile"):
+        return session.get_artifact("profile", lambda: Profiler.profile_dataset(session.get_current_df()))
+
+def load_session(session_id: str) -> Session:
+    with phase("load"):
+        session = session_store.load(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+def load_schema(session_id: str) -> Dict[str, Any]:
+    with phase("load"):
+        schema = session_store.load_schema(session_id)
+    if not schema:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return schema
+
+def schema_key(schema: Dict[str, Any]):
+    # (session, version, step) identifies a state, hence its columns
+    return (schema["session_id"], schema["version"], schema["current_step"])
+
+def save_session(session: Session) -> None:
+    with phase("save"):
+        session_store.save(session)
+
+def session_state_response(session: Session) -> DatasetResponse:
+    profile = current_profile(session)
+    with phase("preview"):
+        preview = DatasetLoader.get_preview(session.get_current_df())
+    return DatasetResponse(
+        id=session.session_id,
+        preview=preview,
+        profile=profile,
+        history=session.history[:session.current_step + 1]
+    )
+
+# Background warm-up of the most recently used sessions (0 disables)
+warmer = SessionWarmer(session_store, limit=int(os.getenv("WARMUP_SESSIONS", "4")))
+
 # Startup Event
 def startup_event():
     SecureLoader.ensure_data_dir_exists()
-    UploadManager.clear_uploads() # Cleanup old uploads on restart
-    logger.info(f"Services initialized. Uploads cleared.")
+    UploadManager.ensure_upload_dir()
+    # Cleanup of old uploads and session warm-up run in the background so the API is up immediately
+    started_at = time.time()
+    warmer.tasks.append(lambda: UploadManager.clear_uploads(older_than=started_at))
+    warmer.start()
+    logger.info(f"Services initialized. Upload cleanup and warm-up running in background.")
 
 app.add_event_handler("startup", startup_event)
 
@@ -69,14 +221,41 @@ app.add_event_handler("startup", startup_event)
 async def health_check():
     return {"status": "ok", "service": "pandas-generator-studio-backend"}
 
+@app.get("/ready")
+async def readiness():
+    """Warm-up progress; 503 until recent sessions are loaded (the API itself already serves)."""
+    status = warmer.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of action/endpoint latency, session cache and store I/O metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/dataset/upload")
-async def upload_dataset(file: UploadFile = File(...)):
+async def upload_dataset(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
     Uploads a file to the server for processing.
     Returns a file_id (UUID) to be used in /dataset/load.
+    Supported files are converted to a columnar cache after the response is sent.
     """
     file_id, original_name = await UploadManager.save_upload(file)
-    return {"file_id": file_id, "original_name": original_name}
+    file_type = DatasetLoader.infer_file_type(original_name)
+    ingest = "skipped"
+    if file_type and IngestCache.supports(file_type):
+        IngestCache.mark_pending(file_id)
+        background_tasks.add_task(IngestCache.convert, file_id, UploadManager.get_path(file_id), file_type)
+        ingest = "pending"
+    return {"file_id": file_id, "original_name": original_name, "ingest": ingest}
+
+@app.get("/dataset/upload/{file_id}/schema")
+async def get_upload_schema(file_id: str):
+    """Ingest status and inferred schema (sheets, rows, dtypes) of an upload."""
+    UploadManager.get_path(file_id) # 404/400 for unknown or malformed IDs
+    schema = IngestCache.get_schema(file_id)
+    if schema is None:
+        raise HTTPException(status_code=404, detail="Upload was not converted")
+    return schema
 
 @app.post("/dataset/load", response_model=DatasetResponse)
 async def load_dataset(request: DatasetLoadRequest):
@@ -87,11 +266,14 @@ async def load_dataset(request: DatasetLoadRequest):
     # 1. Resolve Path
     file_path = request.file_path
     
+    upload_id = None
+    
     # Try as Upload ID first
     try:
         # Check if it looks like a valid UUID (simple heuristic or let get_path fail)
         uuid.UUID(file_path)
         validated_path = UploadManager.get_path(file_path)
+        upload_id = file_path
         logger.info(f"Loaded via UploadID: {file_path}")
     except (ValueError, FileNotFoundError):
         # Fallback to SecureLoader for local paths
@@ -103,109 +285,218 @@ async def load_dataset(request: DatasetLoadRequest):
              raise HTTPException(status_code=404, detail="File ID or Path not found")
 
     # 2. Load Dataset
-    df = DatasetLoader.load_dataset(validated_path, request.file_type)
     session_id = str(uuid.uuid4())
+    with phase("read"):
+        # Uploads usually have a columnar copy (see IngestCache); otherwise parse the file.
+        # The load may wait for a conversion still running, so it stays off the event loop.
+        df = await run_in_threadpool(IngestCache.load, upload_id, request.file_type, request.sheet_name) if upload_id else None
+        if df is None and request.sheet_name is None and ChunkedLoader.should_chunk(validated_path, request.file_type):
+            # Large CSV / JSON Lines go chunk by chunk into the session's Parquet file
+            data_path = session_store.data_path(session_id)
+            ChunkedLoader.write_parquet(validated_path, request.file_type, data_path)
+            df = pd.read_parquet(data_path)
+        elif df is None:
+            df = DatasetLoader.load_dataset(validated_path, request.file_type, sheet_name=request.sheet_name)
     
     # Create new session
-    session = Session(session_id, df, file_path=validated_path, file_type=request.file_type)
-    session_store.save(session)
+    load_options = {"sheet_name": request.sheet_name} if request.sheet_name is not None else {}
+    session = Session(session_id, df, file_path=validated_path, file_type=request.file_type, load_options=load_options)
+    save_session(session)
     
     # Get initial view
-    current_df = session.get_current_df()
-    preview = DatasetLoader.get_preview(current_df)
-    profile = Profiler.profile_dataset(current_df)
-    
-    return DatasetResponse(id=session_id, preview=preview, profile=profile, history=[])
+    return session_state_response(session)
 
 @app.get("/dataset/{session_id}/preview")
-async def get_preview(session_id: str):
-    session = session_store.load(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+async def get_preview(session_id: str, request: Request):
+    not_modified = check_not_modified(request, session_id)
+    if not_modified:
+        return not_modified
+
+    session = load_session(session_id)
     
-    df = session.get_current_df()
-    return DatasetLoader.get_preview(df)
+    # Lazy: only the first rows of a row-local recipe are computed
+    with phase("preview"):
+        preview = jsonable_encoder(DatasetLoader.get_preview(session.get_preview_df()))
+    etag = state_etag(session_id, session.version, session.current_step)
+    return JSONResponse(content=preview, headers=cache_headers(etag))
+
+@app.get("/dataset/{session_id}/profile", response_model=DatasetProfile)
+async def get_profile(session_id: str, request: Request):
+    not_modified = check_not_modified(request, session_id, "profile")
+    if not_modified:
+        return not_modified
+
+    session = load_session(session_id)
+
+    etag = state_etag(session_id, session.version, session.current_step, "profile")
+    return JSONResponse(content=jsonable_encoder(current_profile(session)), headers=cache_headers(etag))
+
+def sse_event(event: str, data: Any) -> bytes:
+    # Same JSON rules as JSONResponse
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), allow_nan=False)}\n\n".encode("utf-8")
+
+def profile_events(session: Session) -> Iterator[bytes]:
+    """
+    preview, then the profile stages (shape, stats, cardinality, suggestions), then the
+    complete profile. A profile already cached for this state is sent right after the preview.
+    The generator runs in the threadpool while /apply, /undo and /redo may change the same
+    Session, so it only reads the artifact cache: a profile stored from here could be filed
+    under a state other than the one it was computed from.
+    """
+    try:
+        # Lazy: a row-local recipe only computes the first rows
+        yield sse_event("preview", DatasetLoader.get_preview(session.get_preview_df()))
+        profile = session.cached_artifact("profile")
+        if profile is not None:
+            yield sse_event("profile", profile)
+            return
+        for stage, result in Profiler.profile_stages(session.get_current_df()):
+            yield sse_event(stage, result)
+    except Exception as e:
+        # Headers are sent already: report the failure as an event
+        logger.error(f"Profile stream for session {session.session_id} failed: {e}", exc_info=True)
+        detail = str(e) if isinstance(e, ValueError) else "Internal Server Error"
+        yield sse_event("error", {"detail": detail})
+
+@app.get("/session/{session_id}/profile/stream")
+async def stream_profile(session_id: str):
+    """
+    Server-Sent Events with the preview and profile of the current state as they become
+    available: preview, shape, stats, cardinality, suggestions, profile (complete).
+    The stream ends after the profile (or an error event); clients should close their
+    EventSource then, or it reconnects.
+    """
+    session = load_session(session_id)
+    return StreamingResponse(
+        profile_events(session),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: keep reverse proxies (nginx) from buffering events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/session/{session_id}/apply", response_model=DatasetResponse)
 async def apply_action(session_id: str, action: ActionSpec):
-    session = session_store.load(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = load_session(session_id)
+    with phase("replay"):
+        session.get_current_df()
     
-    session.apply_action(action)
-    session_store.save(session) # Persistence: Save after modification
+    with phase("action"):
+        session.apply_action(action)
+    save_session(session) # Persistence: Save after modification
     
-    current_df = session.get_current_df()
-    return DatasetResponse(
-        id=session_id,
-        preview=DatasetLoader.get_preview(current_df),
-        profile=Profiler.profile_dataset(current_df),
-        history=session.history[:session.current_step + 1]
-    )
+    return session_state_response(session)
 
 @app.post("/session/{session_id}/undo", response_model=DatasetResponse)
 async def undo_action(session_id: str):
-    session = session_store.load(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = load_session(session_id)
+    with phase("replay"):
+        session.get_current_df()
     
-    session.undo()
-    session_store.save(session)
+    with phase("action"):
+        session.undo()
+    save_session(session)
     
-    current_df = session.get_current_df()
-    return DatasetResponse(
-        id=session_id,
-        preview=DatasetLoader.get_preview(current_df),
-        profile=Profiler.profile_dataset(current_df),
-        history=session.history[:session.current_step + 1]
-    )
+    return session_state_response(session)
 
 @app.post("/session/{session_id}/redo", response_model=DatasetResponse)
 async def redo_action(session_id: str):
-    session = session_store.load(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = load_session(session_id)
+    with phase("replay"):
+        session.get_current_df()
     
-    session.redo()
-    session_store.save(session)
+    with phase("action"):
+        session.redo()
+    save_session(session)
     
-    current_df = session.get_current_df()
-    return DatasetResponse(
-        id=session_id,
-        preview=DatasetLoader.get_preview(current_df),
-        profile=Profiler.profile_dataset(current_df),
-        history=session.history[:session.current_step + 1]
-    )
+    return session_state_response(session)
+
+@app.get("/session/{session_id}/schema")
+async def get_schema(session_id: str, request: Request):
+    """
+    Row count and column dtypes of the current state, answered from session metadata
+    without reading or replaying the data.
+    """
+    not_modified = check_not_modified(request, session_id, "schema")
+    if not_modified:
+        return not_modified
+
+    schema = load_schema(session_id)
+    content = {**schema, "columns": list(schema["dtypes"])}
+    etag = state_etag(session_id, schema["version"], schema["current_step"], "schema")
+    return JSONResponse(content=content, headers=cache_headers(etag))
 
 @app.get("/session/{session_id}/export")
-async def export_session_code(session_id: str, format: str = "py"):
-    session = session_store.load(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+async def export_session_code(session_id: str, request: Request, format: str = "py", optimize: bool = False):
+    """
+    Exports the recipe as a script (py), notebook (ipynb) or out-of-core chunked script (chunked).
+    optimize=true emits code tuned for large inputs (column pruning, explicit dtypes,
+    fused filters, copy-on-write).
+    """
+    variant = f"export-{format}" + ("-optimized" if optimize else "")
+    not_modified = check_not_modified(request, session_id, variant)
+    if not_modified:
+        return not_modified
+
+    session = load_session(session_id)
     
-    if format == "ipynb":
-        content = CodeGenerator.generate_notebook(
-            actions=session.history[:session.current_step + 1],
-            original_file_path=session.file_path,
-            file_type=session.file_type
-        )
-        media_type = "application/x-ipynb+json"
-        filename = "pandas_analysis.ipynb"
-    else:
-        content = CodeGenerator.generate_script(
-            actions=session.history[:session.current_step + 1],
-            original_file_path=session.file_path,
-            file_type=session.file_type
-        )
-        media_type = "text/x-python"
-        filename = "pandas_script.py"
+    with phase("export"):
+        content, media_type, filename = render_export(session, format, optimize)
     
+    etag = state_etag(session_id, session.version, session.current_step, variant)
     return Response(
         content=content,
         media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}", **cache_headers(etag)}
+    )
+
+@app.get("/session/{session_id}/download")
+async def download_data(session_id: str, format: str = "csv", columns: Optional[List[str]] = Query(None),
+                        filter: Optional[str] = None):
+    """
+    Streams the current dataset as csv, parquet or arrow (IPC stream), encoded batch by batch.
+    Optional column subset (?columns=a&columns=b) and row filter (?filter=price > 10).
+    """
+    if format not in DataExporter.MEDIA_TYPES:
+        raise ValueError(f"Unsupported download format: {format}. Allowed: {list(DataExporter.MEDIA_TYPES)}")
+    session = load_session(session_id)
+    with phase("replay"):
+        df = session.get_current_df()
+    with phase("select"):
+        df = DataExporter.select(df, columns, filter)
+
+    filename = f"dataset.{DataExporter.EXTENSIONS[format]}"
+    return StreamingResponse(
+        DataExporter.stream(df, format),
+        media_type=DataExporter.MEDIA_TYPES[format],
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
+def render_export(session: Session, format: str, optimize: bool = False):
+    suffix = "-optimized" if optimize else ""
+    options = dict(
+        actions=session.history[:session.current_step + 1],
+        original_file_path=session.file_path,
+        file_type=session.file_type,
+        load_options=session.load_options,
+        optimize=optimize,
+        source_dtypes=session.initial_df.dtypes.astype(str).to_dict()
+    )
+    if format == "ipynb":
+        content = session.get_artifact(f"export-ipynb{suffix}", lambda: CodeGenerator.generate_notebook(**options))
+        media_type = "application/x-ipynb+json"
+        filename = "pandas_analysis.ipynb"
+    elif format == "chunked":
+        # Out-of-core variant of the script for inputs larger than memory
+        del options["optimize"]
+        content = session.get_artifact("export-chunked", lambda: CodeGenerator.generate_chunked_script(**options))
+        media_type = "text/x-python"
+        filename = "pandas_pipeline.py"
+    else:
+        content = session.get_artifact(f"export-py{suffix}", lambda: CodeGenerator.generate_script(**options))
+        media_type = "text/x-python"
+        filename = "pandas_script.py"
+    return content, media_type, filename
+
 @app.post("/ai/generate-action")
 async def generate_ai_action(request: Request):
     """
@@ -219,17 +510,33 @@ async def generate_ai_action(request: Request):
     if not prompt or not session_id:
         raise HTTPException(status_code=400, detail="Missing prompt or session_id")
         
-    session = session_store.load(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-        
-    current_columns = list(session.get_current_df().columns)
+    schema = load_schema(session_id)
+    current_columns = list(schema["dtypes"])
     
     from engine.ai_assistant import AIAssistant
-    action_spec = AIAssistant.generate_action_spec(prompt, current_columns)
+    index = AIAssistant.column_index(current_columns, schema_key(schema))
+    action_spec = AIAssistant.generate_action_spec(prompt, current_columns, index)
     
     return action_spec
 
+@app.post("/ai/generate-actions")
+async def generate_ai_actions(request: Request):
+    """
+    Generates one ActionSpec per prompt, all against the session's current columns.
+    Body: { "prompts": [str], "session_id": str }
+    """
+    data = await request.json()
+    prompts = data.get("prompts")
+    session_id = data.get("session_id")
+
+    if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) and p for p in prompts) or not session_id:
+        raise HTTPException(status_code=400, detail="Missing prompts or session_id")
+
+    schema = load_schema(session_id)
+
+    from engine.ai_assistant import AIAssistant
+    return AIAssistant.generate_action_specs(prompts, list(schema["dtypes"]), schema_key(schema))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
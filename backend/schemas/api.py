@@ -4,6 +4,7 @@ from typing import List, Dict, Any, Optional
 class DatasetLoadRequest(BaseModel):
     file_path: str
     file_type: str
+    sheet_name: Optional[str] = None # Excel only; defaults to the first sheet
 
 class ColumnProfile(BaseModel):
     name: str
@@ -15,11 +16,12 @@ class ColumnProfile(BaseModel):
     max: Optional[Any] = None
 
 class DataSuggestion(BaseModel):
-    type: str # 'astype', 'drop_column', 'fill_na'
+    type: str # Action to apply: 'astype', 'drop_column', 'drop_na', 'to_datetime', 'normalize_text', 'drop_duplicates', 'optimize_memory'
     column: str
     description: str
     action_params: Dict[str, Any] # Params to pass to apply_action
     confidence: float # 0.0 to 1.0
+    estimated_savings_bytes: Optional[int] = None # Only for 'optimize_memory'
 
 class DatasetProfile(BaseModel):
     rows: int
@@ -31,9 +33,18 @@ class DatasetProfile(BaseModel):
     column_details: Dict[str, ColumnProfile] = {}
     suggestions: List[DataSuggestion] = []
 
+class ActionTelemetry(BaseModel):
+    wall_ms: float
+    peak_rss_delta_mb: Optional[float] = None # Growth of the process memory high-water mark
+    rows_in: int
+    columns_in: int
+    rows_out: int
+    columns_out: int
+
 class ActionSpec(BaseModel):
     intent: str
     operations: List[Dict[str, Any]]
+    telemetry: Optional[ActionTelemetry] = None # Filled in by the server when the action is applied
 
 class DatasetResponse(BaseModel):
     id: str
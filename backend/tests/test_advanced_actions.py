@@ -62,3 +62,151 @@ def test_conditional():
     })
     assert 'Status' in new_df.columns
     assert new_df['Status'].tolist() == ['Pass', 'Fail', 'Pass']
+
+def test_optimize_memory():
+    df = pd.DataFrame({'A': [1, 2, 3], 'B': [0.5, 1.5, 2.5], 'C': ['x', 'y', 'x']})
+    new_df = ActionRegistry.execute(df, 'optimize_memory', {
+        'dtypes': {'A': 'int8', 'B': 'float32', 'C': 'category'}
+    })
+    assert str(new_df['A'].dtype) == 'int8'
+    assert str(new_df['B'].dtype) == 'float32'
+    assert str(new_df['C'].dtype) == 'category'
+    assert new_df['A'].tolist() == [1, 2, 3]
+
+    # Values that don't fit the target type are rejected instead of wrapping
+    with pytest.raises(ValueError):
+        ActionRegistry.execute(pd.DataFrame({'A': [1, 1000]}), 'optimize_memory', {'dtypes': {'A': 'int8'}})
+
+def test_groupby_agg_multiple_funcs():
+    df = pd.DataFrame({
+        'Dept': ['IT', 'HR', 'IT', 'HR', 'IT'],
+        'Salary': [5000, 4000, 6000, 3000, 7000]
+    })
+    new_df = ActionRegistry.execute(df, 'groupby_agg', {
+        'group_by': ['Dept'],
+        'aggregations': {'Salary': ['median', 'nunique', 'p50', 'max']}
+    })
+    # Groups keep first-appearance order (no sort)
+    assert new_df['Dept'].tolist() == ['IT', 'HR']
+    assert list(new_df.columns) == ['Dept', 'Salary_median', 'Salary_nunique', 'Salary_p50', 'Salary_max']
+    assert new_df['Salary_median'].tolist() == [6000.0, 3500.0]
+    assert new_df['Salary_p50'].tolist() == [6000.0, 3500.0]
+    assert new_df['Salary_nunique'].tolist() == [3, 2]
+
+    with pytest.raises(ValueError):
+        ActionRegistry.execute(df, 'groupby_agg', {'group_by': ['Dept'], 'aggregations': {'Salary': 'p101'}})
+
+def test_groupby_agg_arrow_matches_pandas():
+    df = pd.DataFrame({
+        'Key': [3, 1, 3, None, 2, 1],
+        'Value': [1.0, None, 2.5, 4.0, None, 3.0],
+        'Amount': [1, 2, 2, 5, 7, 2]
+    })
+    params = {'group_by': ['Key'], 'aggregations': {'Value': ['sum', 'mean'], 'Amount': ['count', 'nunique', 'max']}}
+    expected = ActionRegistry.execute(df, 'groupby_agg', {**params, 'engine': 'pandas'})
+    result = ActionRegistry.execute(df, 'groupby_agg', {**params, 'engine': 'arrow'})
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_multi_column_actions():
+    df = pd.DataFrame({'A': [1, 4, 9], 'B': [16, 25, 36], 'C': ['1', '2', None]})
+
+    new_df = ActionRegistry.execute(df, 'math_transform', {'target_cols': ['A', 'B'], 'function': 'sqrt'})
+    assert new_df['A_sqrt'].tolist() == [1.0, 2.0, 3.0]
+    assert new_df['B_sqrt'].tolist() == [4.0, 5.0, 6.0]
+    assert 'A_sqrt' not in df.columns # Input untouched
+
+    new_df = ActionRegistry.execute(df, 'fill_na', {'value': {'C': '0'}, 'columns': ['A', 'C']})
+    assert new_df['C'].tolist() == ['1', '2', '0']
+
+    new_df = ActionRegistry.execute(new_df, 'astype', {'columns': ['A', 'B', 'C'], 'dtype': 'float'})
+    assert list(new_df.dtypes.astype(str)) == ['float64', 'float64', 'float64']
+
+def test_multi_column_actions_parallel(monkeypatch):
+    import engine.actions as actions
+    monkeypatch.setattr(actions, 'PARALLEL_MIN_CELLS', 1)
+
+    df = pd.DataFrame({f'c{i}': [float(i), -1.5, None] for i in range(8)})
+    new_df = ActionRegistry.execute(df, 'math_transform', {
+        'target_cols': list(df.columns), 'function': 'abs', 'new_col_names': list(df.columns)
+    })
+    pd.testing.assert_frame_equal(new_df, df.abs())
+
+def test_expression():
+    df = pd.DataFrame({'Price': [10.0, 20.0, 30.0], 'Qty': [1, 2, 3], 'Unit Cost': [4.0, 5.0, 6.0]})
+    new_df = ActionRegistry.execute(df, 'expression', {
+        'expression': '(Price - `Unit Cost`) * Qty', 'new_col': 'Margin'
+    })
+    assert new_df['Margin'].tolist() == [6.0, 30.0, 72.0]
+
+    new_df = ActionRegistry.execute(df, 'expression', {
+        'expression': 'Price > 15 and sqrt(Qty) < 1.5', 'new_col': 'Flag'
+    })
+    assert new_df['Flag'].tolist() == [False, True, False]
+
+@pytest.mark.parametrize("expr", [
+    "Price.__class__",             # attribute access
+    "__import__('os')",            # arbitrary calls
+    "@secret + Price",             # eval locals
+    "Missing * 2",                 # unknown column
+    "Price ** 9 ** 9 ** 9",        # literal power blow-up
+    "Price + ((((9**64)**64)**64)**64)**64",  # nested powers
+    "__col_0__ + 1",               # reserved placeholder name
+    "(Price == '`') | (Price.__class__ == 'A') | (Price == '`')",  # backticks inside strings quote nothing
+    "Price.__init__.__globals__['os'] + '`' + '`'",
+    "[Price]",                     # non-expression syntax
+])
+def test_expression_rejects_unsafe(expr):
+    df = pd.DataFrame({'Price': [1.0, 2.0]})
+    with pytest.raises(ValueError):
+        ActionRegistry.execute(df, 'expression', {'expression': expr, 'new_col': 'X'})
+
+def test_expression_backtick_in_string_literal():
+    df = pd.DataFrame({'Mark': ['`', 'a'], 'Unit Cost': [1.0, 2.0]})
+    new_df = ActionRegistry.execute(df, 'expression', {
+        'expression': "(Mark == '`') & (`Unit Cost` > 0)", 'new_col': 'Flag'
+    })
+    assert new_df['Flag'].tolist() == [True, False]
+
+def test_sort_values():
+    df = pd.DataFrame({'A': [3.0, None, 1.0, 3.0, 2.0], 'B': ['x', 'y', 'z', 'w', 'v']})
+    new_df = ActionRegistry.execute(df, 'sort_values', {'column': 'A', 'ascending': False})
+    assert new_df['B'].tolist() == ['x', 'w', 'v', 'z', 'y'] # Stable for ties, NaN last
+
+    new_df = ActionRegistry.execute(df, 'sort_values', {
+        'columns': ['A', 'B'], 'ascending': [True, False], 'na_position': 'first'
+    })
+    pd.testing.assert_frame_equal(
+        new_df, df.sort_values(['A', 'B'], ascending=[True, False], na_position='first', kind='stable')
+    )
+
+    # Partial top-k gives the same rows as the full sort
+    new_df = ActionRegistry.execute(df, 'sort_values', {'column': 'A', 'limit': 2})
+    pd.testing.assert_frame_equal(new_df, df.sort_values('A', kind='stable').head(2))
+
+def test_sort_values_reuses_cached_codes():
+    df = pd.DataFrame({'A': [2, 1, 3]})
+    cache = {}
+    ActionRegistry.execute(df, 'sort_values', {'column': 'A'}, cache=cache)
+    assert ('sort_codes', 'A') in cache
+
+    # A poisoned cache entry proves the second (descending) sort didn't refactorize
+    codes, k = cache[('sort_codes', 'A')]
+    cache[('sort_codes', 'A')] = (codes[::-1].copy(), k)
+    new_df = ActionRegistry.execute(df, 'sort_values', {'column': 'A', 'ascending': False}, cache=cache)
+    assert new_df['A'].tolist() == [2, 3, 1] # Follows the poisoned ranks, not the real values
+
+def test_text_and_date_cleanup_actions():
+    df = pd.DataFrame({'city': [' Paris', 'paris', 'Lyon'], 'day': ['2024-01-02', '2024-01-02', '2024-01-03']})
+
+    out = ActionRegistry.execute(df, 'normalize_text', {'columns': ['city'], 'case': 'lower'})
+    assert out['city'].tolist() == ['paris', 'paris', 'lyon']
+
+    out = ActionRegistry.execute(out, 'to_datetime', {'column': 'day', 'format': '%Y-%m-%d'})
+    assert str(out['day'].dtype) == 'datetime64[ns]'
+
+    out = ActionRegistry.execute(out, 'drop_duplicates', {})
+    assert len(out) == 2
+
+    with pytest.raises(ValueError):
+        ActionRegistry.execute(df, 'to_datetime', {'column': 'city', 'format': '%Y-%m-%d'})
+    assert ActionRegistry.execute(df, 'to_datetime', {'column': 'city', 'format': '%Y-%m-%d', 'errors': 'coerce'})['city'].isna().all()
@@ -0,0 +1,19 @@
+from engine.ai_assistant import AIAssistant, ColumnIndex
+
+def test_column_match_is_whole_word_and_longest():
+    index = ColumnIndex(["id", "paid", "user_id", "amount"])
+    assert index.match("drop paid") == "paid"
+    assert index.match("sort by user id") == "user_id"
+    assert index.match("sort by userId") == "user_id"
+    assert index.match("drop unpaid") is None
+
+def test_rename_matches_column_before_to():
+    spec = AIAssistant.generate_action_spec("rename id to user_id", ["id", "user_id"])
+    assert spec.operations[0]["params"] == {"old_name": "id", "new_name": "user_id"}
+
+def test_batch_shares_cached_index():
+    columns = [f"col_{i}" for i in range(5000)] + ["salary"]
+    specs = AIAssistant.generate_action_specs(["sort by salary desc", "drop col_4999"], columns, cache_key=("s", 1, 0))
+    assert specs[0].operations[0]["params"] == {"column": "salary", "ascending": False}
+    assert specs[1].operations[0]["params"] == {"column": "col_4999"}
+    assert AIAssistant.column_index(columns, ("s", 1, 0)) is AIAssistant.column_index([], ("s", 1, 0))
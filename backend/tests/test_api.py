@@ -1,19 +1,30 @@
 from fastapi.testclient import TestClient
 from main import app
+import json
 import os
+import tempfile
 import pandas as pd
+import main
+from engine.session_store import FileSessionStore
 
 client = TestClient(app)
 
 # Create a dummy CSV for testing
 TEST_CSV = "test_dataset.csv"
+# Sessions created by the tests are kept out of backend/sessions
+storage = tempfile.TemporaryDirectory()
+
 def setup_module(module):
     df = pd.DataFrame({"A": [1, 2, 3], "B": [4, 5, 6]})
     df.to_csv(TEST_CSV, index=False)
+    module.default_store = main.session_store
+    main.session_store = FileSessionStore(storage_dir=storage.name)
 
 def teardown_module(module):
     if os.path.exists(TEST_CSV):
         os.remove(TEST_CSV)
+    main.session_store = module.default_store
+    storage.cleanup()
 
 def test_full_flow():
     # 1. Load Dataset
@@ -49,3 +60,302 @@ def test_full_flow():
     data = response.json()
     # Verify B is gone again
     assert "B" not in data["preview"][0]
+
+def test_ai_sort_action_applies():
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+
+    response = client.post("/ai/generate-action", json={"prompt": "sort by B desc", "session_id": session_id})
+    assert response.status_code == 200
+    action = response.json()
+
+    response = client.post(f"/session/{session_id}/apply", json=action)
+    assert response.status_code == 200
+    assert [row["B"] for row in response.json()["preview"]] == [6, 5, 4]
+
+def test_conditional_requests():
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+
+    for url in [f"/dataset/{session_id}/preview", f"/dataset/{session_id}/profile", f"/session/{session_id}/export"]:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        # Unchanged session: 304 with no body
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    # Preview, profile and export carry distinct tags
+    tags = {client.get(url).headers["ETag"] for url in [
+        f"/dataset/{session_id}/preview", f"/dataset/{session_id}/profile", f"/session/{session_id}/export"
+    ]}
+    assert len(tags) == 3
+
+    # Any change to the session invalidates the tag
+    etag = client.get(f"/dataset/{session_id}/preview").headers["ETag"]
+    action = {"intent": "Drop B", "operations": [{"action": "drop_column", "params": {"column": "B"}}]}
+    client.post(f"/session/{session_id}/apply", json=action)
+    response = client.get(f"/dataset/{session_id}/preview", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "B" not in response.json()[0]
+
+    # Undo returns to the previous step, but history was rewritten: a new version, so a new tag
+    client.post(f"/session/{session_id}/undo")
+    assert client.get(f"/dataset/{session_id}/preview").headers["ETag"] != etag
+
+def test_etag_shared_by_encodings():
+    path = "test_dataset_wide.csv"
+    pd.DataFrame({f"column_{i}": range(10) for i in range(20)}).to_csv(path, index=False)
+    try:
+        session_id = client.post("/dataset/load", json={"file_path": path, "file_type": "csv"}).json()["id"]
+        url = f"/dataset/{session_id}/profile"
+
+        # One weak tag for the gzip and identity bodies, and caches keep them apart
+        gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert gzipped.headers["Content-Encoding"] == "gzip"
+        assert gzipped.headers["ETag"].startswith('W/"')
+        assert gzipped.headers["Vary"] == "Accept-Encoding"
+        plain = client.get(url, headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in plain.headers
+        assert plain.headers["Vary"] == "Accept-Encoding"
+        assert plain.headers["ETag"] == gzipped.headers["ETag"]
+
+        response = client.get(url, headers={"If-None-Match": gzipped.headers["ETag"]})
+        assert response.status_code == 304
+        assert response.headers["Vary"] == "Accept-Encoding"
+    finally:
+        os.remove(path)
+
+def test_metrics_endpoint():
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+    action = {"intent": "Drop B", "operations": [{"action": "drop_column", "params": {"column": "B"}}]}
+    data = client.post(f"/session/{session_id}/apply", json=action).json()
+
+    # Telemetry is attached to the history entry
+    telemetry = data["history"][-1]["telemetry"]
+    assert telemetry["rows_in"] == 3 and telemetry["columns_in"] == 2
+    assert telemetry["rows_out"] == 3 and telemetry["columns_out"] == 1
+    assert telemetry["wall_ms"] >= 0
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'numpanda_action_duration_seconds_count{action="drop_column"}' in body
+    assert 'numpanda_http_request_duration_seconds_bucket{method="POST",route="/session/{session_id}/apply",le="+Inf"}' in body
+    assert "numpanda_session_cache_hits_total" in body
+    assert 'numpanda_store_bytes_written_total{kind="parquet"}' in body
+
+def test_server_timing_phases(tmp_path, monkeypatch):
+    from engine.telemetry import RequestProfiler
+    monkeypatch.setattr(RequestProfiler, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(RequestProfiler, "THRESHOLD_MS", 0.0)
+
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+    action = {"intent": "Drop B", "operations": [{"action": "drop_column", "params": {"column": "B"}}]}
+    response = client.post(f"/session/{session_id}/apply", json=action)
+
+    phases = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    for name in ("load", "replay", "action", "save", "profile", "preview", "total"):
+        assert name in phases
+
+    # Slow-request profiles are dumped (threshold 0: every request)
+    assert any(name.endswith(".prof") and "apply" in name for name in os.listdir(tmp_path))
+
+def test_request_timing_survives_unhandled_errors(tmp_path, monkeypatch):
+    import main
+    from engine.telemetry import RequestProfiler, metrics
+    monkeypatch.setattr(RequestProfiler, "OUTPUT_DIR", str(tmp_path))
+    def broken(session_id):
+        raise RuntimeError("disk gone")
+    monkeypatch.setattr(main.session_store, "load", broken)
+    labels = {"method": "POST", "route": "/session/{session_id}/undo"}
+    before = metrics._histograms.get("numpanda_http_request_duration_seconds", {}).get(metrics._key(labels), [0, 0])[-2]
+
+    response = TestClient(app, raise_server_exceptions=False).post("/session/any/undo")
+
+    assert response.status_code == 500
+    assert metrics._histograms["numpanda_http_request_duration_seconds"][metrics._key(labels)][-2] == before + 1
+    # The profiler was released: the next request can be profiled
+    assert RequestProfiler._active.acquire(blocking=False)
+    RequestProfiler._active.release()
+
+def test_load_waiting_for_ingest_keeps_serving(monkeypatch):
+    import asyncio
+    import time
+    import uuid
+    import httpx
+    import main
+    from engine.secure_loader import SecureLoader
+    upload_id = str(uuid.uuid4())
+    monkeypatch.setattr(main.UploadManager, "get_path", lambda file_id: SecureLoader.validate_path(TEST_CSV))
+    def slow_load(file_id, file_type, sheet_name=None):
+        time.sleep(0.5) # a conversion still running
+        return None
+    monkeypatch.setattr(main.IngestCache, "load", slow_load)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            finished = []
+            async def request(method, url, **kwargs):
+                response = await http.request(method, url, **kwargs)
+                finished.append(url)
+                return response
+            load = asyncio.create_task(request("POST", "/dataset/load", json={"file_path": upload_id, "file_type": "csv"}))
+            await asyncio.sleep(0.1)
+            await request("GET", "/")
+            assert (await load).status_code == 200
+            return finished
+
+    assert asyncio.run(run()) == ["/", "/dataset/load"]
+
+def test_upload_ingests_excel_sheets(tmp_path, monkeypatch):
+    import io
+    from engine.upload_manager import UploadManager
+    from engine.ingest import IngestCache
+    monkeypatch.setattr(UploadManager, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(IngestCache, "CACHE_DIR", str(tmp_path / "_ingest"))
+
+    workbook = io.BytesIO()
+    with pd.ExcelWriter(workbook) as writer:
+        pd.DataFrame({"A": [1, 2]}).to_excel(writer, sheet_name="First", index=False)
+        pd.DataFrame({"X": ["a", "b", "c"]}).to_excel(writer, sheet_name="Second", index=False)
+    response = client.post("/dataset/upload", files={"file": ("book.xlsx", workbook.getvalue())})
+    file_id = response.json()["file_id"]
+    assert response.json()["ingest"] == "pending"
+
+    # The conversion ran after the response; the schema describes every sheet
+    schema = client.get(f"/dataset/upload/{file_id}/schema").json()
+    assert schema["status"] == "ready"
+    assert [(s["name"], s["rows"]) for s in schema["sheets"]] == [("First", 2), ("Second", 3)]
+
+    # The sheet comes from the Parquet copy: the workbook is not parsed again
+    def fail(*args, **kwargs):
+        raise AssertionError("workbook re-parsed")
+    monkeypatch.setattr(pd, "read_excel", fail)
+    response = client.post("/dataset/load", json={"file_path": file_id, "file_type": "xlsx", "sheet_name": "Second"})
+    assert response.status_code == 200
+    assert response.json()["profile"]["column_names"] == ["X"]
+
+    script = client.get(f"/session/{response.json()['id']}/export?format=py").text
+    assert "sheet_name='Second'" in script
+
+    response = client.post("/dataset/load", json={"file_path": file_id, "file_type": "xlsx", "sheet_name": "Missing"})
+    assert response.status_code == 400
+
+def test_load_json_lines_chunked(monkeypatch):
+    from engine.chunked_loader import ChunkedLoader
+    monkeypatch.setattr(ChunkedLoader, "MIN_BYTES", 0)
+    monkeypatch.setattr(ChunkedLoader, "CHUNK_ROWS", 2)
+    path = "test_dataset.jsonl"
+    pd.DataFrame({"A": [1, 2, 3], "B": ["x", None, "z"]}).to_json(path, orient="records", lines=True)
+    try:
+        response = client.post("/dataset/load", json={"file_path": path, "file_type": "jsonl"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["profile"]["rows"] == 3 and data["profile"]["dtypes"]["A"] == "int64"
+
+        script = client.get(f"/session/{data['id']}/export?format=py").text
+        assert "lines=True" in script
+    finally:
+        os.remove(path)
+
+def test_download_streams_formats():
+    import io
+    import pyarrow as pa
+    from engine.data_exporter import DataExporter
+
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+
+    response = client.get(f"/session/{session_id}/download", params={"format": "csv", "filter": "A >= 2", "columns": ["B"]})
+    assert response.status_code == 200
+    assert response.text.splitlines() == ["B", "5", "6"]
+
+    response = client.get(f"/session/{session_id}/download", params={"format": "parquet"})
+    assert pd.read_parquet(io.BytesIO(response.content))["A"].tolist() == [1, 2, 3]
+
+    response = client.get(f"/session/{session_id}/download", params={"format": "arrow"})
+    assert pa.ipc.open_stream(response.content).read_pandas()["B"].tolist() == [4, 5, 6]
+
+    # Encoded batch by batch
+    chunks = list(DataExporter.stream(pd.DataFrame({"A": range(5)}), "csv", batch_rows=2))
+    assert len(chunks) == 4 and b"".join(chunks) == b"A\n0\n1\n2\n3\n4\n"
+
+    response = client.get(f"/session/{session_id}/download", params={"format": "csv", "filter": "__import__('os')"})
+    assert response.status_code == 400
+
+def test_schema_served_from_metadata(monkeypatch):
+    from main import session_store
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+    action = {"intent": "Drop B", "operations": [{"action": "drop_column", "params": {"column": "B"}}]}
+    client.post(f"/session/{session_id}/apply", json=action)
+    client.post(f"/session/{session_id}/undo")
+
+    # Not in memory and the data must not be read
+    session_store._cache.pop(session_id)
+    def fail_read(session_id):
+        raise AssertionError("schema request read the session data")
+    monkeypatch.setattr(session_store, "_read", fail_read)
+
+    response = client.get(f"/session/{session_id}/schema")
+    assert response.status_code == 200
+    schema = response.json()
+    assert schema["columns"] == ["A", "B"]
+    assert schema["rows"] == 3
+    assert schema["current_step"] == -1
+    assert client.get(f"/session/{session_id}/schema", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    response = client.post("/ai/generate-action", json={"prompt": "sort by B desc", "session_id": session_id})
+    assert response.status_code == 200
+    assert response.json()["operations"][0]["params"]["column"] == "B"
+
+def test_ai_batch_prompts():
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+
+    prompts = ["sort by A", "drop B", "make it pretty"]
+    response = client.post("/ai/generate-actions", json={"prompts": prompts, "session_id": session_id})
+    assert response.status_code == 200
+    specs = response.json()
+    assert [s["operations"][0]["action"] if s["operations"] else None for s in specs] == ["sort_values", "drop_column", None]
+
+    assert client.post("/ai/generate-actions", json={"prompts": [], "session_id": session_id}).status_code == 400
+
+def test_profile_stream_events():
+    response = client.post("/dataset/load", json={"file_path": TEST_CSV, "file_type": "csv"})
+    session_id = response.json()["id"]
+    action = {"intent": "Drop B", "operations": [{"action": "drop_column", "params": {"column": "B"}}]}
+    client.post(f"/session/{session_id}/apply", json=action)
+
+    def read_events(response):
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    headers = {"Accept": "text/event-stream", "Accept-Encoding": "gzip"}
+    # The apply response computed the profile; drop it to stream every stage
+    from main import session_store
+    session_store.load(session_id)._artifact_cache.clear()
+    response = client.get(f"/session/{session_id}/profile/stream", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in response.headers
+    events = read_events(response)
+    assert [name for name, _ in events] == ["preview", "shape", "stats", "cardinality", "suggestions", "profile"]
+    assert events[0][1] == [{"A": 1}, {"A": 2}, {"A": 3}]
+    assert events[1][1]["column_names"] == ["A"]
+    assert events[3][1]["unique_counts"] == {"A": 3}
+    # The stream doesn't store what it computed; /profile does
+    assert session_store.load(session_id).cached_artifact("profile") is None
+    assert events[-1][1] == client.get(f"/dataset/{session_id}/profile").json()
+
+    # Cached profile: sent whole right after the preview
+    events = read_events(client.get(f"/session/{session_id}/profile/stream", headers=headers))
+    assert [name for name, _ in events] == ["preview", "profile"]
@@ -0,0 +1,76 @@
+import pandas as pd
+from engine.batch_runner import BatchRunner, main
+from engine.chunked_loader import ChunkedLoader
+from engine.session import Session
+from engine.session_store import FileSessionStore
+from schemas.api import ActionSpec
+
+def _save_recipe(storage_dir):
+    session = Session("recipe", pd.DataFrame({"A": [1, 2], "B": ["x", "y"]}))
+    session.apply_action(ActionSpec(intent="keep large", operations=[
+        {"action": "filter_rows", "params": {"column": "A", "operator": ">", "value": 1}}]))
+    session.apply_action(ActionSpec(intent="drop B", operations=[{"action": "drop_column", "params": {"column": "B"}}]))
+    session.apply_action(ActionSpec(intent="undone", operations=[{"action": "drop_column", "params": {"column": "A"}}]))
+    session.undo()
+    store = FileSessionStore(storage_dir=str(storage_dir))
+    store.save(session)
+    return store._get_json_path("recipe")
+
+def test_batch_runner_cli(tmp_path, capsys):
+    recipe = _save_recipe(tmp_path / "sessions")
+    inputs = []
+    for day in range(3):
+        path = tmp_path / f"day{day}.csv"
+        pd.DataFrame({"A": range(day, day + 4), "B": list("abcd")}).to_csv(path, index=False)
+        inputs.append(str(path))
+    bad = tmp_path / "broken.csv"
+    bad.write_text("C\n1\n")
+
+    code = main([recipe, *inputs, str(bad), "-o", str(tmp_path / "out"), "-w", "2"])
+
+    assert code == 1
+    out = capsys.readouterr().out
+    assert "FAIL broken.csv" in out and "3/4 files" in out
+    result = pd.read_parquet(tmp_path / "out" / "day1.parquet")
+    assert list(result.columns) == ["A"]
+    assert result["A"].tolist() == [2, 3, 4]
+    assert not (tmp_path / "out" / "broken.parquet").exists()
+
+def test_batch_runner_streams_row_local_recipes(tmp_path, monkeypatch):
+    monkeypatch.setattr(ChunkedLoader, "MIN_BYTES", 0)
+    monkeypatch.setattr(ChunkedLoader, "CHUNK_ROWS", 10)
+    recipe = BatchRunner.load_recipe(_save_recipe(tmp_path / "sessions"))
+    path = tmp_path / "big.csv"
+    pd.DataFrame({"A": range(95), "B": "b"}).to_csv(path, index=False)
+
+    result = BatchRunner.run_file(recipe["actions"], str(path), str(tmp_path), recipe["load_options"])
+
+    assert result["error"] is None
+    assert (result["rows_in"], result["rows_out"]) == (95, 93)
+    assert pd.read_parquet(result["output"])["A"].tolist() == list(range(2, 95))
+
+def test_batch_runner_reports_dead_workers(tmp_path, monkeypatch, capsys):
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    import engine.batch_runner as batch_runner
+
+    class DeadPool:
+        # Every worker was killed before returning a result
+        def __init__(self, **kwargs):
+            pass
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def submit(self, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+            return future
+
+    monkeypatch.setattr(batch_runner, "ProcessPoolExecutor", DeadPool)
+    recipe = _save_recipe(tmp_path / "sessions")
+    inputs = [str(tmp_path / "a.csv"), str(tmp_path / "b.csv")]
+
+    assert main([recipe, *inputs, "-o", str(tmp_path / "out")]) == 1
+    out = capsys.readouterr().out
+    assert "FAIL a.csv" in out and "FAIL b.csv" in out and "0/2 files" in out
@@ -0,0 +1,40 @@
+import json
+import pandas as pd
+from engine.chunked_loader import ChunkedLoader
+from engine.dataset_loader import DatasetLoader
+
+def _nulls_as_none(df):
+    # Parquet returns missing strings as None where the text parsers give NaN
+    return df.astype(object).where(df.notna(), None)
+
+def test_chunked_csv_matches_full_read(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    # Chunks of 2 rows: 'n' is int in the first chunk and has a gap later, 'flag' gains a gap,
+    # 'code' is numeric in the first chunk and text afterwards
+    csv_path.write_text("n,x,flag,code,name\n1,1,True,1,a\n2,2,False,2,b\n3,2.5,True,A,c\n,4,,B,d\n5,5,False,C,e\n")
+    parquet_path = tmp_path / "data.parquet"
+
+    written = ChunkedLoader.write_parquet(str(csv_path), "csv", str(parquet_path), chunk_rows=2)
+    chunked = pd.read_parquet(parquet_path)
+    full = pd.read_csv(csv_path)
+
+    assert written["rows"] == 5
+    assert written["dtypes"] == {"n": "float64", "x": "float64", "flag": "object", "code": "object", "name": "object"}
+    pd.testing.assert_frame_equal(_nulls_as_none(chunked), _nulls_as_none(full))
+    assert chunked["code"].tolist() == ["1", "2", "A", "B", "C"]
+
+def test_chunked_json_lines_with_late_columns(tmp_path):
+    path = tmp_path / "data.jsonl"
+    records = [{"a": 1}, {"a": 2}, {"a": 3, "b": "x"}, {"a": 4, "b": "y"}]
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+    parquet_path = tmp_path / "data.parquet"
+
+    ChunkedLoader.write_parquet(str(path), "jsonl", str(parquet_path), chunk_rows=2)
+    chunked = pd.read_parquet(parquet_path)
+
+    full = DatasetLoader.load_dataset(str(path), "jsonl")
+    assert list(chunked.columns) == ["a", "b"]
+    assert chunked["a"].dtype == "int64"
+    assert chunked["b"].tolist()[2:] == ["x", "y"] and chunked["b"].isna().sum() == 2
+    assert (chunked.dtypes == full.dtypes).all()
+    pd.testing.assert_frame_equal(_nulls_as_none(chunked), _nulls_as_none(full))
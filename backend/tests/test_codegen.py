@@ -1,3 +1,4 @@
+import pytest
 from engine.code_generator import CodeGenerator
 from schemas.api import ActionSpec
 
@@ -18,3 +19,175 @@ def test_generate_script():
     assert "df = df.drop(columns=['age'])" in script
     assert "df = df[df['age'] > 18]" in script
     assert "df = df[df['name'] == 'Alice']" in script
+
+def test_generate_script_optimize_memory():
+    actions = [
+        ActionSpec(intent="Optimize memory", operations=[{"action": "optimize_memory", "params": {"dtypes": {"A": "int8", "B": "category"}}}])
+    ]
+
+    script = CodeGenerator.generate_script(actions, "/data/dataset.csv", "csv")
+
+    assert "df = df.astype({'A': 'int8', 'B': 'category'})" in script
+
+def test_generate_script_groupby_multi_agg():
+    actions = [
+        ActionSpec(intent="Salary stats", operations=[{"action": "groupby_agg", "params": {
+            "group_by": ["dept"], "aggregations": {"salary": ["mean", "p90"]}
+        }}])
+    ]
+
+    script = CodeGenerator.generate_script(actions, "/data/dataset.csv", "csv")
+
+    assert "_g = df.groupby(['dept'], sort=False, observed=True)" in script
+    assert "df = pd.concat({'salary_mean': _g['salary'].mean(), 'salary_p90': _g['salary'].quantile(0.9)}, axis=1).reset_index()" in script
+
+def test_generate_script_multi_column():
+    actions = [
+        ActionSpec(intent="Log", operations=[{"action": "math_transform", "params": {"target_cols": ["a", "b"], "function": "log"}}]),
+        ActionSpec(intent="Cast", operations=[{"action": "astype", "params": {"columns": ["a", "b"], "dtype": "str"}}]),
+    ]
+
+    script = CodeGenerator.generate_script(actions, "/data/dataset.csv", "csv")
+
+    assert "df[['a_log', 'b_log']] = np.log(df[['a', 'b']]).set_axis(['a_log', 'b_log'], axis=1)" in script
+    assert "df[['a', 'b']] = df[['a', 'b']].astype('str')" in script
+
+def test_generate_script_expression():
+    actions = [
+        ActionSpec(intent="Margin", operations=[{"action": "expression", "params": {"expression": "(price - cost) * qty", "new_col": "margin"}}])
+    ]
+
+    script = CodeGenerator.generate_script(actions, "/data/dataset.csv", "csv")
+
+    assert "df['margin'] = df.eval('(price - cost) * qty')" in script
+
+def test_generate_script_sort_values():
+    actions = [
+        ActionSpec(intent="Sort", operations=[{"action": "sort_values", "params": {"column": "salary", "ascending": False}}]),
+        ActionSpec(intent="Top 10", operations=[{"action": "sort_values", "params": {"columns": ["a", "b"], "ascending": [True, False], "limit": 10}}]),
+    ]
+
+    script = CodeGenerator.generate_script(actions, "/data/dataset.csv", "csv")
+
+    assert "df = df.sort_values(by='salary', ascending=False, na_position='last', kind='stable')" in script
+    assert "df = df.sort_values(by=['a', 'b'], ascending=[True, False], na_position='last', kind='stable').head(10)" in script
+
+@pytest.mark.parametrize("file_type", ["csv", "json", "jsonl"])
+def test_optimized_script_matches_session(tmp_path, file_type):
+    import pandas as pd
+    from engine.dataset_loader import DatasetLoader
+    from engine.session import Session
+
+    path = tmp_path / f"orders.{file_type}"
+    source = pd.DataFrame({
+        "id": range(8),
+        "qty": [1, 5, 3, 8, 2, 7, 4, 6],
+        "price": [9.5, 3.0, 4.25, 1.0, 7.5, 2.0, 5.0, 6.5],
+        "region": ["n", "s", "n", "e", "s", "n", "e", "s"],
+        "notes": ["x"] * 8,
+        "unused": range(8),
+    })
+    if file_type == "csv":
+        source.to_csv(path, index=False)
+    else:
+        source.to_json(path, orient="records", lines=file_type == "jsonl")
+
+    df = DatasetLoader.load_dataset(str(path), file_type)
+    session = Session("opt", df, file_path=str(path), file_type=file_type)
+    for ops in [
+        [{"action": "drop_column", "params": {"column": "notes"}}],
+        [{"action": "filter_rows", "params": {"column": "qty", "operator": ">", "value": 1}}],
+        [{"action": "filter_rows", "params": {"column": "price", "operator": "<", "value": 7}}],
+        [{"action": "expression", "params": {"expression": "qty * price", "new_col": "total"}}],
+        [{"action": "rename_column", "params": {"old_name": "region", "new_name": "area"}}],
+        [{"action": "drop_column", "params": {"column": "unused"}}],
+        [{"action": "sort_values", "params": {"column": "total", "ascending": False}}],
+    ]:
+        session.apply_action(ActionSpec(intent=ops[0]["action"], operations=ops))
+
+    script = CodeGenerator.generate_script(
+        session.history, str(path), file_type, optimize=True,
+        source_dtypes=session.initial_df.dtypes.astype(str).to_dict()
+    )
+
+    # Unused columns are not read and their drops disappear; the two filters are one mask
+    if file_type == "csv":
+        assert "usecols=['id', 'qty', 'price', 'region']" in script
+        assert "dtype={'id': 'int64', 'qty': 'int64', 'price': 'float64'}" in script
+        assert "engine='pyarrow'" not in script # 'region' is text
+        assert "drop(" not in script
+    else:
+        # JSON is read whole, so the drops stay
+        assert "usecols" not in script
+        assert "df = df.drop(columns=['notes'])" in script
+    assert "df = df[(df['qty'] > 1) & (df['price'] < 7)]" in script
+
+    namespace = {}
+    with pd.option_context("mode.copy_on_write", False):
+        exec(script.replace("print(df.head())", ""), namespace)
+    pd.testing.assert_frame_equal(namespace["df"], session.get_current_df())
+
+def test_optimized_script_uses_pyarrow_for_numeric_columns():
+    actions = [ActionSpec(intent="Big", operations=[{"action": "filter_rows", "params": {"column": "a", "operator": ">", "value": 0}}])]
+
+    script = CodeGenerator.generate_script(actions, "/data/d.csv", "csv", optimize=True,
+                                           source_dtypes={"a": "int64", "b": "float64"})
+
+    assert "pd.read_csv('/data/d.csv', usecols=['a', 'b'], dtype={'a': 'int64', 'b': 'float64'}, engine='pyarrow')" in script
+    assert 'pd.set_option("mode.copy_on_write", True)' in script
+
+def _run_chunked(script, tmp_path, chunk_rows):
+    import pandas as pd
+    output = tmp_path / "out.parquet"
+    script = script.replace("OUTPUT = 'output.parquet'", f"OUTPUT = {str(output)!r}")
+    script = script.replace("CHUNK_ROWS = 1_000_000", f"CHUNK_ROWS = {chunk_rows}")
+    with pd.option_context("mode.copy_on_write", False):
+        exec(script, {})
+    return pd.read_parquet(output)
+
+def test_chunked_script_streams_row_local_steps(tmp_path):
+    import pandas as pd
+    from engine.session import Session
+
+    path = tmp_path / "events.csv"
+    pd.DataFrame({"a": range(10), "b": [1.5, None] * 5, "c": list("xyxyxyxyxy")}).to_csv(path, index=False)
+    session = Session("chunked", pd.read_csv(path), file_path=str(path), file_type="csv")
+    for op in [
+        {"action": "filter_rows", "params": {"column": "a", "operator": ">=", "value": 2}},
+        {"action": "fill_na", "params": {"columns": ["b"], "value": 0}},
+        {"action": "rename_column", "params": {"old_name": "c", "new_name": "kind"}},
+        {"action": "math_transform", "params": {"target_col": "a", "new_col_name": "a_sqrt", "function": "sqrt"}},
+    ]:
+        session.apply_action(ActionSpec(intent=op["action"], operations=[op]))
+
+    script = CodeGenerator.generate_chunked_script(session.history, str(path), "csv",
+                                                   source_dtypes=session.initial_df.dtypes.astype(str).to_dict())
+    assert "pd.read_csv(SOURCE, chunksize=CHUNK_ROWS" in script
+    assert "pq.ParquetWriter" in script
+
+    result = _run_chunked(script, tmp_path, chunk_rows=3)
+    pd.testing.assert_frame_equal(result, session.get_current_df().reset_index(drop=True))
+
+def test_chunked_script_combines_partial_groupby(tmp_path):
+    import pandas as pd
+    from engine.session import Session
+
+    path = tmp_path / "sales.csv"
+    pd.DataFrame({
+        "dept": ["a", "b", "a", "c", "b", "a", "c", "b"],
+        "amount": [10, 20, 30, None, 50, 60, 70, 80],
+        "units": [1, 2, 3, 4, 5, 6, 7, 8],
+    }).to_csv(path, index=False)
+    session = Session("chunked-agg", pd.read_csv(path), file_path=str(path), file_type="csv")
+    session.apply_action(ActionSpec(intent="Big units", operations=[{"action": "filter_rows", "params": {"column": "units", "operator": ">", "value": 1}}]))
+    session.apply_action(ActionSpec(intent="Stats", operations=[{"action": "groupby_agg", "params": {
+        "group_by": ["dept"], "aggregations": {"amount": ["mean", "sum", "max"], "units": ["count", "first"]}
+    }}]))
+    session.apply_action(ActionSpec(intent="Sort", operations=[{"action": "sort_values", "params": {"column": "amount_sum"}}]))
+
+    script = CodeGenerator.generate_chunked_script(session.history, str(path), "csv",
+                                                   source_dtypes=session.initial_df.dtypes.astype(str).to_dict())
+    assert "partials.append(partial)" in script
+
+    result = _run_chunked(script, tmp_path, chunk_rows=3)
+    pd.testing.assert_frame_equal(result, session.get_current_df().reset_index(drop=True))
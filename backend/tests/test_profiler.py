@@ -18,3 +18,79 @@ def test_profiler_basic():
     assert profile.column_names == ["A", "B", "C"]
     assert profile.column_details["A"].mean == 3.0
     assert profile.column_details["C"].missing_count == 1
+
+def test_memory_optimization_suggestion():
+    df = pd.DataFrame({
+        "A": list(range(1000)),
+        "B": [0.5, 1.25] * 500,
+        "C": [0.1, 0.2] * 500,  # Not exact in float32
+        "D": ["red", "green", "blue", "red"] * 250,
+    })
+
+    dtypes, saved = Profiler.plan_memory_optimization(df)
+
+    assert dtypes == {"A": "int16", "B": "float32", "D": "category"}
+    assert saved > 0
+
+    suggestion = next(s for s in Profiler.analyze_quality(df) if s.type == "optimize_memory")
+    assert suggestion.action_params == {"dtypes": dtypes}
+    assert suggestion.estimated_savings_bytes == saved
+
+def test_quality_detectors():
+    n = 400
+    df = pd.DataFrame({
+        "amount": [str(i) for i in range(n)],
+        "day": [f"2024-01-{i % 28 + 1:02d}" for i in range(n)],
+        "city": ["Paris", "paris ", "Lyon", "Nice"] * (n // 4),
+        "code": [f"c{i}" for i in range(n)],
+    })
+    df = pd.concat([df, df.iloc[:5]], ignore_index=True)
+
+    by_type = {s.type: s for s in Profiler.analyze_quality(df)}
+
+    assert by_type["astype"].column == "amount"
+    assert by_type["to_datetime"].action_params == {"column": "day", "format": "%Y-%m-%d", "errors": "coerce"}
+    assert by_type["normalize_text"].action_params == {"columns": ["city"], "strip": True, "case": "lower"}
+    assert by_type["drop_duplicates"].description == "Remove 5 duplicate rows."
+    assert "code" not in [s.column for s in by_type.values()]
+
+def test_datetime_suggestion_applies_with_stray_values():
+    from engine.actions import ActionRegistry
+    df = pd.DataFrame({"day": [f"2024-01-{i % 28 + 1:02d}" for i in range(97)] + ["unknown"] * 3})
+
+    suggestion = next(s for s in Profiler.analyze_quality(df) if s.type == "to_datetime")
+    out = ActionRegistry.execute(df, suggestion.type, suggestion.action_params)
+
+    assert str(out["day"].dtype) == "datetime64[ns]"
+    assert out["day"].isna().sum() == 3
+
+def test_quality_checks_sample_first(monkeypatch):
+    # A column that fails on the sample is never parsed in full
+    monkeypatch.setattr(Profiler, "SAMPLE_ROWS", 100)
+    df = pd.DataFrame({"A": ["x"] * 1000 + [str(i) for i in range(1000)]})
+    calls = []
+    original = pd.to_numeric
+    monkeypatch.setattr(pd, "to_numeric", lambda s, **kw: calls.append(len(s)) or original(s, **kw))
+
+    Profiler.analyze_quality(df)
+
+    assert calls == [100]
+
+def test_quality_detector_budget(monkeypatch):
+    monkeypatch.setattr(Profiler, "DETECTOR_BUDGET_MS", 0)
+    df = pd.DataFrame({"A": ["1", "2", "3"] * 10, "B": [1, 2, 3] * 10})
+
+    types = [s.type for s in Profiler.analyze_quality(df)]
+
+    assert "astype" not in types and "drop_duplicates" not in types
+
+def test_text_check_skipped_when_projected_over_budget():
+    df = pd.DataFrame({"A": [" a", "b", "B", "c"] * 100})
+    missing = {"A": 0}
+
+    found = Profiler.analyze_quality(df, unique_counts={"A": 4}, missing=missing)
+    assert "normalize_text" in [s.type for s in found]
+
+    # Confirming on that many distinct values would not fit in the budget
+    found = Profiler.analyze_quality(df, unique_counts={"A": 10 ** 12}, missing=missing)
+    assert "normalize_text" not in [s.type for s in found]
@@ -1,7 +1,7 @@
 import pandas as pd
 import pytest
 from engine.session import Session
-from schemas.api import ActionSpec
+from schemas.api import ActionSpec, ActionTelemetry
 
 def test_session_time_travel():
     # Setup
@@ -67,3 +67,280 @@ def test_session_time_travel():
     current = session.get_current_df()
     assert len(current) == 3 # 1, 2, 3 (values < 4)
     assert "B" not in current.columns
+
+def test_session_store_preserves_compact_dtypes(tmp_path):
+    from engine.session_store import FileSessionStore
+
+    df = pd.DataFrame({"A": [1, 2, 1], "B": ["x", "y", "x"]}).astype({"A": "category", "B": "category"})
+    df["C"] = pd.Series([1, 2, 3], dtype="int8")
+    store = FileSessionStore(storage_dir=str(tmp_path))
+    store.save(Session(session_id="test-dtypes", initial_df=df))
+
+    loaded = store.load("test-dtypes")
+    assert loaded.initial_df.dtypes.astype(str).to_dict() == {"A": "category", "B": "category", "C": "int8"}
+
+def test_session_failed_action_leaves_history_unchanged():
+    session = Session(session_id="test-fail", initial_df=pd.DataFrame({"A": [1, 2]}))
+    bad = ActionSpec(intent="Drop missing", operations=[{"action": "drop_column", "params": {"column": "Z"}}])
+
+    with pytest.raises(ValueError):
+        session.apply_action(bad)
+
+    assert session.history == []
+    assert session.current_step == -1
+
+def test_session_store_load_restores_current_state(tmp_path):
+    from engine.session_store import FileSessionStore
+
+    session = Session(session_id="test-reload", initial_df=pd.DataFrame({"A": [1, 2, 3]}))
+    session.apply_action(ActionSpec(
+        intent="Filter A > 1",
+        operations=[{"action": "filter_rows", "params": {"column": "A", "operator": ">", "value": 1}}]
+    ))
+    FileSessionStore(storage_dir=str(tmp_path)).save(session)
+
+    # Fresh store: no in-memory session, so the state comes from replay
+    loaded = FileSessionStore(storage_dir=str(tmp_path)).load("test-reload")
+    assert loaded.get_current_df()["A"].tolist() == [2, 3]
+
+def test_session_lazy_preview(monkeypatch):
+    monkeypatch.setattr(Session, "PREVIEW_CHUNK_ROWS", 4)
+    df = pd.DataFrame({"A": range(100), "B": range(100, 200)})
+    session = Session(session_id="test-preview", initial_df=df)
+    session.apply_action(ActionSpec(
+        intent="Filter A > 40",
+        operations=[{"action": "filter_rows", "params": {"column": "A", "operator": ">", "value": 40}}]
+    ))
+    session.apply_action(ActionSpec(intent="Drop B", operations=[{"action": "drop_column", "params": {"column": "B"}}]))
+    expected = session.get_current_df().head(5)
+
+    # Simulate a reload: nothing materialized
+    session._current_df_cache = None
+    preview = session.get_preview_df(5)
+
+    pd.testing.assert_frame_equal(preview, expected)
+    assert session._current_df_cache is None
+
+    # A sort needs every row, so the preview falls back to full materialization
+    session.apply_action(ActionSpec(intent="Sort", operations=[{"action": "sort_values", "params": {
+        "column": "A", "ascending": False
+    }}]))
+    session._current_df_cache = None
+    assert session.get_preview_df(5)["A"].tolist() == [99, 98, 97, 96, 95]
+    assert session._current_df_cache is not None
+
+def test_session_warmer_materializes_recent_sessions(tmp_path):
+    from engine.session_store import FileSessionStore
+    from engine.warmup import SessionWarmer
+
+    store = FileSessionStore(storage_dir=str(tmp_path))
+    for i in range(3):
+        session = Session(f"warm-{i}", pd.DataFrame({"A": [3, 1, 2]}))
+        session.apply_action(ActionSpec(intent="Sort", operations=[{"action": "sort_values", "params": {"column": "A"}}]))
+        store.save(session)
+
+    # After a restart only the two most recent sessions are warmed, already at their current step
+    restarted = FileSessionStore(storage_dir=str(tmp_path), cache_size=2)
+    warmer = SessionWarmer(restarted, limit=5)
+    assert warmer.status()["ready"] is False
+    warmer.start()
+    warmer.join(timeout=10)
+
+    status = warmer.status()
+    assert status["ready"] and status["state"] == "ready"
+    assert status["sessions_total"] == 2 and status["sessions_warmed"] == 2
+    cached = restarted._cache
+    assert len(cached) == 2
+    for session in cached.values():
+        assert session._current_df_cache["A"].tolist() == [1, 2, 3]
+
+def test_prefix_cache_shared_across_sessions(tmp_path, monkeypatch):
+    from engine.prefix_cache import PrefixCache
+    from engine.actions import ActionRegistry
+    monkeypatch.setattr(PrefixCache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(PrefixCache, "MIN_SECONDS", 0.0)
+
+    df = pd.DataFrame({"id": [1, 2, 3, 4], "A": [1.0, None, 3.0, 4.0], "C": pd.Categorical(["x", "y", "x", "y"])})
+    steps = [
+        ActionSpec(intent="Drop id", operations=[{"action": "drop_column", "params": {"column": "id"}}]),
+        ActionSpec(intent="Drop missing", operations=[{"action": "drop_na", "params": {"subset": ["A"]}}]),
+    ]
+    first = Session(session_id="prefix-a", initial_df=df)
+    for step in steps:
+        first.apply_action(step)
+    expected = first.get_current_df()
+
+    # Same data and steps (different intent text): no action runs, in a new session or on replay
+    def fail(*args, **kwargs):
+        raise AssertionError("prefix was recomputed")
+    monkeypatch.setattr(ActionRegistry, "execute", fail)
+    second = Session(session_id="prefix-b", initial_df=df.copy())
+    forged = ActionTelemetry(wall_ms=1e9, rows_in=0, columns_in=0, rows_out=0, columns_out=0)
+    for step in steps:
+        second.apply_action(ActionSpec(intent="same " + step.intent, operations=step.operations, telemetry=forged))
+    pd.testing.assert_frame_equal(second.get_current_df(), expected)
+    # Nothing ran, so nothing was measured; telemetry sent by the client is not kept
+    assert [a.telemetry for a in second.history] == [None, None]
+
+    second.undo()
+    second._current_df_cache = None
+    assert list(second.get_current_df().columns) == ["A", "C"]
+    assert len(second.get_current_df()) == 4
+    second.redo()
+    pd.testing.assert_frame_equal(second.get_current_df(), expected)
+
+def test_session_store_resumes_from_checkpoint(tmp_path, monkeypatch):
+    from engine.session_store import FileSessionStore
+    from engine.prefix_cache import PrefixCache
+    from engine.actions import ActionRegistry
+    monkeypatch.setattr(PrefixCache, "ENABLED", False)
+    monkeypatch.setattr(FileSessionStore, "CHECKPOINT_MIN_MS", 0.0)
+    monkeypatch.setattr(FileSessionStore, "MAX_CHECKPOINTS", 2)
+
+    store = FileSessionStore(storage_dir=str(tmp_path))
+    session = Session(session_id="test-ckpt", initial_df=pd.DataFrame({"A": [3, 1, 2], "B": [1.0, 2.0, 3.0]}))
+    session.apply_action(ActionSpec(
+        intent="Filter A > 1",
+        operations=[{"action": "filter_rows", "params": {"column": "A", "operator": ">", "value": 1}}]
+    ))
+    store.save(session)
+    session.apply_action(ActionSpec(intent="Drop B", operations=[{"action": "drop_column", "params": {"column": "B"}}]))
+    store.save(session)
+    expected = session.get_current_df()
+    assert [c["step"] for c in session.checkpoints] == [0, 1]
+    assert len(list(tmp_path.glob("test-ckpt.step*.parquet"))) == 2
+
+    def fail(*args, **kwargs):
+        raise AssertionError("history was replayed")
+    monkeypatch.setattr(ActionRegistry, "execute", fail)
+    loaded = FileSessionStore(storage_dir=str(tmp_path)).load("test-ckpt")
+    pd.testing.assert_frame_equal(loaded.get_current_df(), expected)
+    monkeypatch.undo()
+
+    # Rewriting history invalidates the checkpoint of the replaced step
+    monkeypatch.setattr(FileSessionStore, "CHECKPOINT_MIN_MS", 1e9)
+    loaded.undo()
+    loaded.apply_action(ActionSpec(intent="Drop A", operations=[{"action": "drop_column", "params": {"column": "A"}}]))
+    store.save(loaded)
+    assert [c["step"] for c in loaded.checkpoints] == [0]
+    assert len(list(tmp_path.glob("test-ckpt.step*.parquet"))) == 1
+    reloaded = FileSessionStore(storage_dir=str(tmp_path)).load("test-ckpt")
+    assert list(reloaded.get_current_df().columns) == ["B"]
+
+def test_session_store_arrow_snapshots(tmp_path, monkeypatch):
+    from engine.session_store import FileSessionStore
+    from engine.prefix_cache import PrefixCache
+    monkeypatch.setattr(PrefixCache, "ENABLED", False)
+    monkeypatch.setattr(FileSessionStore, "CHECKPOINT_MIN_MS", 0.0)
+
+    df = pd.DataFrame({
+        "A": [3, 1, 2, 5],
+        "B": [1.0, None, 3.0, 4.0],
+        "C": pd.Categorical(["x", "y", "x", "y"]),
+        "D": ["p", "q", None, "s"],
+    })
+    # Data written by a loader as Parquet is converted on the first save
+    store = FileSessionStore(storage_dir=str(tmp_path), snapshot_format="arrow")
+    df.to_parquet(store.data_path("test-arrow"), index=False)
+    session = Session(session_id="test-arrow", initial_df=df)
+    session.apply_action(ActionSpec(
+        intent="Filter A > 1",
+        operations=[{"action": "filter_rows", "params": {"column": "A", "operator": ">", "value": 1}}]
+    ))
+    store.save(session)
+    # Initial data and checkpoint are shared snapshots; the Parquet file is gone
+    assert [p.name for p in tmp_path.iterdir() if p.is_file()] == ["test-arrow.json"]
+    assert len(list((tmp_path / "shared").glob("*.arrow"))) == 2
+
+    loaded = FileSessionStore(storage_dir=str(tmp_path), snapshot_format="arrow").load("test-arrow")
+    pd.testing.assert_frame_equal(loaded.initial_df, df)
+    pd.testing.assert_frame_equal(loaded.get_current_df(), session.get_current_df())
+    # Numeric columns without missing values are views of the memory-mapped file
+    assert not loaded.initial_df["A"].values.flags.writeable
+
+    # Actions work on the read-only data
+    loaded.undo()
+    for operation in [
+        {"action": "fill_na", "params": {"columns": ["B"], "value": 0}},
+        {"action": "astype", "params": {"column": "A", "dtype": "float"}},
+        {"action": "sort_values", "params": {"column": "A", "ascending": False}},
+    ]:
+        loaded.apply_action(ActionSpec(intent="step", operations=[operation]))
+    assert loaded.get_current_df()["A"].tolist() == [5.0, 3.0, 2.0, 1.0]
+    assert loaded.initial_df["B"].isna().sum() == 1
+
+def test_session_store_shares_arrow_snapshots(tmp_path, monkeypatch):
+    from engine.session_store import FileSessionStore
+    from engine.prefix_cache import PrefixCache
+    monkeypatch.setattr(PrefixCache, "ENABLED", False)
+    monkeypatch.setattr(FileSessionStore, "CHECKPOINT_MIN_MS", 0.0)
+    monkeypatch.setenv("SHARED_DATASET_DIR", str(tmp_path / "shm"))
+
+    df = pd.DataFrame({"A": [3, 1, 2], "B": [1.0, 2.0, 3.0]})
+    drop_b = ActionSpec(intent="Drop B", operations=[{"action": "drop_column", "params": {"column": "B"}}])
+    store = FileSessionStore(storage_dir=str(tmp_path / "sessions"), snapshot_format="arrow")
+    for session_id in ("first", "second"):
+        session = Session(session_id=session_id, initial_df=df)
+        session.apply_action(drop_b)
+        store.save(session)
+
+    # Same data and steps: one base snapshot and one checkpoint, each used by both sessions
+    shared = store.shared
+    assert shared.root == str(tmp_path / "shm")
+    assert session.snapshot is not None and shared.ref_count(session.snapshot) == 2
+    assert shared.ref_count(session.checkpoints[0]["shared"]) == 2
+    assert len(list((tmp_path / "shm").glob("*.arrow"))) == 2
+
+    # A second worker process opens the same files
+    other_worker = FileSessionStore(storage_dir=str(tmp_path / "sessions"), snapshot_format="arrow")
+    assert other_worker.load("first").get_current_df()["A"].tolist() == [3, 1, 2]
+
+    store.delete("first")
+    assert shared.ref_count(session.snapshot) == 1
+    assert len(list((tmp_path / "shm").glob("*.arrow"))) == 2
+    store.delete("second")
+    assert list((tmp_path / "shm").glob("*.arrow")) == []
+
+def test_session_store_shared_by_processes(tmp_path):
+    from engine.session_store import FileSessionStore, SessionConflictError
+    # Two workers on one storage directory, each with its own in-memory cache
+    worker_1 = FileSessionStore(storage_dir=str(tmp_path))
+    worker_2 = FileSessionStore(storage_dir=str(tmp_path))
+    worker_1.save(Session(session_id="shared", initial_df=pd.DataFrame({"A": [1, 2, 3]})))
+    assert worker_2.load("shared").current_step == -1
+
+    session = worker_1.load("shared")
+    session.apply_action(ActionSpec(intent="drop", operations=[{"action": "filter_rows", "params": {"column": "A", "operator": ">", "value": 1}}]))
+    worker_1.save(session)
+
+    # The cached copy is replaced by the saved one
+    stale = worker_2._cache["shared"]
+    fresh = worker_2.load("shared")
+    assert fresh is not stale and fresh.current_step == 0
+
+    # A save based on an older copy is rejected instead of overwriting
+    stale.undo()
+    with pytest.raises(SessionConflictError):
+        worker_2.save(stale)
+    assert worker_1.load("shared").current_step == 0
+
+def test_dataset_key_distinguishes_types():
+    from engine.prefix_cache import PrefixCache
+    key = PrefixCache.dataset_key
+    assert key(pd.DataFrame({"A": [1, 2]}, dtype=object)) != key(pd.DataFrame({"A": ["1", "2"]}))
+    assert key(pd.DataFrame({"A": [1, "2"]})) != key(pd.DataFrame({"A": ["1", 2]}))
+    cats = pd.Series(["x", "y", "x"])
+    assert key(pd.DataFrame({"A": cats.astype(pd.CategoricalDtype(["x", "y"]))})) != \
+        key(pd.DataFrame({"A": cats.astype(pd.CategoricalDtype(["y", "x"]))}))
+    assert key(pd.DataFrame({"A": cats.astype(pd.CategoricalDtype(["x", "y"]))})) != \
+        key(pd.DataFrame({"A": cats.astype(pd.CategoricalDtype(["x", "y"], ordered=True))}))
+    assert key(pd.DataFrame({"A": [1, 2]})) == key(pd.DataFrame({"A": [1, 2]}))
+
+def test_session_store_saves_deleted_session_again(tmp_path):
+    from engine.session_store import FileSessionStore
+    store = FileSessionStore(storage_dir=str(tmp_path))
+    session = Session(session_id="again", initial_df=pd.DataFrame({"A": [1]}))
+    store.save(session)
+    store.delete("again")
+    store.save(session)
+    assert store.load("again") is session
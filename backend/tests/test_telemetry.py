@@ -0,0 +1,19 @@
+from engine.telemetry import MetricsRegistry
+
+def test_metrics_render():
+    registry = MetricsRegistry()
+    registry.describe("demo_seconds", "histogram", "Demo latency.", buckets=(0.1, 1.0))
+    registry.describe("demo_total", "counter", "Demo counter.")
+
+    registry.observe("demo_seconds", 0.05, {"action": "sort_values"})
+    registry.observe("demo_seconds", 0.5, {"action": "sort_values"})
+    registry.inc("demo_total", {"kind": "parquet"}, 1024)
+
+    text = registry.render()
+
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{action="sort_values",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{action="sort_values",le="1"} 2' in text
+    assert 'demo_seconds_bucket{action="sort_values",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{action="sort_values"} 2' in text
+    assert 'demo_total{kind="parquet"} 1024' in text
@@ -14,6 +14,7 @@ const DatasetLoaderHelper: React.FC = () => {
             // 1. Determine type
             let type = 'csv';
             if (file.name.endsWith('.json')) type = 'json';
+            else if (file.name.match(/\.(jsonl|ndjson)$/)) type = 'jsonl';
             else if (file.name.match(/\.xlsx?$/)) type = 'xlsx';
 
             // 2. Upload via API (Returns ID)
@@ -66,7 +67,7 @@ const DatasetLoaderHelper: React.FC = () => {
                         <input
                             type="file"
                             className="hidden"
-                            accept=".csv,.xlsx,.xls,.json"
+                            accept=".csv,.xlsx,.xls,.json,.jsonl,.ndjson"
                             onChange={handleFileUpload}
                             disabled={isLoading}
                         />